@@ -173,15 +173,15 @@ BEGIN
         COUNT(r.ReportID) AS ReportCount
     FROM Reports r
     JOIN User u ON r.ReportingUserID = u.UserID
-    JOIN ReportSubject rs ON r.`ReportID` = rs.id
-    WHERE rs.subject = input_subject
+    JOIN ReportSubject rs ON r.`ReportSubject` = rs.ReportSubjectID
+    WHERE rs.SubjectName = input_subject
     GROUP BY u.UserID, u.FirstName, u.LastName
     HAVING COUNT(r.ReportID) = (
         SELECT MAX(ReportTotal) FROM (
             SELECT COUNT(*) AS ReportTotal
             FROM Reports r2
-            JOIN ReportSubject rs2 ON r2.`ReportSubject` = rs2.id
-            WHERE rs2.subject = input_subject
+            JOIN ReportSubject rs2 ON r2.`ReportSubject` = rs2.ReportSubjectID
+            WHERE rs2.SubjectName = input_subject
             GROUP BY r2.ReportingUserID
         ) AS counts
     );
@@ -0,0 +1,213 @@
+"""
+Async MySQL access (aiomysql) for the async route handlers.
+
+The pool is opened on first use in each worker (the app lifespan warms it up through
+app/health.py) and closed when the lifespan ends; while MySQL is unreachable every acquire
+tries to open it again and fails with a 503. Each request gets an AsyncDB from the
+get_async_db dependency: the connection is taken from the pool on the first statement and
+kept until the request ends, so everything between two commits is one transaction, just like
+with the mysql.connector connection the handlers used before. Waiting for the pool is bounded
+by the same per-route timeouts as the sync pool (ROUTE_ACQUIRE_TIMEOUTS) and ends in a 503.
+
+Statements are timed for /metrics and the Server-Timing header like the sync cursors.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+from fastapi import HTTPException, Request, status
+
+from app.database import DB_CONFIG, DB_CONNECT_TIMEOUT, DB_ACQUIRE_TIMEOUT, ROUTE_ACQUIRE_TIMEOUTS
+from app.metrics import DB_POOL_ACQUIRE_FAILURES, record_backend, record_pool_wait, sql_operation
+
+# handlers catch this instead of mysql.connector.Error
+MySQLError = aiomysql.MySQLError
+
+ASYNC_DB_POOL_MIN_SIZE = int(os.getenv('ASYNC_DB_POOL_MIN_SIZE', 2))
+ASYNC_DB_POOL_MAX_SIZE = int(os.getenv('ASYNC_DB_POOL_MAX_SIZE', 20))
+
+async_db_pool = None
+_open_lock = asyncio.Lock()
+
+
+async def open_async_db_pool():
+    global async_db_pool
+    async with _open_lock:
+        # another request may have opened it while we waited for the lock
+        if async_db_pool is None:
+            async_db_pool = await aiomysql.create_pool(
+                host=DB_CONFIG['host'],
+                port=DB_CONFIG['port'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'],
+                db=DB_CONFIG['database'],
+                minsize=ASYNC_DB_POOL_MIN_SIZE,
+                maxsize=ASYNC_DB_POOL_MAX_SIZE,
+                autocommit=False,
+                charset='utf8mb4',
+                # MySQL closes idle connections after wait_timeout (8h by default)
+                pool_recycle=3600,
+                connect_timeout=DB_CONNECT_TIMEOUT
+            )
+            print("Async MySQL connection pool ready.")
+    return async_db_pool
+
+
+async def close_async_db_pool():
+    global async_db_pool
+    if async_db_pool is not None:
+        async_db_pool.close()
+        await async_db_pool.wait_closed()
+        async_db_pool = None
+
+
+class _TimedDictCursor(aiomysql.DictCursor):
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, args)
+        finally:
+            record_backend("mysql", sql_operation(query), time.perf_counter() - started)
+
+
+class _TimedStreamingCursor(aiomysql.SSCursor):
+    """Unbuffered: rows stay on the server until fetched, for exports of any size."""
+
+    async def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, args)
+        finally:
+            record_backend("mysql", sql_operation(query), time.perf_counter() - started)
+
+    async def fetchmany(self, size=None):
+        started = time.perf_counter()
+        try:
+            return await super().fetchmany(size)
+        finally:
+            record_backend("mysql", "FETCH", time.perf_counter() - started)
+
+
+class AsyncDB:
+    """One request's connection; rows come back as dicts, like cursor(dictionary=True)."""
+
+    def __init__(self, timeout: float):
+        self._pool = None
+        self._timeout = timeout
+        self._connection = None
+
+    async def _acquire(self):
+        if self._connection is None:
+            started = time.perf_counter()
+            try:
+                self._pool = async_db_pool or await asyncio.wait_for(open_async_db_pool(), self._timeout)
+                self._connection = await asyncio.wait_for(self._pool.acquire(), self._timeout)
+            except (MySQLError, OSError) as e:
+                DB_POOL_ACQUIRE_FAILURES.labels("unavailable").inc()
+                print(f"WARNING: Could not open the async MySQL pool: {e}")
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Database is unavailable, please try again.", headers={"Retry-After": "5"})
+            except asyncio.TimeoutError:
+                DB_POOL_ACQUIRE_FAILURES.labels("timeout").inc()
+                print("WARNING: Timed out waiting for an async MySQL connection")
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Database is busy, please try again.", headers={"Retry-After": "1"})
+            finally:
+                record_pool_wait(time.perf_counter() - started)
+        return self._connection
+
+    async def execute(self, query, params=None):
+        """Run a statement; the returned (closed) cursor still has rowcount and lastrowid."""
+        connection = await self._acquire()
+        async with connection.cursor(_TimedDictCursor) as cursor:
+            await cursor.execute(query, params)
+        return cursor
+
+    async def fetch_one(self, query, params=None):
+        connection = await self._acquire()
+        async with connection.cursor(_TimedDictCursor) as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+    async def fetch_all(self, query, params=None) -> list:
+        connection = await self._acquire()
+        async with connection.cursor(_TimedDictCursor) as cursor:
+            await cursor.execute(query, params)
+            return list(await cursor.fetchall())
+
+    async def stream(self, query, params, size: int):
+        """Yield (column names, rows) chunks of at most `size` rows from an unbuffered cursor.
+
+        The first chunk has no rows, so callers get the column names even for an empty result.
+        """
+        connection = await self._acquire()
+        cursor = await connection.cursor(_TimedStreamingCursor)
+        finished = False
+        try:
+            await cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            yield columns, []
+            while rows := await cursor.fetchmany(size):
+                yield columns, rows
+            finished = True
+        finally:
+            if finished:
+                await cursor.close()
+            else:
+                # unread rows are left on the wire, drop the socket instead of reading them all;
+                # the pool opens a new connection in its place
+                connection.close()
+
+    async def commit(self):
+        if self._connection is not None:
+            await self._connection.commit()
+
+    async def rollback(self):
+        if self._connection is not None:
+            await self._connection.rollback()
+
+    async def release(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if not connection.closed and connection.get_transaction_status():
+            # a handler returned without commit/rollback, do not leak its locks to the next request
+            try:
+                await connection.rollback()
+            except MySQLError:
+                connection.close()
+        self._pool.release(connection)
+
+
+def get_stats() -> dict:
+    if async_db_pool is None:
+        return {"open": False}
+    return {"open": True, "size": async_db_pool.size, "idle": async_db_pool.freesize,
+            "in_use": async_db_pool.size - async_db_pool.freesize,
+            "min_size": async_db_pool.minsize, "max_size": async_db_pool.maxsize}
+
+
+def _route_timeout(request: Request) -> float:
+    route = request.scope.get("route")
+    return ROUTE_ACQUIRE_TIMEOUTS.get(getattr(route, "path", None), DB_ACQUIRE_TIMEOUT)
+
+
+async def get_async_db(request: Request):
+    """Dependency: an AsyncDB for this request, its connection goes back to the pool afterwards."""
+    db = AsyncDB(_route_timeout(request))
+    try:
+        yield db
+    finally:
+        await db.release()
+
+
+@asynccontextmanager
+async def async_db_session(timeout: float = DB_ACQUIRE_TIMEOUT):
+    """A short-lived AsyncDB outside of the request dependency (e.g. released before bcrypt runs)."""
+    db = AsyncDB(timeout)
+    try:
+        yield db
+    finally:
+        await db.release()
@@ -1,71 +1,190 @@
-import mysql.connector
-from mysql.connector import pooling
-import redis
 import os
+import threading
+
+import mysql.connector
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
+from fastapi import Request
+from mysql.connector.errors import PoolError
+from redis.commands.core import AsyncScript, Script
+from app.db_pool import AdaptivePool, LazyConnection
+from app.metrics import (InstrumentedPool, InstrumentedRedis, InstrumentedAsyncRedis, InstrumentedElasticsearch,
+                         InstrumentedAsyncElasticsearch)
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Nothing here connects at import time. Every client is a ProcessLocal: it is built on first use
+# in the process that uses it (a worker forked from a preloaded master builds its own), and the
+# app lifespan warms them up concurrently through app/health.py.
+
+
+class ProcessLocal:
+    """Builds the wrapped client on first use in each process and forwards attribute access to it.
+
+    Its own methods are underscored so they never shadow a client method (redis has get()).
+    """
+
+    def __init__(self, name, factory, script_class=None):
+        self._name = name
+        self._factory = factory
+        self._script_class = script_class
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def _instance(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # a client inherited over fork shares its sockets with the parent, never reuse it
+                    self._client = self._factory()
+                    self._pid = pid
+        return self._client
+
+    def _is_open(self) -> bool:
+        return self._pid == os.getpid()
+
+    def _reset(self):
+        """Forget the client of this process and return it (None if it was never built) so it can be closed."""
+        with self._lock:
+            client = self._client if self._is_open() else None
+            self._client = None
+            self._pid = None
+        return client
+
+    def register_script(self, script):
+        # the script calls back through this proxy, so it follows the client into every process
+        return self._script_class(self, script)
+
+    def __getattr__(self, name):
+        return getattr(self._instance(), name)
+
+    def __repr__(self):
+        return f"<ProcessLocal {self._name} open={self._is_open()}>"
+
+
 # --- MySQL Connection Pool ---
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
     'user': os.getenv('DB_USER'),
     'password': os.getenv('DB_PASSWORD'),
     'database': os.getenv('DB_NAME')
 }
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
 
-if not all([DB_CONFIG['user'], DB_CONFIG['password'], DB_CONFIG['database']]):
-    print("FATAL ERROR: Database environment variables (DB_USER, DB_PASSWORD, DB_NAME) are not set.")
-    exit()
-
-try:
-    db_pool = pooling.MySQLConnectionPool(
-        pool_name="api_pool",
-        pool_size=10,
-        **DB_CONFIG
-    )
-    print("MySQL Connection Pool created successfully.")
-except mysql.connector.Error as err:
-    print(f"FATAL ERROR: Could not create MySQL connection pool: {err}")
-    exit()
+# how long a request may wait for a free connection before it gets a 503
+DB_ACQUIRE_TIMEOUT = float(os.getenv('DB_ACQUIRE_TIMEOUT', 2))
+# route templates that should give up sooner (cheap reads) or wait longer (bookings, admin reports)
+ROUTE_ACQUIRE_TIMEOUTS = {
+    "/tickets/tickets/{ticket_id}": 0.5,
+    "/tickets/batch": 0.5,
+    "/tickets/{ticket_id}/cancellation-penalty": 0.5,
+    "/tickets/reserve": 5,
+    "/tickets/pay": 5,
+    "/tickets/reservations/{reservation_id}/cancel": 5,
+    "/admin/reports": 10,
+    "/admin/cancellReports": 10,
+    "/admin/paymentReports": 10,
+}
+
+
+def create_db_pool():
+    if not all([DB_CONFIG['user'], DB_CONFIG['password'], DB_CONFIG['database']]):
+        print("FATAL ERROR: Database environment variables (DB_USER, DB_PASSWORD, DB_NAME) are not set.")
+        raise PoolError("Database environment variables (DB_USER, DB_PASSWORD, DB_NAME) are not set")
+    try:
+        # get_connection() records the pool wait and hands out connections with timed cursors
+        pool = InstrumentedPool(AdaptivePool(
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            max_waiting=int(os.getenv('DB_POOL_MAX_WAITING', 100)),
+            timeout=DB_ACQUIRE_TIMEOUT,
+            max_idle=float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            connection_timeout=DB_CONNECT_TIMEOUT,
+            **DB_CONFIG
+        ))
+    except mysql.connector.Error as err:
+        print(f"ERROR: Could not create MySQL connection pool: {err}")
+        # a PoolError, so requests get a 503 and the next one tries again
+        raise PoolError(f"Could not create MySQL connection pool: {err}") from err
+    print(f"MySQL Connection Pool created successfully (pid {os.getpid()}).")
+    return pool
+
+
+db_pool = ProcessLocal("mysql", create_db_pool)
 
 # --- Redis Connection ---
-try:
-    redis_client = redis.Redis(
-        host=os.getenv('REDIS_HOST', 'localhost'),
-        port=int(os.getenv('REDIS_PORT', 6379)),
-        db=0,
-        decode_responses=True
-    )
-    redis_client.ping()
-    print("Redis connection successful.")
-except redis.exceptions.ConnectionError as err:
-    print(f"FATAL ERROR: Could not connect to Redis: {err}")
-    exit()
-# --- ElasticSearch Connection
-try:
-    es_client = Elasticsearch(
-        "http://localhost:9200"
-    )
-    if not es_client.ping():
-        raise ConnectionError("Could not connect to Elasticsearch")
-    print("Elasticsearch connection successful.")
-except Exception as err:
-    print(f"FATAL ERROR: Could not connect to Elasticsearch: {err}")
-    exit()
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+# only the connect is bounded: the es_writer and the invalidation listener block on reads on purpose
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 1))
+
+redis_client = ProcessLocal("redis", lambda: InstrumentedRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
+    decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT
+), script_class=Script)
+
+# async twin of redis_client for the async handlers
+async_redis_client = ProcessLocal("redis_async", lambda: InstrumentedAsyncRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
+    decode_responses=True,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT
+), script_class=AsyncScript)
+
+# --- ElasticSearch Connection ---
+ES_HOST = os.getenv('ELASTICSEARCH_HOST', 'http://localhost:9200')
+
+# sync client of the es_writer worker
+es_client = ProcessLocal("elasticsearch", lambda: InstrumentedElasticsearch(
+    ES_HOST,
+    request_timeout=float(os.getenv('ES_REQUEST_TIMEOUT', 10))
+))
+
+# one shared async client per process, so every search reuses the same keep-alive connections
+async_es_client = ProcessLocal("elasticsearch_async", lambda: InstrumentedAsyncElasticsearch(
+    ES_HOST,
+    connections_per_node=int(os.getenv('ES_CONNECTIONS_PER_NODE', 64)),
+    request_timeout=float(os.getenv('ES_REQUEST_TIMEOUT', 10)),
+    retry_on_timeout=True,
+    max_retries=2
+))
+
+
+async def close_clients():
+    """Close whatever this process has opened; called at the end of the app lifespan."""
+    if (client := async_es_client._reset()) is not None:
+        await client.close()
+    if (client := async_redis_client._reset()) is not None:
+        await client.aclose()
+    if (client := es_client._reset()) is not None:
+        client.close()
+    if (client := redis_client._reset()) is not None:
+        client.close()
+    if (pool := db_pool._reset()) is not None:
+        pool.close()
 
 # --- Dependency Function ---
-def get_db_connection():
-    """Dependency to get a DB connection from the pool and ensure it's returned."""
+def get_db_connection(request: Request):
+    """Dependency to get a DB connection from the pool (on first cursor use) and ensure it's returned."""
+    route = request.scope.get("route")
+    timeout = ROUTE_ACQUIRE_TIMEOUTS.get(getattr(route, "path", None), DB_ACQUIRE_TIMEOUT)
+    connection = LazyConnection(db_pool, timeout)
     try:
-        connection = db_pool.get_connection()
         yield connection
     finally:
-        if 'connection' in locals() and connection.is_connected():
-            connection.close()
+        connection.close()
 
 def get_es_client():
     """Dependency to get the Elasticsearch client."""
-    return es_client
\ No newline at end of file
+    return es_client._instance()
+
+def get_async_es_client():
+    """Dependency to get the shared AsyncElasticsearch client."""
+    return async_es_client._instance()
@@ -0,0 +1,268 @@
+"""
+MySQL connection pool that waits instead of failing.
+
+mysql.connector's MySQLConnectionPool has a fixed size and raises PoolError the moment all
+connections are checked out, so every burst above pool_size turned into 500s. AdaptivePool
+keeps between min_size and max_size connections:
+
+- get_connection(timeout) waits up to `timeout` seconds for a free connection; at most
+  max_waiting callers wait at the same time, the rest fail at once (PoolQueueFull).
+- New connections are opened on demand up to max_size; connections idle for longer than
+  max_idle seconds are closed again down to min_size.
+- A connection that sat idle for more than health_check_after seconds is pinged before it is
+  handed out and replaced when the ping fails (server restarts, wait_timeout).
+
+Both errors are PoolError subclasses, so existing `except PoolError` blocks keep working.
+LazyConnection is what the get_db_connection dependency yields: it only takes a connection
+from the pool when a cursor is first used, so handlers answered from Redis never touch MySQL.
+"""
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from fastapi import HTTPException, status
+from mysql.connector.errors import PoolError
+
+from app.metrics import DB_POOL_CONNECTIONS, DB_POOL_WAITING, DB_POOL_ACQUIRE_FAILURES
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class PoolQueueFull(PoolError):
+    pass
+
+
+class PooledConnection:
+    """A connection checked out of an AdaptivePool; close() gives it back."""
+
+    def __init__(self, pool, connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_connection", connection)
+        object.__setattr__(self, "_broken", False)
+
+    def close(self):
+        connection = self._connection
+        if connection is None:
+            return
+        object.__setattr__(self, "_connection", None)
+        self._pool.release(connection, self._broken)
+
+    def disconnect(self):
+        # the caller dropped the socket (e.g. an export aborted mid-stream), the pool must not reuse it
+        object.__setattr__(self, "_broken", True)
+        self._connection.disconnect()
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError("Connection was already returned to the pool")
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+class AdaptivePool:
+    def __init__(self, min_size=2, max_size=10, max_waiting=100, timeout=2.0, max_idle=300,
+                 health_check_after=30, **connect_args):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self._connect_args = connect_args
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, returned_at), most recently returned on the right
+        self._size = 0  # open connections, idle + in use + being opened
+        self._waiting = 0
+        self._closed = False
+        self.stats = {"opened": 0, "closed": 0, "health_check_failures": 0, "timeouts": 0, "queue_full": 0}
+        # open min_size right away so a bad DB config still fails at startup
+        for _ in range(min_size):
+            connection = self._open()
+            with self._lock:
+                self._size += 1
+                self._idle.append((connection, time.monotonic()))
+        self._update_gauges()
+
+    def _open(self):
+        connection = mysql.connector.connect(**self._connect_args)
+        self.stats["opened"] += 1
+        return connection
+
+    def _discard(self, connection):
+        self.stats["closed"] += 1
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _update_gauges(self):
+        DB_POOL_CONNECTIONS.labels("idle").set(len(self._idle))
+        DB_POOL_CONNECTIONS.labels("in_use").set(self._size - len(self._idle))
+        DB_POOL_WAITING.set(self._waiting)
+
+    def _healthy(self, connection, returned_at) -> bool:
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            self.stats["health_check_failures"] += 1
+            return False
+
+    def get_connection(self, timeout=None):
+        """Take a connection, waiting up to `timeout` seconds (default self.timeout) for one to free up."""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            idle = None
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if self._waiting >= self.max_waiting:
+                        self.stats["queue_full"] += 1
+                        DB_POOL_ACQUIRE_FAILURES.labels("queue_full").inc()
+                        raise PoolQueueFull(f"{self._waiting} requests are already waiting for a MySQL connection")
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        DB_POOL_ACQUIRE_FAILURES.labels("timeout").inc()
+                        raise PoolTimeout("Timed out waiting for a MySQL connection")
+                    self._waiting += 1
+                    self._update_gauges()
+                    self._lock.wait(remaining)
+                    self._waiting -= 1
+                if self._idle:
+                    idle = self._idle.pop()
+                else:
+                    self._size += 1  # reserve the slot, the connection is opened outside the lock
+                self._update_gauges()
+
+            if idle is None:
+                try:
+                    return PooledConnection(self, self._open())
+                except BaseException:
+                    self._forget()
+                    raise
+            connection, returned_at = idle
+            if self._healthy(connection, returned_at):
+                return PooledConnection(self, connection)
+            self._discard(connection)
+            self._forget()
+
+    def _forget(self):
+        # a slot whose connection was closed or never opened
+        with self._lock:
+            self._size -= 1
+            self._update_gauges()
+            self._lock.notify()
+
+    def release(self, connection, broken=False):
+        if not broken and not self._closed:
+            try:
+                if connection.unread_result:
+                    connection.consume_results()
+                if connection.in_transaction:
+                    # a handler returned without commit/rollback, do not leak its locks to the next request
+                    connection.rollback()
+            except mysql.connector.Error:
+                broken = True
+        if broken or self._closed:
+            self._discard(connection)
+            self._forget()
+            return
+        expired = []
+        now = time.monotonic()
+        with self._lock:
+            self._idle.append((connection, now))
+            # shrink: the least recently used connections sit on the left
+            while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.max_idle:
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+            self._update_gauges()
+            self._lock.notify()
+        for stale in expired:
+            self._discard(stale)
+
+    def close(self):
+        """Close the idle connections; connections still in use are closed when they come back."""
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._closed = True
+            self._update_gauges()
+        for connection in idle:
+            self._discard(connection)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle),
+                    "waiting": self._waiting, "min_size": self.min_size, "max_size": self.max_size,
+                    "max_waiting": self.max_waiting, **self.stats}
+
+
+class _LazyCursor:
+    def __init__(self, owner, kwargs):
+        self._owner = owner
+        self._kwargs = kwargs
+        self._cursor = None
+
+    def _real(self):
+        if self._cursor is None:
+            self._cursor = self._owner.acquire().cursor(**self._kwargs)
+        return self._cursor
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._real())
+
+    def __getattr__(self, name):
+        return getattr(self._real(), name)
+
+
+class LazyConnection:
+    """
+    Stands in for a pooled connection for one request. The real connection is taken from the
+    pool when a cursor is first used; a PoolError then becomes a 503 instead of a 500.
+    """
+
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._connection = None
+
+    def acquire(self):
+        if self._connection is None:
+            try:
+                self._connection = self._pool.get_connection(timeout=self._timeout)
+            except PoolError as e:
+                print(f"WARNING: {e}")
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Database is busy, please try again.", headers={"Retry-After": "1"})
+        return self._connection
+
+    def cursor(self, **kwargs):
+        return _LazyCursor(self, kwargs)
+
+    def commit(self):
+        if self._connection is not None:
+            self._connection.commit()
+
+    def rollback(self):
+        if self._connection is not None:
+            self._connection.rollback()
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            connection.close()
+
+    def __getattr__(self, name):
+        return getattr(self.acquire(), name)
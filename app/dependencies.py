@@ -2,20 +2,24 @@ import os
 import re
 import httpx
 from fastapi import Depends, HTTPException, status
-import mysql.connector
 from fastapi.params import Depends
 from jose import JWTError, jwt
 
-from app.database import get_db_connection
+from app.async_db import async_db_session
 from app.Security import ALGORITHM, oauth2_scheme, SECRET_KEY
+from app.principal_cache import get_principal, store_principal
 
 # ELASTIC_API_KEY = os.getenv("ELASTIC_API_KEY")
 # SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 
-#decode jwt and fetch user data from db
-def get_current_user(token: str = Depends(oauth2_scheme),
-                    db: mysql.connector.connection.MySQLConnection =
-                    Depends(get_db_connection)):
+async def _load_user(email: str):
+    # only runs on a principal cache miss, so the connection is taken from the pool here instead of per request
+    async with async_db_session() as db:
+        return await db.fetch_one("SELECT UserID, Email, FirstName, LastName, PhoneNumber, Role "
+                                  "FROM User WHERE Email = %s AND AccountStatus = 'active'", (email,))
+
+#decode jwt and fetch user data from cache (or db)
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -30,17 +34,17 @@ def get_current_user(token: str = Depends(oauth2_scheme),
     except JWTError:
         raise credentials_exception
 
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT UserID, Email, FirstName, LastName, PhoneNumber, Role "
-                   "FROM User WHERE Email = %s AND AccountStatus = 'active'", (email,))
-    user = cursor.fetchone()
-    cursor.close()
-
+    user, generation = await get_principal(email)
     if user is None:
-        raise credentials_exception
-    return user
+        user = await _load_user(email)
+        if user is None:
+            raise credentials_exception
+        # skipped if the user was invalidated (e.g. deactivated) while we were loading it
+        await store_principal(email, user, payload.get("exp", 0), generation)
+    # handlers get their own copy, the cached dict is shared
+    return dict(user)
 
-def get_current_admin_user(current_user: dict = Depends(get_current_user)):
+async def get_current_admin_user(current_user: dict = Depends(get_current_user)):
     if current_user.get("Role") != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return current_user
@@ -1,18 +1,59 @@
+import json
 import time
-from database import es_client as es_sync_client
+from app.database import redis_client, async_redis_client, get_async_es_client
 
-def sync_ticket_in_es(ticket_id: int, doc_to_update: dict):
-    for attempt in range(3): # Try 3 times at max
+# Capacity changes are written behind: request handlers append them to a Redis stream
+# and the es_writer worker applies them to Elasticsearch in coalesced _bulk batches.
+ES_UPDATE_STREAM = "esCapacityUpdates"
+ES_UPDATE_GROUP = "esWriter"
+ES_WRITER_STATS_KEY = "esWriter:stats"
+# updates Elasticsearch rejected for good (or too often), kept for inspection and replay
+ES_DEAD_LETTER_STREAM = "esCapacityUpdates:dead"
+
+async def sync_ticket_in_es(ticket_id: int, doc_to_update: dict, route=None):
+    """Queue a partial update of a ticket document. route = (origin, destination, date) for cache invalidation."""
+    fields = {"TicketID": ticket_id, "Doc": json.dumps(doc_to_update)}
+    if route:
+        fields["Route"] = json.dumps([route[0], route[1], str(route[2])])
+    try:
+        await async_redis_client.xadd(ES_UPDATE_STREAM, fields)
+    except Exception as e:
+        # queue is unavailable, fall back to a single direct update
+        print(f"ES queue FAILED for TicketID {ticket_id}: {e}, updating Elasticsearch directly")
         try:
-            es_sync_client.update(
-                index="tickets", 
-                id=ticket_id, 
-                body={"doc": doc_to_update}
-            )
-            print(f"✅ ES Sync Successful for TicketID {ticket_id} on attempt {attempt + 1}")
-            return #Exit if successful
+            await get_async_es_client().update(index="tickets", id=ticket_id, doc=doc_to_update)
         except Exception as e:
-            print(f"ES Sync FAILED (Attempt {attempt + 1}/3) for TicketID {ticket_id}: {e}")
-            if attempt == 2: #if last attempt was unsuccessful
-                print(f" CRITICAL: Could not sync TicketID {ticket_id}. Manual check required.")
-            time.sleep(1) # wait 1 sec before next try
\ No newline at end of file
+            print(f" CRITICAL: Could not sync TicketID {ticket_id}. Manual check required. {e}")
+
+def sync_tickets_in_es(updates):
+    """Queue many partial updates with one round trip. updates = [(ticket_id, doc, route or None), ...]"""
+    pipe = redis_client.pipeline(transaction=False)
+    for ticket_id, doc_to_update, route in updates:
+        fields = {"TicketID": ticket_id, "Doc": json.dumps(doc_to_update)}
+        if route:
+            fields["Route"] = json.dumps([route[0], route[1], str(route[2])])
+        pipe.xadd(ES_UPDATE_STREAM, fields)
+    pipe.execute()
+
+def get_queue_stats() -> dict:
+    """Queue depth, delivered-but-unacknowledged entries, age of the oldest entry and worker counters."""
+    depth = redis_client.xlen(ES_UPDATE_STREAM)
+    pending = 0
+    lag_seconds = 0.0
+    if depth:
+        oldest = redis_client.xrange(ES_UPDATE_STREAM, count=1)
+        if oldest:
+            # stream IDs start with the millisecond timestamp of the XADD
+            queued_ms = int(oldest[0][0].split("-")[0])
+            lag_seconds = round(max(0.0, time.time() - queued_ms / 1000), 3)
+        try:
+            pending = redis_client.xpending(ES_UPDATE_STREAM, ES_UPDATE_GROUP)["pending"]
+        except Exception:
+            pending = 0
+    return {
+        "queue_depth": depth,
+        "pending": pending,
+        "lag_seconds": lag_seconds,
+        "dead_letter": redis_client.xlen(ES_DEAD_LETTER_STREAM),
+        "worker": redis_client.hgetall(ES_WRITER_STATS_KEY)
+    }
@@ -0,0 +1,179 @@
+"""
+Background worker that applies queued ticket updates to Elasticsearch.
+
+Run it next to the API:
+    python -m app.es_writer
+or set ES_WRITER_IN_PROCESS=1 to run it as a thread inside each API process.
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+import redis
+from elasticsearch.helpers import bulk
+
+from app.database import redis_client, es_client
+from app.elastic_utils import ES_UPDATE_STREAM, ES_UPDATE_GROUP, ES_WRITER_STATS_KEY, ES_DEAD_LETTER_STREAM
+from app.search_cache import bump_route_versions
+
+INDEX_NAME = "tickets"
+BATCH_SIZE = int(os.getenv("ES_WRITER_BATCH_SIZE", 500))
+BLOCK_MS = int(os.getenv("ES_WRITER_BLOCK_MS", 1000))
+# entries delivered to a consumer that died are reclaimed after this idle time
+RECLAIM_IDLE_MS = 60000
+MAX_BACKOFF_SECONDS = 30
+# a document that still fails after this many bulk attempts goes to the dead-letter stream
+MAX_ATTEMPTS = int(os.getenv("ES_WRITER_MAX_ATTEMPTS", 5))
+DEAD_LETTER_MAXLEN = 100000
+
+_stop_event = threading.Event()
+
+
+def ensure_group():
+    try:
+        redis_client.xgroup_create(ES_UPDATE_STREAM, ES_UPDATE_GROUP, id="0", mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def coalesce(entries):
+    """Merge all queued updates of the same TicketID; later entries win field by field."""
+    docs, entry_ids, routes = {}, {}, set()
+    for entry_id, fields in entries:
+        ticket_id = int(fields["TicketID"])
+        docs.setdefault(ticket_id, {}).update(json.loads(fields["Doc"]))
+        entry_ids.setdefault(ticket_id, []).append(entry_id)
+        if "Route" in fields:
+            routes.add(tuple(json.loads(fields["Route"])))
+    return docs, entry_ids, routes
+
+
+def is_retryable(status) -> bool:
+    # version conflicts, rejected executions and node errors pass; a 400 (mapping, parse) never does
+    return status in (409, 429) or (status or 0) >= 500
+
+
+def flush(docs):
+    """Send one _bulk request; returns ({TicketID: error} to retry, {TicketID: error} that will never succeed)."""
+    actions = ({"_op_type": "update", "_index": INDEX_NAME, "_id": ticket_id, "doc": doc}
+               for ticket_id, doc in docs.items())
+    _, errors = bulk(es_client, actions, raise_on_error=False)
+    retry, failed = {}, {}
+    for error in errors:
+        item = error.get("update", {})
+        status = item.get("status")
+        if status == 404:
+            # ticket is not indexed (yet), the next sync_to_elastic run will index it with its capacity
+            print(f"ES writer: TicketID {item.get('_id')} is not in the index, dropping update")
+            continue
+        (retry if is_retryable(status) else failed)[int(item.get("_id"))] = f"{status}: {item.get('error')}"
+    return retry, failed
+
+
+def dead_letter(errors, entries_by_id, entry_ids):
+    """Move the entries of the tickets in errors ({TicketID: error}) to the dead-letter stream and acknowledge them."""
+    pipe = redis_client.pipeline()
+    for ticket_id in errors:
+        print(f"ES writer: TicketID {ticket_id} moved to {ES_DEAD_LETTER_STREAM}: {errors[ticket_id]}")
+        for entry_id in entry_ids[ticket_id]:
+            pipe.xadd(ES_DEAD_LETTER_STREAM, {**entries_by_id[entry_id], "EntryID": entry_id,
+                                              "Error": errors[ticket_id][:1000]},
+                      maxlen=DEAD_LETTER_MAXLEN, approximate=True)
+    pipe.hincrby(ES_WRITER_STATS_KEY, "dead_lettered", len(errors))
+    pipe.execute()
+    acknowledge([entry for ticket_id in errors for entry in entry_ids[ticket_id]])
+
+
+def acknowledge(entry_ids):
+    if not entry_ids:
+        return
+    pipe = redis_client.pipeline()
+    pipe.xack(ES_UPDATE_STREAM, ES_UPDATE_GROUP, *entry_ids)
+    # acknowledged entries are removed so the stream length is the queue depth
+    pipe.xdel(ES_UPDATE_STREAM, *entry_ids)
+    pipe.execute()
+
+
+def process_batch(entries):
+    docs, entry_ids, routes = coalesce(entries)
+    entries_by_id = dict(entries)
+    # failed bulk attempts per ticket; a request that fails as a whole (ES unreachable) is not
+    # the documents' fault and is retried without counting
+    attempts = {}
+    backoff = 0
+    started = time.perf_counter()
+    while docs and not _stop_event.is_set():
+        try:
+            retry, failed = flush(docs)
+        except Exception as e:
+            print(f"ES writer: bulk request FAILED ({len(docs)} tickets): {e}")
+            pending = set(docs)
+        else:
+            for ticket_id in retry:
+                attempts[ticket_id] = attempts.get(ticket_id, 0) + 1
+                if attempts[ticket_id] >= MAX_ATTEMPTS:
+                    failed[ticket_id] = retry[ticket_id]
+            pending = set(retry) - set(failed)
+            acknowledge([entry for ticket_id in docs if ticket_id not in retry and ticket_id not in failed
+                         for entry in entry_ids[ticket_id]])
+            if failed:
+                dead_letter(failed, entries_by_id, entry_ids)
+        docs = {ticket_id: docs[ticket_id] for ticket_id in pending}
+        if docs:
+            backoff += 1
+            redis_client.hincrby(ES_WRITER_STATS_KEY, "retries", 1)
+            _stop_event.wait(min(2 ** backoff, MAX_BACKOFF_SECONDS))
+    # search results of these routes were cached from the old documents
+    bump_route_versions(routes)
+
+    pipe = redis_client.pipeline()
+    pipe.hincrby(ES_WRITER_STATS_KEY, "batches", 1)
+    pipe.hincrby(ES_WRITER_STATS_KEY, "entries", len(entries))
+    pipe.hincrby(ES_WRITER_STATS_KEY, "documents", len(entry_ids))
+    pipe.hset(ES_WRITER_STATS_KEY, mapping={
+        "last_flush_seconds": round(time.perf_counter() - started, 4),
+        "last_flush_at": int(time.time())
+    })
+    pipe.execute()
+
+
+def run(consumer_name=None):
+    consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+    ensure_group()
+    print(f"ES writer '{consumer_name}' started")
+    while not _stop_event.is_set():
+        try:
+            # take over entries of consumers that stopped before acknowledging them
+            _, entries, _ = redis_client.xautoclaim(ES_UPDATE_STREAM, ES_UPDATE_GROUP, consumer_name,
+                                                    min_idle_time=RECLAIM_IDLE_MS, count=BATCH_SIZE)
+            if not entries:
+                response = redis_client.xreadgroup(ES_UPDATE_GROUP, consumer_name, {ES_UPDATE_STREAM: ">"},
+                                                   count=BATCH_SIZE, block=BLOCK_MS)
+                entries = response[0][1] if response else []
+            if entries:
+                process_batch(entries)
+        except redis.exceptions.ConnectionError as e:
+            print(f"ES writer: Redis unavailable: {e}")
+            _stop_event.wait(1)
+    print(f"ES writer '{consumer_name}' stopped")
+
+
+def start_in_background():
+    _stop_event.clear()
+    thread = threading.Thread(target=run, name="es-writer", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop():
+    _stop_event.set()
+
+
+if __name__ == "__main__":
+    try:
+        run()
+    except KeyboardInterrupt:
+        stop()
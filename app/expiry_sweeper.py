@@ -0,0 +1,134 @@
+"""
+Releases the seats of reservations that were never paid.
+
+reserve_ticket holds a seat for 10 minutes. The sweeper marks expired 'Reserved' rows as
+'Expired', gives their seats back to Ticket.RemainingCapacity and pushes the new capacities
+to Elasticsearch, the Redis inventory counters and the search cache.
+Rows are claimed with FOR UPDATE SKIP LOCKED, so several sweepers can run side by side.
+
+    python -m app.expiry_sweeper
+or set EXPIRY_SWEEPER_IN_PROCESS=1 to run it as a task inside the API process.
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+
+from app.database import db_pool, redis_client
+from app.elastic_utils import sync_tickets_in_es
+from app.search_cache import bump_route_versions
+from app import inventory
+
+BATCH_SIZE = int(os.getenv("EXPIRY_SWEEPER_BATCH_SIZE", 500))
+INTERVAL_SECONDS = float(os.getenv("EXPIRY_SWEEPER_INTERVAL", 30))
+SWEEPER_STATS_KEY = "expirySweeper:stats"
+
+
+def sweep_batch(db) -> int:
+    """Expire up to BATCH_SIZE reservations in one transaction; returns the number of released seats."""
+    cursor = db.cursor(dictionary=True)
+    try:
+        # ReservationExpiryTime is written with utcnow(), see reserve_ticket
+        cursor.execute("""
+            SELECT ReservationID, TicketID FROM Reservation
+            WHERE ReservationStatus = 'Reserved' AND ReservationExpiryTime < UTC_TIMESTAMP()
+            ORDER BY ReservationExpiryTime
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (BATCH_SIZE,))
+        expired = cursor.fetchall()
+        if not expired:
+            db.rollback()
+            return 0
+
+        reservation_ids = [row['ReservationID'] for row in expired]
+        placeholders = ', '.join(['%s'] * len(reservation_ids))
+        cursor.execute(f"UPDATE Reservation SET ReservationStatus = 'Expired' WHERE ReservationID IN ({placeholders})",
+                       reservation_ids)
+
+        # one set-based UPDATE for all tickets: RemainingCapacity + <seats released for that ticket>
+        seats = Counter(row['TicketID'] for row in expired)
+        ticket_ids = list(seats)
+        ticket_placeholders = ', '.join(['%s'] * len(ticket_ids))
+        case_clauses = ' '.join(['WHEN %s THEN %s'] * len(ticket_ids))
+        case_params = [value for ticket_id in ticket_ids for value in (ticket_id, seats[ticket_id])]
+        cursor.execute(f"""
+            UPDATE Ticket SET RemainingCapacity = RemainingCapacity + CASE TicketID {case_clauses} ELSE 0 END
+            WHERE TicketID IN ({ticket_placeholders})
+        """, case_params + ticket_ids)
+
+        cursor.execute(f"""
+            SELECT t.TicketID, t.RemainingCapacity, c1.CityName AS Origin, c2.CityName AS Destination, t.DepartureDate
+            FROM Ticket t
+            JOIN City c1 ON t.Origin = c1.CityID
+            JOIN City c2 ON t.Destination = c2.CityID
+            WHERE t.TicketID IN ({ticket_placeholders})
+        """, ticket_ids)
+        tickets = cursor.fetchall()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    routes = {(t['Origin'], t['Destination'], t['DepartureDate']) for t in tickets}
+    sync_tickets_in_es([(t['TicketID'], {"RemainingCapacity": t['RemainingCapacity']},
+                         (t['Origin'], t['Destination'], t['DepartureDate'])) for t in tickets])
+    if inventory.enabled():
+        inventory.release_seats_bulk(seats)
+    bump_route_versions(routes)
+    redis_client.delete(*[f"ticketDetail{ticket_id}" for ticket_id in ticket_ids])
+    return len(expired)
+
+
+def sweep() -> int:
+    """Run batches until no expired reservation is left; returns the total number of released seats."""
+    started = time.perf_counter()
+    released = 0
+    db = db_pool.get_connection()
+    try:
+        while True:
+            count = sweep_batch(db)
+            released += count
+            if count < BATCH_SIZE:
+                break
+    finally:
+        db.close()
+        duration = time.perf_counter() - started
+        pipe = redis_client.pipeline()
+        pipe.hincrby(SWEEPER_STATS_KEY, "sweeps", 1)
+        pipe.hincrby(SWEEPER_STATS_KEY, "released_seats", released)
+        pipe.hset(SWEEPER_STATS_KEY, mapping={
+            "last_sweep_seconds": round(duration, 4),
+            "last_sweep_released": released,
+            "last_sweep_at": int(time.time())
+        })
+        pipe.execute()
+    if released:
+        print(f"Expiry sweeper released {released} seats in {duration:.2f}s")
+    return released
+
+
+def get_stats() -> dict:
+    return redis_client.hgetall(SWEEPER_STATS_KEY)
+
+
+async def run_forever():
+    """In-process scheduler: sweep in a worker thread every INTERVAL_SECONDS."""
+    while True:
+        try:
+            await asyncio.to_thread(sweep)
+        except Exception as e:
+            print(f"Expiry sweeper FAILED: {e}")
+        await asyncio.sleep(INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    print(f"Expiry sweeper started, interval {INTERVAL_SECONDS}s, batch size {BATCH_SIZE}")
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            print(f"Expiry sweeper FAILED: {e}")
+        time.sleep(INTERVAL_SECONDS)
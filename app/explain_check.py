@@ -0,0 +1,103 @@
+"""
+Runs EXPLAIN on the queries the routers execute and fails if one of them scans a whole table.
+
+A plan row with access type ALL fails the check unless the table is one of the small
+reference tables or MySQL estimates fewer than --min-rows rows for it (on a tiny dev
+database the optimizer scans instead of using an index, which is fine). Run it against a
+database with production-like volume, after python -m app.migrate:
+
+    python -m app.explain_check [--min-rows 1000]
+
+Exit code 1 means at least one query needs an index.
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from app.database import db_pool
+
+# read from memory by the API (app/reference_data.py), scanning them is expected
+SMALL_TABLES = {"City", "TransportCompany", "ReportSubject"}
+
+
+def router_queries():
+    """(name, sql, params) for every query shape the routers send to MySQL."""
+    from app.routers import admin
+    from app.routers.tickets import TICKET_DETAIL_QUERY
+
+    today = date.today()
+    reports_where, reports_params = admin._reports_filter(cursor=1000000, report_status="Pending")
+    cancelled_where, cancelled_params = admin._cancelled_tickets_filter(cursor=1000000, date_from=today - timedelta(days=30))
+    payments_where, payments_params = admin._payments_filter(cursor=1000000, date_from=today - timedelta(days=30))
+    return [
+        ("tickets: ticket details", TICKET_DETAIL_QUERY + " WHERE t.TicketID = %s", (1,)),
+        ("tickets: ticket details batch", TICKET_DETAIL_QUERY + " WHERE t.TicketID IN (%s, %s, %s)", (1, 2, 3)),
+        ("tickets: reserve (row lock mode)",
+         "SELECT Origin, Destination, DepartureDate, RemainingCapacity FROM Ticket "
+         "WHERE TicketID = %s AND RemainingCapacity > 0", (1,)),
+        ("tickets: pay",
+         "SELECT ReservationID FROM Reservation WHERE ReservationID = %s AND UserID = %s "
+         "AND ReservationStatus = 'Reserved' AND ReservationExpiryTime > UTC_TIMESTAMP()", (1, 1)),
+        ("tickets: cancel",
+         "SELECT t.TicketID FROM Reservation r JOIN Ticket t ON r.TicketID = t.TicketID "
+         "WHERE r.ReservationID = %s AND r.UserID = %s AND r.ReservationStatus = %s", (1, 1, 'Paid')),
+        ("users: bookings",
+         "SELECT r.ReservationID, t.Price, tc.CompanyName FROM Reservation r "
+         "JOIN Ticket t ON r.TicketID = t.TicketID "
+         "JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID "
+         "WHERE r.UserID = %s ORDER BY r.ReservationTime DESC", (1,)),
+        ("auth: login lookup", "SELECT UserID, Email, Password FROM User WHERE Email = %s OR PhoneNumber = %s",
+         ("user@example.com", "09120000000")),
+        ("dependencies: current user",
+         "SELECT UserID FROM User WHERE Email = %s AND AccountStatus = 'active'", ("user@example.com",)),
+        ("expiry sweeper",
+         "SELECT ReservationID, TicketID FROM Reservation WHERE ReservationStatus = 'Reserved' "
+         "AND ReservationExpiryTime < UTC_TIMESTAMP() ORDER BY ReservationExpiryTime LIMIT 500", ()),
+        ("admin: reports page", f"{admin.REPORTS_QUERY}{reports_where} ORDER BY r.ReportID DESC LIMIT 50",
+         reports_params),
+        ("admin: unchecked reports",
+         "SELECT r.ReportID FROM Reports r WHERE r.ReportStatus = 'Pending' ORDER BY r.ReportID DESC", ()),
+        ("admin: cancelled tickets page",
+         f"{admin.CANCELLED_TICKETS_QUERY}{cancelled_where} ORDER BY r.ReservationID DESC LIMIT 50", cancelled_params),
+        ("admin: payments page", f"{admin.PAYMENTS_QUERY}{payments_where} ORDER BY p.PaymentID DESC LIMIT 50",
+         payments_params),
+    ]
+
+
+def full_scans(plan, min_rows):
+    """Plan rows of big tables read with a full table scan."""
+    return [row for row in plan
+            if row["type"] == "ALL" and row["table"] not in SMALL_TABLES
+            and not str(row["table"]).startswith("<") and (row["rows"] or 0) >= min_rows]
+
+
+def check(min_rows: int) -> int:
+    failures = 0
+    db = db_pool.get_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        for name, sql, params in router_queries():
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+            scans = full_scans(plan, min_rows)
+            if scans:
+                failures += 1
+                tables = ", ".join(f"{row['table']} (~{row['rows']} rows)" for row in scans)
+                print(f"FAIL  {name}: full table scan of {tables}")
+            else:
+                used = ", ".join(f"{row['table']}:{row['key'] or row['type']}" for row in plan)
+                print(f"ok    {name}: {used}")
+    finally:
+        cursor.close()
+        db.close()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN every router query and fail on full table scans.")
+    parser.add_argument("--min-rows", type=int, default=1000,
+                        help="ignore scans of tables MySQL estimates smaller than this")
+    args = parser.parse_args()
+    failed = check(args.min_rows)
+    print(f"{failed} queries with full table scans" if failed else "No full table scans.")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,107 @@
+"""
+Backend health checks for startup and GET /health/ready.
+
+The sync MySQL pool, the async MySQL pool, Redis and Elasticsearch are checked at the same
+time, each bounded by HEALTH_CHECK_TIMEOUT, so a dead backend costs one timeout instead of
+stacking up. The first check also opens the clients of this worker (see app/database.py).
+
+MySQL is required: without it the service is "unavailable" and /health/ready answers 503.
+Redis and Elasticsearch are not: without them it is "degraded" but ready, the caches are
+skipped and the searches answer 503 while the MySQL endpoints keep working.
+"""
+import asyncio
+import os
+import time
+
+from app.async_db import async_db_session
+from app.database import db_pool, async_redis_client, get_async_es_client, ES_HOST
+from app.metrics import BACKEND_UP
+
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+# probes from several load balancers share one round of checks
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", 1))
+REQUIRED_BACKENDS = ("mysql", "mysql_async")
+
+_last_report = None
+_last_checked = 0.0
+
+
+def _ping_mysql():
+    db = db_pool.get_connection(timeout=HEALTH_CHECK_TIMEOUT)
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+    finally:
+        db.close()
+
+
+async def _check_mysql():
+    await asyncio.to_thread(_ping_mysql)
+
+
+async def _check_mysql_async():
+    async with async_db_session(timeout=HEALTH_CHECK_TIMEOUT) as db:
+        await db.fetch_one("SELECT 1")
+
+
+async def _check_redis():
+    await async_redis_client.ping()
+
+
+async def _check_elasticsearch():
+    if not await get_async_es_client().ping():
+        raise ConnectionError(f"no answer from {ES_HOST}")
+
+
+CHECKS = {
+    "mysql": _check_mysql,
+    "mysql_async": _check_mysql_async,
+    "redis": _check_redis,
+    "elasticsearch": _check_elasticsearch,
+}
+
+
+async def _run_check(name, check):
+    started = time.perf_counter()
+    result = {"status": "up"}
+    try:
+        await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        result = {"status": "down", "error": f"no answer within {HEALTH_CHECK_TIMEOUT}s"}
+    except Exception as e:
+        # HTTPException (503 from the pools) has no str(), use its detail
+        result = {"status": "down", "error": getattr(e, "detail", None) or str(e) or type(e).__name__}
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    BACKEND_UP.labels(name).set(1 if result["status"] == "up" else 0)
+    return name, result
+
+
+async def check_backends(use_cache: bool = False) -> dict:
+    """{"status": "ready" | "degraded" | "unavailable", "backends": {name: {"status", "ms", "error"}}}"""
+    global _last_report, _last_checked
+    if use_cache and _last_report is not None and time.monotonic() - _last_checked < HEALTH_CACHE_SECONDS:
+        return _last_report
+    backends = dict(await asyncio.gather(*(_run_check(name, check) for name, check in CHECKS.items())))
+    if any(backends[name]["status"] != "up" for name in REQUIRED_BACKENDS):
+        overall = "unavailable"
+    elif any(result["status"] != "up" for result in backends.values()):
+        overall = "degraded"
+    else:
+        overall = "ready"
+    _last_report = {"status": overall, "backends": backends}
+    _last_checked = time.monotonic()
+    return _last_report
+
+
+def print_report(report: dict):
+    for name, result in report["backends"].items():
+        line = f"  {name:<14} {result['status']:<5} {result['ms']:>8} ms"
+        if "error" in result:
+            line += f"  {result['error']}"
+        print(line)
+    if report["status"] == "degraded":
+        print("WARNING: Starting in degraded mode, caches and/or search are unavailable.")
+    elif report["status"] == "unavailable":
+        print("ERROR: MySQL is unreachable, /health/ready answers 503 until it is back.")
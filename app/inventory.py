@@ -0,0 +1,132 @@
+"""
+Redis mirror of Ticket.RemainingCapacity for contention-free reservations.
+
+With INVENTORY_MODE=redis, reserve_ticket takes a seat with an atomic Lua script
+instead of queueing on SELECT ... FOR UPDATE, and MySQL is updated afterwards with a
+conditional UPDATE. The request path (take_seat, release_seats) is async; the bulk and
+reconcile helpers used by the expiry sweeper and the CLI are sync.
+Counters are loaded from MySQL on first use and can be brought
+back in line with MySQL with:
+    python -m app.inventory --reconcile [TicketID ...]
+"""
+import argparse
+import os
+
+from app.database import redis_client, async_redis_client, db_pool
+
+INVENTORY_MODE = os.getenv("INVENTORY_MODE", "mysql")
+# idle counters expire; every take and release pushes the expiry out again, so a counter that is
+# in use is never dropped and reloaded from MySQL while reservations are still in flight
+INVENTORY_TTL = 7 * 86400
+
+# -2: counter not loaded, -1: sold out, otherwise the remaining capacity after taking the seat
+_TAKE_SEAT_SCRIPT = """
+local remaining = redis.call('GET', KEYS[1])
+if not remaining then return -2 end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+if tonumber(remaining) <= 0 then return -1 end
+return redis.call('DECR', KEYS[1])
+"""
+# only give seats back to counters that exist, a missing counter is reloaded from MySQL
+_RELEASE_SEATS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -2 end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+_take_seat = async_redis_client.register_script(_TAKE_SEAT_SCRIPT)
+_release_seats = async_redis_client.register_script(_RELEASE_SEATS_SCRIPT)
+_release_seats_sync = redis_client.register_script(_RELEASE_SEATS_SCRIPT)
+
+
+def enabled() -> bool:
+    return INVENTORY_MODE == "redis"
+
+
+def inventory_key(ticket_id: int) -> str:
+    return f"inventory:{ticket_id}"
+
+
+async def load_counter(db, ticket_id: int):
+    """Copy the MySQL capacity into Redis unless another request already did."""
+    row = await db.fetch_one("SELECT RemainingCapacity FROM Ticket WHERE TicketID = %s", (ticket_id,))
+    if row is None:
+        return None
+    await async_redis_client.set(inventory_key(ticket_id), row['RemainingCapacity'], ex=INVENTORY_TTL, nx=True)
+    return row['RemainingCapacity']
+
+
+async def take_seat(db, ticket_id: int):
+    """Atomically take one seat; returns the new remaining capacity or None when sold out."""
+    remaining = await _take_seat(keys=[inventory_key(ticket_id)], args=[INVENTORY_TTL])
+    if remaining == -2:
+        if await load_counter(db, ticket_id) is None:
+            return None
+        remaining = await _take_seat(keys=[inventory_key(ticket_id)], args=[INVENTORY_TTL])
+    return remaining if remaining >= 0 else None
+
+
+async def release_seats(ticket_id: int, count: int = 1):
+    """Give seats back; returns the new counter value or None if the counter is not loaded."""
+    remaining = await _release_seats(keys=[inventory_key(ticket_id)], args=[count, INVENTORY_TTL])
+    return remaining if remaining >= 0 else None
+
+
+async def reset_counter(db, ticket_id: int):
+    """Overwrite one counter with the MySQL value after Redis and MySQL disagreed."""
+    row = await db.fetch_one("SELECT RemainingCapacity FROM Ticket WHERE TicketID = %s", (ticket_id,))
+    if row is None:
+        await async_redis_client.delete(inventory_key(ticket_id))
+    else:
+        await async_redis_client.set(inventory_key(ticket_id), row['RemainingCapacity'], ex=INVENTORY_TTL)
+    print(f"Inventory reconciled for TicketID {ticket_id}: mysql={row['RemainingCapacity'] if row else None}")
+
+
+def release_seats_bulk(seat_counts: dict):
+    """Give back seats of many tickets with one round trip. seat_counts = {TicketID: seats}"""
+    pipe = redis_client.pipeline(transaction=False)
+    for ticket_id, count in seat_counts.items():
+        _release_seats_sync(keys=[inventory_key(ticket_id)], args=[count, INVENTORY_TTL], client=pipe)
+    pipe.execute()
+
+
+def reconcile(cursor, ticket_ids=None) -> list:
+    """Overwrite Redis counters with MySQL values; returns (TicketID, redis, mysql) for every mismatch."""
+    if ticket_ids is None:
+        ticket_ids = [int(key.split(":")[1]) for key in redis_client.scan_iter("inventory:*", count=1000)]
+    mismatches = []
+    ticket_ids = list(ticket_ids)
+    for i in range(0, len(ticket_ids), 1000):
+        batch = ticket_ids[i:i + 1000]
+        placeholders = ', '.join(['%s'] * len(batch))
+        cursor.execute(f"SELECT TicketID, RemainingCapacity FROM Ticket WHERE TicketID IN ({placeholders})", batch)
+        mysql_values = {row['TicketID']: row['RemainingCapacity'] for row in cursor.fetchall()}
+        redis_values = redis_client.mget([inventory_key(ticket_id) for ticket_id in batch])
+        pipe = redis_client.pipeline()
+        for ticket_id, redis_value in zip(batch, redis_values):
+            mysql_value = mysql_values.get(ticket_id)
+            if mysql_value is None:
+                pipe.delete(inventory_key(ticket_id))
+            elif redis_value is None or int(redis_value) != mysql_value:
+                pipe.set(inventory_key(ticket_id), mysql_value, ex=INVENTORY_TTL)
+            else:
+                continue
+            mismatches.append((ticket_id, redis_value, mysql_value))
+        pipe.execute()
+    for ticket_id, redis_value, mysql_value in mismatches:
+        print(f"Inventory reconciled for TicketID {ticket_id}: redis={redis_value} mysql={mysql_value}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile Redis inventory counters with MySQL")
+    parser.add_argument("--reconcile", action="store_true", required=True)
+    parser.add_argument("ticket_ids", type=int, nargs="*", help="only these tickets (default: every loaded counter)")
+    args = parser.parse_args()
+    connection = db_pool.get_connection()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        found = reconcile(cursor, args.ticket_ids or None)
+        print(f"{len(found)} counters corrected")
+    finally:
+        cursor.close()
+        connection.close()
@@ -1,20 +1,126 @@
-from fastapi import FastAPI
-from app.routers import auth, users, tickets, admin
+import time
+# start of the import-to-ready measurement, before any other import of the app
+IMPORT_STARTED = time.perf_counter()
+
+import os
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response, status
+from fastapi.responses import JSONResponse
+from mysql.connector.errors import PoolError
+import redis
+from elasticsearch import ConnectionError as ESConnectionError
+from app.database import close_clients
+from app.async_db import close_async_db_pool
+from app.routers import auth, users, tickets, admin, analytics
+from app import es_writer, expiry_sweeper, health, principal_cache, password_pool, reference_data, route_graph
+from app.metrics import APP_STARTUP_SECONDS, MetricsMiddleware, mark_worker_dead, metrics_response
+
+# import time, lifespan time and total, filled in once the app is ready
+startup_times = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    lifespan_started = time.perf_counter()
+    # fork the bcrypt processes before any backend socket exists, so they inherit none
+    password_pool.start()
+    # clients are created per worker here, not at import; the checks run concurrently
+    report = await health.check_backends()
+    health.print_report(report)
+    if report["backends"]["mysql"]["status"] == "up":
+        await asyncio.to_thread(reference_data.load)
+    # otherwise reference_data loads on first use; version checks and reloads run in the background
+    refresher_task = asyncio.create_task(reference_data.run_refresher())
+    if report["backends"]["elasticsearch"]["status"] == "up":
+        try:
+            await route_graph.refresh()
+        except Exception as e:
+            # built on the first connection search instead
+            print(f"WARNING: could not build the route graph: {e}")
+    principal_cache.start_invalidation_listener()
+    if os.getenv("ES_WRITER_IN_PROCESS") == "1":
+        es_writer.start_in_background()
+    sweeper_task = None
+    if os.getenv("EXPIRY_SWEEPER_IN_PROCESS") == "1":
+        sweeper_task = asyncio.create_task(expiry_sweeper.run_forever())
+    ready = time.perf_counter()
+    startup_times.update(imports=round(IMPORTED - IMPORT_STARTED, 3), lifespan=round(ready - lifespan_started, 3),
+                         total=round(ready - IMPORT_STARTED, 3))
+    for phase, seconds in startup_times.items():
+        APP_STARTUP_SECONDS.labels(phase).set(seconds)
+    print(f"Worker {os.getpid()} {report['status']} in {startup_times['total']}s "
+          f"(imports {startup_times['imports']}s, backends and warm-up {startup_times['lifespan']}s)")
+    yield
+    refresher_task.cancel()
+    if sweeper_task:
+        sweeper_task.cancel()
+    es_writer.stop()
+    password_pool.shutdown()
+    await close_async_db_pool()
+    await close_clients()
+    mark_worker_dead()
 
 
 app = FastAPI(
     title="Ticketing Service API",
     description="API for searching, reserving, and managing travel tickets.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# per-route latency histograms and a Server-Timing header on every response
+app.add_middleware(MetricsMiddleware)
+
+# code that takes connections straight from db_pool gets a 503 when the pool is saturated or MySQL is down
+@app.exception_handler(PoolError)
+async def pool_exhausted_handler(request: Request, exc: PoolError):
+    print(f"WARNING: {exc}")
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+                        content={"detail": "Database is busy, please try again."})
+
+# degraded mode: endpoints that cannot work without Redis (OTP, redis inventory) or Elasticsearch
+# answer 503 instead of 500 while the MySQL endpoints keep working
+@app.exception_handler(redis.exceptions.ConnectionError)
+@app.exception_handler(redis.exceptions.TimeoutError)
+async def redis_unavailable_handler(request: Request, exc: redis.exceptions.RedisError):
+    print(f"WARNING: Redis is unavailable: {exc}")
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"},
+                        content={"detail": "Service temporarily unavailable, please try again."})
+
+@app.exception_handler(ESConnectionError)
+async def elasticsearch_unavailable_handler(request: Request, exc: ESConnectionError):
+    print(f"WARNING: Elasticsearch is unavailable: {exc}")
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"},
+                        content={"detail": "Search is temporarily unavailable, please try again."})
+
 # Include all routers
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(tickets.router)
 app.include_router(admin.router)
+app.include_router(analytics.router)
 
 @app.get("/", tags=["Root"])
 def read_root():
     """A simple endpoint to check if the API is running."""
-    return {"status": "ok", "message": "Welcome to the Ticketing Service API"}
\ No newline at end of file
+    return {"status": "ok", "message": "Welcome to the Ticketing Service API"}
+
+
+@app.get("/health/ready", tags=["Root"])
+async def readiness(response: Response):
+    """Readiness probe: 200 when MySQL is reachable ("ready" or "degraded" without Redis/ES), 503 otherwise."""
+    report = await health.check_backends(use_cache=True)
+    if report["status"] == "unavailable":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {**report, "pid": os.getpid(), "startup_seconds": startup_times}
+
+
+@app.get("/metrics", tags=["Root"], include_in_schema=False)
+def metrics():
+    """Prometheus metrics: request latency by route, backend call latency, pool waits and cache hit rates."""
+    return metrics_response()
+
+
+IMPORTED = time.perf_counter()
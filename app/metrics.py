@@ -0,0 +1,295 @@
+"""
+Prometheus metrics and a per-request latency breakdown.
+
+MetricsMiddleware times every request by route template. The MySQL, Redis and
+Elasticsearch clients in app/database.py are wrapped so each call is recorded twice: in a
+per-backend histogram, and in the timings of the request that is running (a ContextVar,
+which also reaches sync handlers running in the thread pool). At the end of a request the
+per-backend totals are observed by route and returned in a Server-Timing header, e.g.
+
+    Server-Timing: pool;dur=0.4, mysql;dur=12.1;desc="5 calls", redis;dur=0.9;desc="3 calls", app;dur=15.2
+
+Exported on GET /metrics. With several workers PROMETHEUS_MULTIPROC_DIR must point to a
+directory shared by the workers so /metrics adds up every worker (app/serve.py sets it).
+"""
+import os
+import time
+from contextvars import ContextVar
+
+import redis
+import redis.asyncio as aioredis
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency by route",
+                                 ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+BACKEND_CALL_SECONDS = Histogram("backend_call_duration_seconds", "Duration of single MySQL/Redis/ES calls",
+                                 ["backend", "operation"], buckets=LATENCY_BUCKETS)
+REQUEST_BACKEND_SECONDS = Histogram("request_backend_seconds", "Time one request spent in each backend",
+                                    ["route", "backend"], buckets=LATENCY_BUCKETS)
+DB_POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled MySQL connection",
+                                 buckets=LATENCY_BUCKETS)
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Open MySQL connections by state", ["state"],
+                            multiprocess_mode="livesum")
+DB_POOL_WAITING = Gauge("db_pool_waiting", "Requests waiting for a MySQL connection", multiprocess_mode="livesum")
+DB_POOL_ACQUIRE_FAILURES = Counter("db_pool_acquire_failures_total", "Requests that got no MySQL connection",
+                                   ["reason"])
+BACKEND_UP = Gauge("backend_up", "1 if the last health check reached the backend", ["backend"],
+                   multiprocess_mode="liveall")
+APP_STARTUP_SECONDS = Gauge("app_startup_seconds", "Seconds from importing app.main to ready, by phase", ["phase"],
+                            multiprocess_mode="liveall")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+
+# backend -> [calls, seconds] of the request being handled, None outside of requests
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+def record_backend(backend: str, operation: str, seconds: float):
+    BACKEND_CALL_SECONDS.labels(backend, operation).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(backend, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def record_pool_wait(seconds: float):
+    DB_POOL_WAIT_SECONDS.observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault("pool", [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def record_cache(cache: str, hit: bool, count: int = 1):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+def sql_operation(statement) -> str:
+    words = str(statement).split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+# --- MySQL ---
+class InstrumentedCursor:
+    """Times execute/executemany/fetch* of a mysql.connector cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._operation = "UNKNOWN"
+
+    def _timed(self, operation, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_backend("mysql", operation, time.perf_counter() - started)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._operation = sql_operation(operation)
+        return self._timed(self._operation, self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._operation = sql_operation(operation)
+        return self._timed(self._operation, self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed("FETCH", self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed("FETCH", self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed("FETCH", self._cursor.fetchall)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Pooled connection whose cursors, commits and rollbacks are timed."""
+
+    def __init__(self, connection):
+        object.__setattr__(self, "_connection", connection)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs))
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            self._connection.commit()
+        finally:
+            record_backend("mysql", "COMMIT", time.perf_counter() - started)
+
+    def rollback(self):
+        started = time.perf_counter()
+        try:
+            self._connection.rollback()
+        finally:
+            record_backend("mysql", "ROLLBACK", time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+class InstrumentedPool:
+    """Connection pool whose get_connection() records the wait and hands out instrumented connections."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            connection = self._pool.get_connection(*args, **kwargs)
+        finally:
+            record_pool_wait(time.perf_counter() - started)
+        return InstrumentedConnection(connection)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+
+# --- Redis ---
+class InstrumentedPipeline(redis.client.Pipeline):
+    def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            record_backend("redis", "PIPELINE", time.perf_counter() - started)
+
+
+class InstrumentedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_backend("redis", str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedAsyncPipeline(aioredis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            record_backend("redis", "PIPELINE", time.perf_counter() - started)
+
+
+class InstrumentedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            record_backend("redis", str(args[0]).upper(), time.perf_counter() - started)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# --- Elasticsearch ---
+def _es_operation(method: str, path: str) -> str:
+    # "/tickets/_search" -> "_search", "/tickets/_update/12" -> "_update"; keeps label values bounded
+    for part in reversed(path.split("?")[0].split("/")):
+        if part.startswith("_"):
+            return part
+    return method
+
+
+class InstrumentedElasticsearch(Elasticsearch):
+    def perform_request(self, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().perform_request(method, path, **kwargs)
+        finally:
+            record_backend("elasticsearch", _es_operation(method, path), time.perf_counter() - started)
+
+
+class InstrumentedAsyncElasticsearch(AsyncElasticsearch):
+    async def perform_request(self, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().perform_request(method, path, **kwargs)
+        finally:
+            record_backend("elasticsearch", _es_operation(method, path), time.perf_counter() - started)
+
+
+# --- ASGI middleware and endpoint ---
+def _server_timing(timings: dict, total_seconds: float) -> str:
+    parts = []
+    for backend, (calls, seconds) in timings.items():
+        part = f"{backend};dur={seconds * 1000:.1f}"
+        if backend != "pool":
+            part += f';desc="{calls} calls"'
+        parts.append(part)
+    parts.append(f"app;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streaming responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = _server_timing(timings, time.perf_counter() - started)
+                message = {**message, "headers": list(message.get("headers", [])) +
+                           [(b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            # the route template, not the raw path, so /tickets/tickets/{ticket_id} is one series
+            route_name = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route_name, str(status_code)).observe(
+                time.perf_counter() - started)
+            for backend, (_, seconds) in timings.items():
+                REQUEST_BACKEND_SECONDS.labels(route_name, backend).observe(seconds)
+
+
+def mark_worker_dead():
+    """Drop this worker's live gauges from the shared directory when it shuts down (e.g. after --max-requests)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_response() -> Response:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,152 @@
+"""
+Applies the numbered SQL files in migrations/ (001_name.sql, 002_name.sql, ...) in order.
+
+Applied versions are recorded in SchemaMigrations. MySQL commits every DDL statement on
+its own, so a migration that failed halfway is simply run again: "already exists" errors
+(table, column, index, trigger) are skipped, which makes every file safe to re-run.
+A named lock keeps two deploys from migrating at the same time.
+
+    python -m app.migrate            apply pending migrations
+    python -m app.migrate --status   list applied and pending migrations
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from app.database import db_pool
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+LOCK_NAME = "schema_migrations"
+LOCK_TIMEOUT_SECONDS = 60
+
+# the object a statement creates is already there, i.e. the statement ran before
+ALREADY_APPLIED_ERRORS = {
+    errorcode.ER_TABLE_EXISTS_ERROR,      # 1050
+    errorcode.ER_DUP_FIELDNAME,           # 1060
+    errorcode.ER_DUP_KEYNAME,             # 1061
+    errorcode.ER_TRG_ALREADY_EXISTS,      # 1359
+    errorcode.ER_CANT_DROP_FIELD_OR_KEY,  # 1091
+}
+
+CREATE_HISTORY_TABLE = """
+    CREATE TABLE IF NOT EXISTS SchemaMigrations (
+        Version INT PRIMARY KEY,
+        Name VARCHAR(100) NOT NULL,
+        Checksum CHAR(64) NOT NULL,
+        AppliedAt DATETIME NOT NULL,
+        DurationMs INT NOT NULL
+    )
+"""
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path), ...] sorted by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {directory}")
+    return migrations
+
+
+def split_statements(sql: str):
+    """Split a migration file on ';' at the end of a line; '--' comment lines are dropped."""
+    statements, current = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith("--") or not line.strip():
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current).rstrip().rstrip(";"))
+            current = []
+    if current:
+        statements.append("\n".join(current))
+    return statements
+
+
+def checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def applied_migrations(cursor):
+    cursor.execute("SELECT Version, Name, Checksum, AppliedAt FROM SchemaMigrations ORDER BY Version")
+    return {row[0]: row for row in cursor.fetchall()}
+
+
+def apply_migration(cursor, version, name, sql):
+    started = time.perf_counter()
+    skipped = 0
+    for statement in split_statements(sql):
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as e:
+            if e.errno not in ALREADY_APPLIED_ERRORS:
+                raise
+            skipped += 1
+            print(f"  already applied, skipped: {e.msg}")
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    cursor.execute("INSERT INTO SchemaMigrations (Version, Name, Checksum, AppliedAt, DurationMs) "
+                   "VALUES (%s, %s, %s, UTC_TIMESTAMP(), %s)", (version, name, checksum(sql), duration_ms))
+    print(f"Applied {version:03d}_{name} in {duration_ms} ms ({skipped} statements already applied)")
+
+
+def migrate(status_only=False) -> int:
+    """Apply (or with status_only, list) pending migrations; returns how many are pending/applied."""
+    db = db_pool.get_connection()
+    db.autocommit = True
+    cursor = db.cursor()
+    locked = False
+    try:
+        cursor.execute(CREATE_HISTORY_TABLE)
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))
+        locked = cursor.fetchone()[0] == 1
+        if not locked:
+            raise RuntimeError("Another migration run holds the lock, try again later.")
+        applied = applied_migrations(cursor)
+        pending = 0
+        for version, name, path in discover():
+            with open(path, encoding="utf-8") as f:
+                sql = f.read()
+            if version in applied:
+                if applied[version][2] != checksum(sql):
+                    print(f"WARNING: {version:03d}_{name} changed after it was applied; add a new migration instead")
+                if status_only:
+                    print(f"  applied  {version:03d}_{name}  {applied[version][3]}")
+                continue
+            pending += 1
+            if status_only:
+                print(f"  pending  {version:03d}_{name}")
+            else:
+                apply_migration(cursor, version, name, sql)
+        if not pending:
+            print("Schema is up to date.")
+        return pending
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+        cursor.close()
+        db.autocommit = False
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the SQL migrations in migrations/.")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = parser.parse_args()
+    try:
+        migrate(status_only=args.status)
+    except (mysql.connector.Error, RuntimeError, ValueError) as e:
+        print(f"Migration FAILED: {e}")
+        sys.exit(1)
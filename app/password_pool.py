@@ -0,0 +1,62 @@
+"""
+Runs bcrypt hashing and verification in a bounded process pool.
+
+bcrypt costs 100-300ms of CPU per call. Running it in the request thread starves every
+other endpoint during a login storm, so the auth handlers await these functions instead.
+When PASSWORD_HASH_QUEUE calls are already waiting, new ones are rejected with 503 at once.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+
+from app import Security
+
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE", HASH_WORKERS * 8))
+
+_executor = None
+_in_flight = 0
+
+
+def start():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        # fork the workers now instead of on the first login
+        for _ in range(HASH_WORKERS):
+            _executor.submit(os.getpid)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    global _in_flight
+    if _in_flight >= HASH_QUEUE_SIZE:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Too many login requests, please try again.",
+                            headers={"Retry-After": "1"})
+    start()
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def verify_password(plain_password, hashed_password) -> bool:
+    return await _run(Security.verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash(password) -> str:
+    return await _run(Security.get_password_hash, password)
+
+
+def get_stats() -> dict:
+    return {"workers": HASH_WORKERS, "queue_size": HASH_QUEUE_SIZE, "in_flight": _in_flight}
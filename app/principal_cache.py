@@ -0,0 +1,177 @@
+"""
+Two-tier cache of the authenticated user resolved by get_current_user.
+
+Tier 1 is a small in-process TTL LRU, tier 2 is Redis (principal:{token subject}).
+Entries never outlive the token that loaded them. Profile updates, role changes and
+account deactivation call invalidate_principal(), which deletes the Redis entry, bumps the
+subject's generation and tells every API process over pub/sub to drop its local copy.
+
+A miss reads the generation together with the entry, and store_principal() only stores the
+row loaded from MySQL if the generation is still the same. So a request that loaded the
+user just before an admin deactivated them cannot cache the stale "active" row again.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.database import redis_client, async_redis_client
+from app.metrics import record_cache
+
+LOCAL_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+LOCAL_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_LOCAL_TTL", 60))
+INVALIDATION_CHANNEL = "principalInvalidations"
+# generations only have to outlive a request that is between its cache miss and its store
+GENERATION_TTL_SECONDS = 86400
+
+# KEYS[1] entry, KEYS[2] generation; stores only if nothing was invalidated since the miss
+_STORE_IF_CURRENT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after their own TTL."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = TTLCache(LOCAL_MAX_ENTRIES)
+
+
+# the hash tag keeps an entry and its generation in one cluster slot, the store script uses both
+def principal_key(subject: str) -> str:
+    return f"principal:{{{subject}}}"
+
+
+def generation_key(subject: str) -> str:
+    return f"principalGeneration:{{{subject}}}"
+
+
+_store_if_current = async_redis_client.register_script(_STORE_IF_CURRENT_SCRIPT)
+
+
+async def get_principal(subject: str):
+    """Return (user, generation). On a miss user is None and generation goes to store_principal();
+    generation is None when Redis could not be asked (nothing is stored then)."""
+    user = _local.get(subject)
+    if user is not None:
+        stats["local_hits"] += 1
+        record_cache("principal_local", True)
+        return user, None
+    try:
+        cached, ttl, generation = await (async_redis_client.pipeline(transaction=False)
+                                         .get(principal_key(subject)).ttl(principal_key(subject))
+                                         .get(generation_key(subject)).execute())
+        generation = generation or "0"
+    except Exception as e:
+        print(f"WARNING: principal cache lookup failed: {e}")
+        cached = generation = None
+    if cached is None:
+        stats["misses"] += 1
+        record_cache("principal_local", False)
+        record_cache("principal_redis", False)
+        return None, generation
+    stats["redis_hits"] += 1
+    record_cache("principal_local", False)
+    record_cache("principal_redis", True)
+    user = json.loads(cached)
+    _local.set(subject, user, min(LOCAL_TTL_SECONDS, max(ttl, 1)))
+    return user, None
+
+
+async def store_principal(subject: str, user: dict, token_expires_at: float, generation):
+    """Cache a user loaded from MySQL until the token that asked for it expires, unless the
+    subject was invalidated after get_principal() read generation."""
+    ttl = int(token_expires_at - time.time())
+    if ttl <= 0 or generation is None:
+        return
+    # local copy first: an invalidation published after the script ran still finds and drops it
+    _local.set(subject, user, min(LOCAL_TTL_SECONDS, ttl))
+    try:
+        stored = await _store_if_current(keys=[principal_key(subject), generation_key(subject)],
+                                         args=[generation, json.dumps(user), ttl])
+    except Exception as e:
+        print(f"WARNING: principal cache store failed: {e}")
+        stored = 0
+    if not stored:
+        _local.delete(subject)
+
+
+async def invalidate_principal(*subjects: str):
+    subjects = [subject for subject in subjects if subject]
+    if not subjects:
+        return
+    for subject in subjects:
+        _local.delete(subject)
+    pipe = async_redis_client.pipeline()
+    pipe.delete(*[principal_key(subject) for subject in subjects])
+    for subject in subjects:
+        pipe.incr(generation_key(subject))
+        pipe.expire(generation_key(subject), GENERATION_TTL_SECONDS)
+    for subject in subjects:
+        pipe.publish(INVALIDATION_CHANNEL, subject)
+    await pipe.execute()
+
+
+def _listen_for_invalidations():
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # entries may have been invalidated while we were not subscribed
+            _local.clear()
+            for message in pubsub.listen():
+                _local.delete(message["data"])
+        except Exception as e:
+            print(f"WARNING: principal invalidation listener lost Redis: {e}")
+            time.sleep(1)
+
+
+def start_invalidation_listener():
+    thread = threading.Thread(target=_listen_for_invalidations, name="principal-invalidations", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_stats() -> dict:
+    total = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+    hits = stats["local_hits"] + stats["redis_hits"]
+    return {**stats, "hit_ratio": round(hits / total, 4) if total else 0.0}
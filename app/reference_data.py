@@ -0,0 +1,146 @@
+"""
+In-memory copy of the small, rarely changing tables: City, TransportCompany and ReportSubject.
+
+The tables are loaded once at startup into an immutable snapshot with name -> id and
+id -> name maps. A snapshot is replaced when it is older than REFDATA_TTL seconds or when
+the refdata:version counter in Redis changes (bump_version() after editing the tables).
+
+Async handlers only read the snapshot in memory (snapshot() and the lookup helpers). The
+version check and the reload run in run_refresher(), a task of the app lifespan, and the
+MySQL queries run in a worker thread, so a slow Redis or a reload never blocks the event loop.
+get() is the blocking variant for sync code (threadpool routes, CLI tools).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from app.database import db_pool, redis_client, async_redis_client
+
+REFDATA_VERSION_KEY = "refdata:version"
+REFDATA_TTL = int(os.getenv("REFDATA_TTL", 3600))
+# how often the Redis version counter is looked at
+VERSION_CHECK_SECONDS = 10
+
+
+class ReferenceSnapshot:
+    def __init__(self, cities, companies, report_subjects, version):
+        self.city_names = MappingProxyType({row['CityID']: row['CityName'] for row in cities})
+        self.city_ids = MappingProxyType({row['CityName']: row['CityID'] for row in cities})
+        self.company_names = MappingProxyType({row['TransportCompanyID']: row['CompanyName'] for row in companies})
+        self.company_ids = MappingProxyType({row['CompanyName']: row['TransportCompanyID'] for row in companies})
+        self.report_subject_names = MappingProxyType({row['ReportSubjectID']: row['SubjectName'] for row in report_subjects})
+        self.report_subject_ids = MappingProxyType({row['SubjectName']: row['ReportSubjectID'] for row in report_subjects})
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # /tickets/cities is served straight from these
+        self.cities_json = json.dumps([{"CityID": row['CityID'], "CityName": row['CityName']} for row in cities])
+        self.cities_etag = '"' + hashlib.sha1(self.cities_json.encode()).hexdigest() + '"'
+
+
+_snapshot = None
+_last_version_check = 0.0
+_lock = threading.Lock()
+_async_lock = asyncio.Lock()
+
+
+def _read_version():
+    try:
+        return redis_client.get(REFDATA_VERSION_KEY) or "0"
+    except Exception as e:
+        print(f"WARNING: could not read reference data version: {e}")
+        return None
+
+
+def load() -> ReferenceSnapshot:
+    """Read the three tables and replace the current snapshot."""
+    global _snapshot, _last_version_check
+    version = _read_version()
+    db = db_pool.get_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT CityID, CityName FROM City ORDER BY CityID")
+        cities = cursor.fetchall()
+        cursor.execute("SELECT TransportCompanyID, CompanyName FROM TransportCompany ORDER BY TransportCompanyID")
+        companies = cursor.fetchall()
+        cursor.execute("SELECT ReportSubjectID, SubjectName FROM ReportSubject ORDER BY ReportSubjectID")
+        report_subjects = cursor.fetchall()
+    finally:
+        cursor.close()
+        db.close()
+    _snapshot = ReferenceSnapshot(cities, companies, report_subjects, version)
+    _last_version_check = time.monotonic()
+    print(f"Reference data loaded: {len(cities)} cities, {len(companies)} companies, "
+          f"{len(report_subjects)} report subjects")
+    return _snapshot
+
+
+def get() -> ReferenceSnapshot:
+    """Current snapshot, reloaded first if it expired or its version was bumped."""
+    global _last_version_check
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - snapshot.loaded_at < REFDATA_TTL:
+        if now - _last_version_check < VERSION_CHECK_SECONDS:
+            return snapshot
+        _last_version_check = now
+        version = _read_version()
+        if version is None or version == snapshot.version:
+            return snapshot
+    with _lock:
+        # another thread may have reloaded while we waited
+        if _snapshot is not snapshot:
+            return _snapshot
+        return load()
+
+
+def bump_version():
+    """Tell every API process to reload the reference tables."""
+    redis_client.incr(REFDATA_VERSION_KEY)
+
+
+async def snapshot() -> ReferenceSnapshot:
+    """Current snapshot for async code; only the very first load (MySQL was down at startup) waits, in a thread."""
+    if _snapshot is None:
+        async with _async_lock:
+            if _snapshot is None:
+                await asyncio.to_thread(load)
+    return _snapshot
+
+
+async def run_refresher():
+    """Reload the snapshot in the background when it expired or its version was bumped."""
+    global _last_version_check
+    while True:
+        await asyncio.sleep(VERSION_CHECK_SECONDS)
+        current = _snapshot
+        if current is None:
+            continue
+        try:
+            version = await async_redis_client.get(REFDATA_VERSION_KEY) or "0"
+        except Exception as e:
+            print(f"WARNING: could not read reference data version: {e}")
+            version = current.version
+        _last_version_check = time.monotonic()
+        if version == current.version and time.monotonic() - current.loaded_at < REFDATA_TTL:
+            continue
+        try:
+            await asyncio.to_thread(load)
+        except Exception as e:
+            # keep serving the old snapshot, the next round tries again
+            print(f"WARNING: could not reload reference data: {e}")
+
+
+async def city_id(name: str):
+    return (await snapshot()).city_ids.get(name)
+
+
+async def city_name(city_id: int):
+    return (await snapshot()).city_names.get(city_id)
+
+
+async def report_subject_id(name: str):
+    return (await snapshot()).report_subject_ids.get(name)
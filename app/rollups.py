@@ -0,0 +1,160 @@
+"""
+Daily sales rollups behind the /admin/analytics endpoints (tables in migrations/002_sales_rollups.sql).
+
+pay_for_ticket, cancel_ticket, report_issue and the admin status change await the record_*
+functions with their own AsyncDB before they commit, so a rollup row changes in the same
+transaction as the reservation it counts. Sales and their later cancellations are counted
+on the day of the successful payment.
+
+Rebuild everything from Payment, Reservation, Ticket and Reports with:
+    python -m app.rollups --backfill
+"""
+import argparse
+import time
+
+from app.database import db_pool
+
+VEHICLE_TYPE_SQL = """CASE
+            WHEN at.TicketID IS NOT NULL THEN 'airplane'
+            WHEN bt.TicketID IS NOT NULL THEN 'bus'
+            WHEN tt.TicketID IS NOT NULL THEN 'train'
+            ELSE 'unknown'
+        END"""
+
+_TICKET_JOINS = """
+    JOIN Ticket t ON r.TicketID = t.TicketID
+    LEFT JOIN AirplaneTicket at ON t.TicketID = at.TicketID
+    LEFT JOIN BusTicket bt ON t.TicketID = bt.TicketID
+    LEFT JOIN TrainTicket tt ON t.TicketID = tt.TicketID
+"""
+
+_PAID_RESERVATION = f"""
+    FROM Reservation r
+    JOIN Payment p ON p.ReservationID = r.ReservationID AND p.PaymentStatus = 'Successful'
+    {_TICKET_JOINS}
+"""
+
+
+async def record_sale(db, reservation_id: int, paid_at):
+    """Count a reservation that was just paid at paid_at."""
+    await db.execute(f"""
+        INSERT INTO SalesDailyRollup (Day, Origin, Destination, TransportCompanyID, VehicleType, SoldCount, SoldAmount)
+        SELECT DATE(%s), t.Origin, t.Destination, t.TransportCompanyID, {VEHICLE_TYPE_SQL}, 1, t.Price
+        FROM Reservation r {_TICKET_JOINS}
+        WHERE r.ReservationID = %s
+        ON DUPLICATE KEY UPDATE SoldCount = SoldCount + VALUES(SoldCount), SoldAmount = SoldAmount + VALUES(SoldAmount)
+    """, (paid_at, reservation_id))
+    await db.execute(f"""
+        INSERT INTO UserDailyRollup (Day, UserID, PurchaseCount, PurchaseAmount)
+        SELECT DATE(%s), r.UserID, 1, t.Price
+        FROM Reservation r {_TICKET_JOINS}
+        WHERE r.ReservationID = %s
+        ON DUPLICATE KEY UPDATE PurchaseCount = PurchaseCount + VALUES(PurchaseCount),
+                                PurchaseAmount = PurchaseAmount + VALUES(PurchaseAmount)
+    """, (paid_at, reservation_id))
+
+
+async def record_cancellation(db, reservation_id: int, sign: int = 1):
+    """Count (sign=1) or uncount (sign=-1) the cancellation of a paid reservation; unpaid ones are ignored."""
+    await db.execute(f"""
+        INSERT INTO SalesDailyRollup (Day, Origin, Destination, TransportCompanyID, VehicleType,
+                                      CancelledCount, CancelledAmount)
+        SELECT DATE(p.PaymentTime), t.Origin, t.Destination, t.TransportCompanyID, {VEHICLE_TYPE_SQL}, %s, %s * t.Price
+        {_PAID_RESERVATION}
+        WHERE r.ReservationID = %s
+        ON DUPLICATE KEY UPDATE CancelledCount = CancelledCount + VALUES(CancelledCount),
+                                CancelledAmount = CancelledAmount + VALUES(CancelledAmount)
+    """, (sign, sign, reservation_id))
+    await db.execute(f"""
+        INSERT INTO UserDailyRollup (Day, UserID, CancelledCount, CancelledAmount)
+        SELECT DATE(p.PaymentTime), r.UserID, %s, %s * t.Price
+        {_PAID_RESERVATION}
+        WHERE r.ReservationID = %s
+        ON DUPLICATE KEY UPDATE CancelledCount = CancelledCount + VALUES(CancelledCount),
+                                CancelledAmount = CancelledAmount + VALUES(CancelledAmount)
+    """, (sign, sign, reservation_id))
+
+
+# a reservation with a successful payment is a sale; it stays one when it is cancelled (and refunded)
+SALE_STATUSES = ('Paid', 'Cancelled')
+
+
+async def record_status_change(db, reservation_id: int, old_status: str, new_status: str):
+    """Count an admin status edit like --backfill would see it.
+
+    A sale is a reservation with a successful payment, cancelled while its status is 'Cancelled'. So a
+    paid reservation can only move between 'Paid' and 'Cancelled', and an unpaid one cannot become
+    'Paid' (payments go through /tickets/pay, which writes the Payment row). Other edits raise ValueError.
+    """
+    if old_status == new_status:
+        return
+    paid = await db.fetch_one("SELECT 1 AS Paid FROM Payment WHERE ReservationID = %s AND PaymentStatus = 'Successful' "
+                              "LIMIT 1", (reservation_id,))
+    if paid and new_status not in SALE_STATUSES:
+        raise ValueError(f"Reservation {reservation_id} is paid, its status can only be 'Paid' or 'Cancelled'")
+    if not paid and new_status == 'Paid':
+        raise ValueError(f"Reservation {reservation_id} has no successful payment, it cannot be 'Paid'")
+    if new_status == 'Cancelled':
+        await record_cancellation(db, reservation_id, 1)
+    elif old_status == 'Cancelled':
+        await record_cancellation(db, reservation_id, -1)
+
+
+async def record_report(db, user_id: int, report_subject_id: int):
+    await db.execute("""
+        INSERT INTO ReportSubjectRollup (ReportSubject, ReportingUserID, ReportCount) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE ReportCount = ReportCount + 1
+    """, (report_subject_id, user_id))
+
+
+def backfill():
+    """Rebuild all rollup tables from the base tables in one transaction."""
+    started = time.perf_counter()
+    db = db_pool.get_connection()
+    cursor = db.cursor()
+    try:
+        for table in ("SalesDailyRollup", "UserDailyRollup", "ReportSubjectRollup"):
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"""
+            INSERT INTO SalesDailyRollup (Day, Origin, Destination, TransportCompanyID, VehicleType,
+                                          SoldCount, SoldAmount, CancelledCount, CancelledAmount)
+            SELECT DATE(p.PaymentTime), t.Origin, t.Destination, t.TransportCompanyID, {VEHICLE_TYPE_SQL},
+                   COUNT(*), SUM(t.Price),
+                   SUM(r.ReservationStatus = 'Cancelled'), SUM(IF(r.ReservationStatus = 'Cancelled', t.Price, 0))
+            {_PAID_RESERVATION}
+            GROUP BY 1, 2, 3, 4, 5
+        """)
+        sales_rows = cursor.rowcount
+        cursor.execute(f"""
+            INSERT INTO UserDailyRollup (Day, UserID, PurchaseCount, PurchaseAmount, CancelledCount, CancelledAmount)
+            SELECT DATE(p.PaymentTime), r.UserID, COUNT(*), SUM(t.Price),
+                   SUM(r.ReservationStatus = 'Cancelled'), SUM(IF(r.ReservationStatus = 'Cancelled', t.Price, 0))
+            {_PAID_RESERVATION}
+            GROUP BY 1, 2
+        """)
+        user_rows = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO ReportSubjectRollup (ReportSubject, ReportingUserID, ReportCount)
+            SELECT ReportSubject, ReportingUserID, COUNT(*) FROM Reports
+            WHERE ReportSubject IS NOT NULL
+            GROUP BY ReportSubject, ReportingUserID
+        """)
+        report_rows = cursor.rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+        db.close()
+    print(f"Rollups rebuilt in {time.perf_counter() - started:.2f}s: {sales_rows} sales rows, "
+          f"{user_rows} user rows, {report_rows} report rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup tables.")
+    parser.add_argument("--backfill", action="store_true", help="rebuild every rollup table from scratch")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.error("nothing to do, pass --backfill")
+    backfill()
@@ -0,0 +1,159 @@
+"""
+City-pair route graph of the tickets index, used by the connection search (app/search_connections.py).
+
+There is an edge origin -> destination while the index has a ticket with seats left on that pair
+departing today or later. The edge carries the lowest such price, a lower bound for every
+itinerary that uses it.
+
+The graph is built with one composite aggregation paged over Origin/Destination and is then kept
+up to date incrementally. Every capacity change appends its city pair to the routeGraph:changes
+stream (search_cache bumps the route versions in the same pipeline). Each process re-aggregates
+only the pairs added since its last check, at most every ROUTE_GRAPH_CHECK_SECONDS.
+sync_to_elastic bumps routeGraph:version after indexing, because new tickets can add pairs, and
+that forces a full rebuild. The graph is also rebuilt every ROUTE_GRAPH_TTL seconds, so routes
+whose tickets have all departed drop out.
+"""
+import asyncio
+import os
+import time
+from datetime import date
+
+from app.database import async_redis_client, redis_client, get_async_es_client
+
+ROUTE_GRAPH_VERSION_KEY = "routeGraph:version"
+ROUTE_CHANGES_STREAM = "routeGraph:changes"
+ROUTE_CHANGES_MAXLEN = 10000
+ROUTE_GRAPH_TTL = int(os.getenv("ROUTE_GRAPH_TTL", 3600))
+CHECK_SECONDS = float(os.getenv("ROUTE_GRAPH_CHECK_SECONDS", 5))
+COMPOSITE_PAGE_SIZE = 1000
+# more changes than this since the last check are cheaper to handle with a rebuild
+MAX_INCREMENTAL_CHANGES = 500
+
+
+class RouteGraph:
+    """Immutable snapshot; a refresh builds a new one and swaps it in."""
+
+    def __init__(self, edges: dict, version, last_change_id, built_at=None):
+        # (origin, destination) -> lowest price
+        self.edges = edges
+        self.outgoing = {}
+        self.incoming = {}
+        for (origin, destination), price in edges.items():
+            self.outgoing.setdefault(origin, {})[destination] = price
+            self.incoming.setdefault(destination, {})[origin] = price
+        self.version = version
+        # id of the last routeGraph:changes entry already applied, None if Redis was unavailable
+        self.last_change_id = last_change_id
+        # time of the last full build, incremental updates keep it
+        self.built_at = built_at if built_at is not None else time.monotonic()
+
+
+_graph = None
+_last_check = 0.0
+_lock = asyncio.Lock()
+
+
+def queue_route_change(pipe, origin: str, destination: str):
+    """Add a changed city pair to a (sync or async) Redis pipeline; the caller executes it."""
+    pipe.xadd(ROUTE_CHANGES_STREAM, {"Origin": origin, "Destination": destination},
+              maxlen=ROUTE_CHANGES_MAXLEN, approximate=True)
+
+
+def request_rebuild():
+    """Tell every API process to rebuild its graph, e.g. after new tickets were indexed."""
+    redis_client.incr(ROUTE_GRAPH_VERSION_KEY)
+
+
+def _edge_query(pairs=None) -> dict:
+    filters = [
+        {"range": {"RemainingCapacity": {"gt": 0}}},
+        {"range": {"DepartureDateTime": {"gte": f"{date.today()}T00:00:00"}}}
+    ]
+    if pairs:
+        filters.append({"bool": {"should": [
+            {"bool": {"filter": [{"term": {"Origin": origin}}, {"term": {"Destination": destination}}]}}
+            for origin, destination in pairs
+        ], "minimum_should_match": 1}})
+    return {"bool": {"filter": filters}}
+
+
+async def _read_edges(es, pairs=None) -> dict:
+    """(origin, destination) -> lowest price of all pairs, or of the given pairs only."""
+    edges = {}
+    after = None
+    while True:
+        composite = {"size": COMPOSITE_PAGE_SIZE, "sources": [{"origin": {"terms": {"field": "Origin"}}},
+                                                              {"destination": {"terms": {"field": "Destination"}}}]}
+        if after:
+            composite["after"] = after
+        response = await es.search(index="tickets", size=0, query=_edge_query(pairs), aggs={
+            "pairs": {"composite": composite, "aggs": {"min_price": {"min": {"field": "Price"}}}}})
+        result = response["aggregations"]["pairs"]
+        for bucket in result["buckets"]:
+            edges[(bucket["key"]["origin"], bucket["key"]["destination"])] = bucket["min_price"]["value"]
+        after = result.get("after_key")
+        if not after or len(result["buckets"]) < COMPOSITE_PAGE_SIZE:
+            return edges
+
+
+async def _read_state(after_id):
+    """(version, changes since after_id); the latest change only when after_id is None. None, None if Redis is down."""
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.get(ROUTE_GRAPH_VERSION_KEY)
+    if after_id is None:
+        pipe.xrevrange(ROUTE_CHANGES_STREAM, count=1)
+    else:
+        pipe.xrange(ROUTE_CHANGES_STREAM, min=f"({after_id}", count=MAX_INCREMENTAL_CHANGES + 1)
+    try:
+        version, changes = await pipe.execute()
+    except Exception as e:
+        print(f"WARNING: could not read the route graph state: {e}")
+        return None, None
+    return version or "0", changes
+
+
+async def _build(es) -> RouteGraph:
+    # read the stream position first, changes made during the build are applied again by the next check
+    version, latest = await _read_state(None)
+    last_change_id = (latest[0][0] if latest else "0-0") if version is not None else None
+    edges = await _read_edges(es)
+    print(f"Route graph built: {len(edges)} city pairs, {len({pair[0] for pair in edges})} origins")
+    return RouteGraph(edges, version, last_change_id)
+
+
+async def refresh() -> RouteGraph:
+    """Rebuild the graph or apply the changed pairs, whatever is due."""
+    global _graph, _last_check
+    es = get_async_es_client()
+    graph = _graph
+    if graph is None or time.monotonic() - graph.built_at >= ROUTE_GRAPH_TTL:
+        _graph = await _build(es)
+    else:
+        version, changes = await _read_state(graph.last_change_id)
+        if version is None:
+            # Redis is down: keep serving the graph we have
+            pass
+        elif graph.last_change_id is None or version != graph.version or len(changes) > MAX_INCREMENTAL_CHANGES:
+            _graph = await _build(es)
+        elif changes:
+            pairs = {(fields["Origin"], fields["Destination"]) for _, fields in changes}
+            edges = {pair: price for pair, price in graph.edges.items() if pair not in pairs}
+            edges.update(await _read_edges(es, pairs))
+            _graph = RouteGraph(edges, graph.version, changes[-1][0], graph.built_at)
+    _last_check = time.monotonic()
+    return _graph
+
+
+def _is_fresh() -> bool:
+    now = time.monotonic()
+    return _graph is not None and now - _graph.built_at < ROUTE_GRAPH_TTL and now - _last_check < CHECK_SECONDS
+
+
+async def get() -> RouteGraph:
+    """Current graph, refreshed first when a check is due."""
+    if not _is_fresh():
+        async with _lock:
+            # another request may have refreshed while we waited
+            if not _is_fresh():
+                await refresh()
+    return _graph
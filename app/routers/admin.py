@@ -1,122 +1,75 @@
+import csv
+import io
 import json
-from fastapi import APIRouter, Depends, HTTPException, status
-import mysql.connector
-from typing import List
+import redis
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 
-from app.database import get_db_connection, redis_client
+from app.async_db import AsyncDB, MySQLError, async_db_session, get_async_db, get_stats as get_async_db_stats
+from app.database import async_redis_client, db_pool
 from app.dependencies import get_current_admin_user, get_current_user
-from app.schemas import AdminReservationUpdate, ReportResponse, CancelledTicketReportResponse, PaymentResponse, UncheckedReportResponse
+from app.search_cache import report_cache_version_key, bump_report_cache_versions, get_stats as get_search_cache_stats
+from app.elastic_utils import get_queue_stats
+from app.expiry_sweeper import get_stats as get_expiry_sweeper_stats
+from app import reference_data, rollups
+from app.password_pool import get_stats as get_password_pool_stats
+from app.principal_cache import invalidate_principal, get_stats as get_principal_cache_stats
+from app.schemas import AdminUserUpdate, AdminReservationUpdate, ReportResponse, CancelledTicketReportResponse, PaymentResponse, UncheckedReportResponse
 
 router = APIRouter(prefix="/admin", tags=["Admin Management"], dependencies=[Depends(get_current_admin_user)])
 
-#(API 10,14) Get list of all submitted reports
-@router.get("/reports", response_model=List[ReportResponse])
-def get_all_reports(db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    try:
-        #check redis first
-        cache_key = "allReports"
-        if cashed_result := redis_client.get(cache_key):
-            return json.loads(cashed_result)
-
-        query = """
-           SELECT
-                u.FirstName,
-                u.LastName,
-                u.Email,
-                c1.CityName AS OriginCity,
-                c2.CityName AS DestinationCity,
-                tc.CompanyName,
-                rsb.SubjectName AS ReportSubject,
-                r.ReportText,
-                r.ReportStatus
-            FROM Reports r
-            JOIN User u ON r.ReportingUserID = u.UserID
-            LEFT JOIN Reservation rs ON r.ReservationID = rs.ReservationID
-            LEFT JOIN Ticket t ON rs.TicketID = t.TicketID
-            LEFT JOIN City c1 ON t.Origin = c1.CityID
-            LEFT JOIN City c2 ON t.Destination = c2.CityID
-            LEFT JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
-            LEFT JOIN ReportSubject rsb ON r.ReportSubject = rsb.ReportSubjectID
-            ORDER BY r.ReportID DESC
-        """
-        cursor.execute(query)
-        reports = cursor.fetchall()
-        #cash reports to redis
-        redis_client.set(cache_key, json.dumps(reports), ex=600)
-
+# --- Report queries: keyset pagination and filters ---
+# Pages are fetched with "WHERE <key> < cursor ORDER BY <key> DESC LIMIT n", so memory per request
+# is bounded by the page size. The key of the last row is returned in the X-Next-Cursor header.
+REPORT_PAGE_CACHE_TTL = 600
+MAX_PAGE_SIZE = 500
 
-        return reports
-
-    except mysql.connector.Error as e:
-        print(f"DB error in get_all_reports: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch reports.")
-    finally:
-        cursor.close()
-
-#(API 10 & 14) Admin: Manually update the status of any reservation(might cause problem with redis)
-@router.put("/reservations/{reservation_id}")
-def update_reservation_status(reservation_id: int, update: AdminReservationUpdate, db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    cursor.execute("UPDATE Reservation SET ReservationStatus = %s WHERE ReservationID = %s", (update.NewStatus, reservation_id))
-    if cursor.rowcount == 0:
-        cursor.close()
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
-    db.commit()
-    cursor.close()
-    return {"message": f"Reservation {reservation_id} status updated to '{update.NewStatus}'."}
-
-@router.get("/cancellReports",response_model=List[CancelledTicketReportResponse])
-def get_all_cancelled_tickets(db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    try:
-        cash_key = "allCancelledReports"
-        if cache_data := redis_client.get(cash_key):
-            return json.loads(cache_data)
-
-        query = """SELECT 
-                t.TicketID,
-                c1.CityName AS Origin,
-                c2.CityName AS Destination,
-                t.DepartureDate,
-                t.DepartureTime,
-                t.ArrivalDate,
-                t.ArrivalTime,
-                t.Price,
-                tc.CompanyName
-            FROM Ticket t
-            JOIN City c1 ON t.Origin = c1.CityID
-            JOIN City c2 ON t.Destination = c2.CityID
-            JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
-            JOIN Reservation r ON t.TicketID = r.TicketID
-            WHERE r.ReservationStatus = 'Cancelled'"""
-        cursor.execute(query)
-        cancelled_ticket_reports = cursor.fetchall()
-        for t in cancelled_ticket_reports:
-            t["DepartureDate"] = str(t["DepartureDate"])
-            t["DepartureTime"] = str(t["DepartureTime"])
-            t["ArrivalDate"] = str(t["ArrivalDate"])
-            t["ArrivalTime"] = str(t["ArrivalTime"])
-
-        redis_client.set(cash_key, json.dumps(cancelled_ticket_reports), ex=600)
-
-        return cancelled_ticket_reports
-
-    except mysql.connector.Error as e:
-        print(f"DB error in get_all_reports: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch cancelled ticket reports.")
-    finally:
-        cursor.close()
+REPORTS_QUERY = """
+   SELECT
+        r.ReportID,
+        u.FirstName,
+        u.LastName,
+        u.Email,
+        c1.CityName AS OriginCity,
+        c2.CityName AS DestinationCity,
+        tc.CompanyName,
+        rsb.SubjectName AS ReportSubject,
+        r.ReportText,
+        r.ReportStatus
+    FROM Reports r
+    JOIN User u ON r.ReportingUserID = u.UserID
+    LEFT JOIN Reservation rs ON r.ReservationID = rs.ReservationID
+    LEFT JOIN Ticket t ON rs.TicketID = t.TicketID
+    LEFT JOIN City c1 ON t.Origin = c1.CityID
+    LEFT JOIN City c2 ON t.Destination = c2.CityID
+    LEFT JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
+    LEFT JOIN ReportSubject rsb ON r.ReportSubject = rsb.ReportSubjectID
+"""
 
-@router.get("/paymentReports", response_model=List[PaymentResponse])
-def get_payment_report(db:mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    try:
-        cache_key = "allPaymentReports"
-        if cached_report := redis_client.get(cache_key):
-            return json.loads(cached_report)
+CANCELLED_TICKETS_QUERY = """
+    SELECT
+        r.ReservationID,
+        t.TicketID,
+        c1.CityName AS Origin,
+        c2.CityName AS Destination,
+        t.DepartureDate,
+        t.DepartureTime,
+        t.ArrivalDate,
+        t.ArrivalTime,
+        t.Price,
+        tc.CompanyName
+    FROM Reservation r
+    JOIN Ticket t ON r.TicketID = t.TicketID
+    JOIN City c1 ON t.Origin = c1.CityID
+    JOIN City c2 ON t.Destination = c2.CityID
+    JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
+"""
 
-        query ="""SELECT
+PAYMENTS_QUERY = """
+    SELECT
+        p.PaymentID,
         u.FirstName,
         u.LastName,
         c1.CityName AS Origin,
@@ -129,36 +82,242 @@ def get_payment_report(db:mysql.connector.connection.MySQLConnection = Depends(g
         t.Price,
         p.PaymentTime,
         p.PaymentMethod
-    FROM payment p
-    JOIN reservation r ON p.ReservationID = r.ReservationID
-    JOIN ticket t ON r.ReservationID = t.TicketID
-    JOIN user u ON r.UserID = u.UserID
+    FROM Payment p
+    JOIN Reservation r ON p.ReservationID = r.ReservationID
+    JOIN Ticket t ON r.TicketID = t.TicketID
+    JOIN User u ON r.UserID = u.UserID
     JOIN City c1 ON t.Origin = c1.CityID
     JOIN City c2 ON t.Destination = c2.CityID
     JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
-    WHERE p.PaymentStatus = 'Successful'"""
-        cursor.execute(query)
-        reports = cursor.fetchall()
-        for t in reports:
-            t["DepartureDate"] = str(t["DepartureDate"])
-            t["DepartureTime"] = str(t["DepartureTime"])
-            t["ArrivalDate"] = str(t["ArrivalDate"])
-            t["ArrivalTime"] = str(t["ArrivalTime"])
-            t["PaymentTime"] = str(t["PaymentTime"])
+"""
+
+def _build_where(conditions):
+    """conditions = [(sql, value), ...]; entries whose value is None are skipped."""
+    used = [(sql, value) for sql, value in conditions if value is not None]
+    where = (" WHERE " + " AND ".join(sql for sql, _ in used)) if used else ""
+    return where, [value for _, value in used]
+
+def _date_conditions(column, date_from, date_to):
+    # date_to is inclusive
+    return [(f"{column} >= %s", date_from),
+            (f"{column} < %s", date_to + timedelta(days=1) if date_to else None)]
 
+def _reports_filter(cursor=None, date_from=None, date_to=None, company=None, report_status=None):
+    # Reports have no date of their own, the date range applies to the reported reservation
+    return _build_where([("r.ReportID < %s", cursor), ("tc.CompanyName = %s", company),
+                         ("r.ReportStatus = %s", report_status)]
+                        + _date_conditions("rs.ReservationTime", date_from, date_to))
 
-        redis_client.set(cache_key, json.dumps(reports), ex=600)
+def _cancelled_tickets_filter(cursor=None, date_from=None, date_to=None, company=None):
+    return _build_where([("r.ReservationStatus = %s", "Cancelled"), ("r.ReservationID < %s", cursor),
+                         ("tc.CompanyName = %s", company)]
+                        + _date_conditions("r.ReservationTime", date_from, date_to))
 
-        return reports
-    except mysql.connector.Error as e:
+def _payments_filter(cursor=None, date_from=None, date_to=None, company=None, payment_status="Successful"):
+    return _build_where([("p.PaymentStatus = %s", payment_status), ("p.PaymentID < %s", cursor),
+                         ("tc.CompanyName = %s", company)]
+                        + _date_conditions("p.PaymentTime", date_from, date_to))
+
+def _stringify_dates(row, keys):
+    for key in keys:
+        row[key] = str(row[key])
+    return row
+
+async def _fetch_page(db, name, query, where, params, key_column, limit, response, convert=None):
+    """Run one keyset page (cached per version, filters and cursor) and set X-Next-Cursor."""
+    try:
+        version = await async_redis_client.get(report_cache_version_key(name)) or "0"
+        cache_key = f"adminPage:{name}:v{version}:{limit}:" + json.dumps(params, default=str)
+        cached = await async_redis_client.get(cache_key)
+    except redis.exceptions.RedisError as e:
+        # Redis is down: read from MySQL and cache nothing
+        print(f"WARNING: report page cache lookup failed: {e}")
+        cache_key = cached = None
+    if cached:
+        page = json.loads(cached)
+    else:
+        rows = await db.fetch_all(f"{query}{where} ORDER BY {key_column} DESC LIMIT %s", (*params, limit))
+        if convert:
+            rows = [convert(row) for row in rows]
+        key_name = key_column.split(".")[1]
+        page = {"items": rows, "next_cursor": rows[-1][key_name] if len(rows) == limit else None}
+        if cache_key:
+            try:
+                await async_redis_client.set(cache_key, json.dumps(page, default=str), ex=REPORT_PAGE_CACHE_TTL)
+            except redis.exceptions.RedisError as e:
+                print(f"WARNING: report page cache store failed: {e}")
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = str(page["next_cursor"])
+    return page["items"]
+
+#(API 10,14) Get list of all submitted reports, newest first, one page at a time
+@router.get("/reports", response_model=List[ReportResponse])
+async def get_all_reports(response: Response,
+                    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+                    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                    date_from: Optional[date] = Query(None, description="reservation date of the reported ticket"),
+                    date_to: Optional[date] = None,
+                    company: Optional[str] = None,
+                          report_status: Optional[str] = Query(None, alias="status"),
+                          db: AsyncDB = Depends(get_async_db)):
+    try:
+        where, params = _reports_filter(cursor, date_from, date_to, company, report_status)
+        return await _fetch_page(db, "reports", REPORTS_QUERY, where, params, "r.ReportID", limit, response)
+    except MySQLError as e:
         print(f"DB error in get_all_reports: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch reports.")
+
+#(API 10 & 14) Admin: Manually update the status of any reservation(might cause problem with redis)
+@router.put("/reservations/{reservation_id}")
+async def update_reservation_status(reservation_id: int, update: AdminReservationUpdate, db: AsyncDB = Depends(get_async_db)):
+    row = await db.fetch_one("SELECT ReservationStatus FROM Reservation WHERE ReservationID = %s FOR UPDATE", (reservation_id,))
+    if not row:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+    try:
+        # checks the edit first: the rollups cannot count every status change
+        await rollups.record_status_change(db, reservation_id, row["ReservationStatus"], update.NewStatus)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    await db.execute("UPDATE Reservation SET ReservationStatus = %s WHERE ReservationID = %s", (update.NewStatus, reservation_id))
+    await db.commit()
+    await bump_report_cache_versions("cancelledTickets")
+    return {"message": f"Reservation {reservation_id} status updated to '{update.NewStatus}'."}
+
+#Admin: change role or account status of a user, cached principal is dropped so it applies immediately
+@router.put("/users/{user_id}")
+async def update_user_access(user_id: int, update: AdminUserUpdate, db: AsyncDB = Depends(get_async_db)):
+    changes = update.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No update data provided")
+    if "Role" in changes and changes["Role"] not in ("admin", "normalUser"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Role must be 'admin' or 'normalUser'")
+    if "AccountStatus" in changes and changes["AccountStatus"] not in ("active", "inactive"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="AccountStatus must be 'active' or 'inactive'")
+
+    user = await db.fetch_one("SELECT Email FROM User WHERE UserID = %s", (user_id,))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    set_clause = ", ".join(f"{key} = %s" for key in changes)
+    await db.execute(f"UPDATE User SET {set_clause} WHERE UserID = %s", (*changes.values(), user_id))
+    await db.commit()
+    try:
+        await invalidate_principal(user["Email"])
+    except redis.exceptions.RedisError as e:
+        # the change is saved; a cached principal expires with its token at the latest
+        print(f"WARNING: principal cache invalidation failed for UserID {user_id}. Error: {e}")
+    return {"message": f"User {user_id} updated."}
+
+@router.get("/cancellReports",response_model=List[CancelledTicketReportResponse])
+async def get_all_cancelled_tickets(response: Response,
+                                    cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+                                    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                                    date_from: Optional[date] = Query(None, description="reservation date"),
+                                    date_to: Optional[date] = None,
+                                    company: Optional[str] = None,
+                                    db: AsyncDB = Depends(get_async_db)):
+    try:
+        where, params = _cancelled_tickets_filter(cursor, date_from, date_to, company)
+        return await _fetch_page(db, "cancelledTickets", CANCELLED_TICKETS_QUERY, where, params, "r.ReservationID",
+                                 limit, response, lambda row: _stringify_dates(row, ("DepartureDate", "DepartureTime",
+                                                                                     "ArrivalDate", "ArrivalTime")))
+    except MySQLError as e:
+        print(f"DB error in get_all_cancelled_tickets: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch cancelled ticket reports.")
+
+@router.get("/paymentReports", response_model=List[PaymentResponse])
+async def get_payment_report(response: Response,
+                             cursor: Optional[int] = Query(None, description="X-Next-Cursor of the previous page"),
+                             limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                             date_from: Optional[date] = Query(None, description="payment date"),
+                             date_to: Optional[date] = None,
+                             company: Optional[str] = None,
+                             payment_status: str = Query("Successful", alias="status"),
+                             db: AsyncDB = Depends(get_async_db)):
+    try:
+        where, params = _payments_filter(cursor, date_from, date_to, company, payment_status)
+        return await _fetch_page(db, "payments", PAYMENTS_QUERY, where, params, "p.PaymentID", limit,
+                                 response, lambda row: _stringify_dates(row, ("DepartureDate", "DepartureTime",
+                                                                              "ArrivalDate", "ArrivalTime", "PaymentTime")))
+    except MySQLError as e:
+        print(f"DB error in get_payment_report: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch payment reports.")
+
+# --- Streaming exports ---
+# Rows go from an unbuffered cursor to the client EXPORT_FETCH_SIZE at a time, so memory stays
+# constant whatever the size of the export. The connection is taken from the pool when the
+# stream starts and given back as soon as it ends or the client goes away.
+EXPORT_FETCH_SIZE = 1000
+
+async def _stream_export(query, where, params, key_column, export_format):
+    async with async_db_session() as db:
+        rows_stream = db.stream(f"{query}{where} ORDER BY {key_column} DESC", params, EXPORT_FETCH_SIZE)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        try:
+            # the first chunk has the column names only (the CSV header)
+            async for columns, rows in rows_stream:
+                buffer.seek(0)
+                buffer.truncate()
+                if export_format == "csv" and not rows:
+                    writer.writerow(columns)
+                elif export_format == "csv":
+                    writer.writerows(rows)
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+                        buffer.write("\n")
+                yield buffer.getvalue()
+        finally:
+            await rows_stream.aclose()
+
+async def _chain(first_chunk, stream):
+    try:
+        yield first_chunk
+        async for chunk in stream:
+            yield chunk
     finally:
-        cursor.close()
+        await stream.aclose()
+
+async def _export_response(name, query, where, params, key_column, export_format):
+    stream = _stream_export(query, where, params, key_column, export_format)
+    try:
+        # the first chunk is pulled here, so pool and query errors still become a normal HTTP error
+        first_chunk = await stream.__anext__()
+    except MySQLError as e:
+        print(f"DB error in {name} export: {e}")
+        await stream.aclose()
+        raise HTTPException(status_code=500, detail=f"Failed to export {name}.")
+    except HTTPException:
+        await stream.aclose()
+        raise
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    extension = "csv" if export_format == "csv" else "ndjson"
+    return StreamingResponse(_chain(first_chunk, stream), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'})
+
+#Export every cancelled ticket matching the filters as NDJSON (default) or CSV
+@router.get("/cancellReports/export")
+async def export_cancelled_tickets(export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                                   date_from: Optional[date] = Query(None, description="reservation date"),
+                                   date_to: Optional[date] = None,
+                                   company: Optional[str] = None):
+    where, params = _cancelled_tickets_filter(None, date_from, date_to, company)
+    return await _export_response("cancellations", CANCELLED_TICKETS_QUERY, where, params, "r.ReservationID", export_format)
+
+#Export every payment matching the filters as NDJSON (default) or CSV
+@router.get("/paymentReports/export")
+async def export_payments(export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                          date_from: Optional[date] = Query(None, description="payment date"),
+                          date_to: Optional[date] = None,
+                          company: Optional[str] = None,
+                          payment_status: str = Query("Successful", alias="status")):
+    where, params = _payments_filter(None, date_from, date_to, company, payment_status)
+    return await _export_response("payments", PAYMENTS_QUERY, where, params, "p.PaymentID", export_format)
 
 @router.get("/uncheckedReports", response_model=List[UncheckedReportResponse])
-def get_unchecked_reports(current_user: dict = Depends(get_current_user),db:mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
+async def get_unchecked_reports(current_user: dict = Depends(get_current_user), db: AsyncDB = Depends(get_async_db)):
     try:
 
         query = """
@@ -183,8 +342,9 @@ def get_unchecked_reports(current_user: dict = Depends(get_current_user),db:mysq
             WHERE r.ReportStatus = 'Pending'
             ORDER BY r.ReportID DESC
         """
-        cursor.execute(query)
-        unchecked_reports = cursor.fetchall()
+        unchecked_reports = await db.fetch_all(query)
+        if not unchecked_reports:
+            return []
         #change ReportStatus to "Checked"
         # Step 2: Collect the IDs of the reports to be updated
         report_ids_to_update = [report['ReportID'] for report in unchecked_reports]
@@ -197,14 +357,47 @@ def get_unchecked_reports(current_user: dict = Depends(get_current_user),db:mysq
             WHERE `ReportID` IN ({update_query_placeholders})
         """
         params_for_update = ['Checked', current_user['UserID']] + report_ids_to_update
-        cursor.execute(update_query, params_for_update)
-        db.commit()
-        cache_key = "allReports"
-        redis_client.delete(cache_key)
+        await db.execute(update_query, params_for_update)
+        await db.commit()
+        await bump_report_cache_versions("reports")
         return unchecked_reports
-    except mysql.connector.Error as e:
+    except MySQLError as e:
         print(f"DB error in get_all_reports: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch reports.")
 
-    finally:
-        cursor.close()
\ No newline at end of file
+#hit/miss counters of the search result cache (this worker process only)
+@router.get("/cache/search-stats")
+def get_search_cache_statistics():
+    return get_search_cache_stats()
+
+#depth and lag of the Elasticsearch write-behind queue
+@router.get("/es-sync/stats")
+def get_es_sync_statistics():
+    return get_queue_stats()
+
+#sweep duration and released-seat counters of the reservation expiry sweeper
+@router.get("/expiry/stats")
+def get_expiry_statistics():
+    return get_expiry_sweeper_stats()
+
+#hit/miss counters of the principal cache used by get_current_user (this worker process only)
+@router.get("/cache/principal-stats")
+def get_principal_cache_statistics():
+    return get_principal_cache_stats()
+
+#size and current load of the password hashing process pool (this worker process only)
+@router.get("/password-pool/stats")
+def get_password_pool_statistics():
+    return get_password_pool_stats()
+
+#size, waiters and timeout counters of the MySQL connection pools (this worker process only)
+@router.get("/db-pool/stats")
+def get_db_pool_statistics():
+    return {"sync": db_pool.snapshot(), "async": get_async_db_stats()}
+
+#reload City, TransportCompany and ReportSubject in every API process after editing them
+@router.post("/reference-data/refresh")
+def refresh_reference_data():
+    reference_data.bump_version()
+    snapshot = reference_data.load()
+    return {"message": "Reference data reloaded.", "version": snapshot.version}
@@ -0,0 +1,149 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+import mysql.connector
+from typing import Literal, Optional
+
+from app.database import get_db_connection
+from app.dependencies import get_current_admin_user
+from app import reference_data
+
+# Answers come from the rollup tables (see app/rollups.py), never from the full history joins
+router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"], dependencies=[Depends(get_current_admin_user)])
+
+def _day_range(date_from, date_to, params, column="Day"):
+    conditions = []
+    if date_from:
+        conditions.append(f"{column} >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append(f"{column} <= %s")
+        params.append(date_to)
+    return conditions
+
+def _run(db, query, params):
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    except mysql.connector.Error as e:
+        print(f"DB error in analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read analytics.")
+    finally:
+        cursor.close()
+
+def _where(conditions):
+    return (" WHERE " + " AND ".join(conditions)) if conditions else ""
+
+#Users with the most (not cancelled) purchases, replaces GetTopBuyersFromDate
+@router.get("/top-buyers")
+def get_top_buyers(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                   limit: int = Query(10, ge=1, le=100),
+                   db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+    params = []
+    where = _where(_day_range(date_from, date_to, params, "ur.Day"))
+    return _run(db, f"""
+        SELECT u.UserID, u.FirstName, u.LastName, u.Email, b.Purchases, b.Spent
+        FROM (
+            SELECT ur.UserID,
+                   SUM(ur.PurchaseCount - ur.CancelledCount) AS Purchases,
+                   SUM(ur.PurchaseAmount - ur.CancelledAmount) AS Spent
+            FROM UserDailyRollup ur{where}
+            GROUP BY ur.UserID
+            ORDER BY Purchases DESC
+            LIMIT %s
+        ) b
+        JOIN User u ON u.UserID = b.UserID
+        ORDER BY b.Purchases DESC
+    """, params + [limit])
+
+#Sold, cancelled and net amounts grouped by day, company, route or vehicle type
+@router.get("/revenue")
+def get_revenue(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                group_by: Literal["day", "company", "route", "vehicle"] = "day",
+                db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+    group_columns = {"day": ["Day"], "company": ["TransportCompanyID"], "route": ["Origin", "Destination"],
+                     "vehicle": ["VehicleType"]}[group_by]
+    params = []
+    where = _where(_day_range(date_from, date_to, params))
+    columns = ", ".join(group_columns)
+    rows = _run(db, f"""
+        SELECT {columns},
+               SUM(SoldCount) AS SoldCount, SUM(SoldAmount) AS SoldAmount,
+               SUM(CancelledCount) AS CancelledCount, SUM(CancelledAmount) AS CancelledAmount,
+               SUM(SoldAmount - CancelledAmount) AS NetAmount
+        FROM SalesDailyRollup{where}
+        GROUP BY {columns}
+        ORDER BY {columns if group_by == "day" else "NetAmount DESC"}
+    """, params)
+    snapshot = reference_data.get()
+    for row in rows:
+        if "TransportCompanyID" in row:
+            row["CompanyName"] = snapshot.company_names.get(row["TransportCompanyID"])
+        if "Origin" in row:
+            row["Origin"] = snapshot.city_names.get(row["Origin"])
+            row["Destination"] = snapshot.city_names.get(row["Destination"])
+    return rows
+
+#Cancellations per payment day and route for one vehicle type, replaces GetCancelledTicketsByVehicle
+@router.get("/cancellations-by-vehicle")
+def get_cancellations_by_vehicle(vehicle_type: Literal["airplane", "bus", "train"],
+                                 date_from: Optional[date] = None, date_to: Optional[date] = None,
+                                 db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+    params = [vehicle_type]
+    conditions = ["VehicleType = %s", "CancelledCount > 0"] + _day_range(date_from, date_to, params)
+    rows = _run(db, f"""
+        SELECT Day, Origin, Destination, SUM(CancelledCount) AS CancelledCount, SUM(CancelledAmount) AS CancelledAmount
+        FROM SalesDailyRollup{_where(conditions)}
+        GROUP BY Day, Origin, Destination
+        ORDER BY Day
+    """, params)
+    snapshot = reference_data.get()
+    for row in rows:
+        row["Origin"] = snapshot.city_names.get(row["Origin"])
+        row["Destination"] = snapshot.city_names.get(row["Destination"])
+    return rows
+
+#Users with the most reports on one subject, replaces GetTopUsersByReportSubject
+@router.get("/top-reporters")
+def get_top_reporters(subject: str, limit: int = Query(10, ge=1, le=100),
+                      db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+    report_subject_id = reference_data.get().report_subject_ids.get(subject)
+    if report_subject_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Report subject '{subject}' not found.")
+    return _run(db, """
+        SELECT u.UserID, u.FirstName, u.LastName, rr.ReportCount
+        FROM ReportSubjectRollup rr
+        JOIN User u ON u.UserID = rr.ReportingUserID
+        WHERE rr.ReportSubject = %s
+        ORDER BY rr.ReportCount DESC
+        LIMIT %s
+    """, [report_subject_id, limit])
+
+#Net tickets sold per origin city (or per destination of one origin), replaces GetSoldTicketsByOriginCity
+@router.get("/sold-by-origin")
+def get_sold_by_origin(origin_name: Optional[str] = None, date_from: Optional[date] = None,
+                       date_to: Optional[date] = None,
+                       db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+    params = []
+    conditions = []
+    group_columns = "Origin"
+    if origin_name:
+        origin_id = reference_data.get().city_ids.get(origin_name)
+        if origin_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"City '{origin_name}' not found.")
+        conditions.append("Origin = %s")
+        params.append(origin_id)
+        group_columns = "Origin, Destination"
+    conditions += _day_range(date_from, date_to, params)
+    rows = _run(db, f"""
+        SELECT {group_columns}, SUM(SoldCount - CancelledCount) AS SoldCount, SUM(SoldAmount - CancelledAmount) AS NetAmount
+        FROM SalesDailyRollup{_where(conditions)}
+        GROUP BY {group_columns}
+        ORDER BY SoldCount DESC
+    """, params)
+    snapshot = reference_data.get()
+    for row in rows:
+        row["Origin"] = snapshot.city_names.get(row["Origin"])
+        if "Destination" in row:
+            row["Destination"] = snapshot.city_names.get(row["Destination"])
+    return rows
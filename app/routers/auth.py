@@ -2,143 +2,137 @@ import json
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
-import mysql.connector
 import random
 import string
 
-from app.database import get_db_connection, redis_client
+from app.async_db import AsyncDB, MySQLError, async_db_session, get_async_db
+from app.database import async_redis_client
 from app.schemas import UserCreate, Token, OTPRequest, OTPLoginRequest, LoginWithPassword
-from app.Security import get_password_hash, generate_access_token, verify_password
+from app.Security import generate_access_token
+from app.password_pool import get_password_hash, verify_password
+from app import reference_data
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-#(API 2) sign in with email or phone number
-@router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-def signup(user: UserCreate, db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-
-    try:
+# signup checks run on a short-lived pooled connection, released before the password is hashed
+async def _find_signup_city(user: UserCreate) -> int:
+    async with async_db_session() as db:
         # Check is user already exist or not
-        cursor.execute("SELECT UserID FROM User WHERE Email = %s OR PhoneNumber = %s", (user.Email, user.PhoneNumber))
-        if cursor.fetchone():
-            cursor.fetchall()
+        if await db.fetch_one("SELECT UserID FROM User WHERE Email = %s OR PhoneNumber = %s LIMIT 1",
+                              (user.Email, user.PhoneNumber)):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email or phone number already registered"
             )
 
-        # find cityID from it's Name
-        cursor.execute("SELECT CityID FROM City WHERE CityName = %s", (user.City,))
-        city_record = cursor.fetchone()
-        cursor.fetchall()
+    # find cityID from it's Name
+    city_id = await reference_data.city_id(user.City)
+
+    # if city not found return error
+    if city_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"City '{user.City}' not found. Please use a valid city name."
+        )
+    return city_id
+
+async def _insert_user(user: UserCreate, hashed_password: str, city_id: int):
+    async with async_db_session() as db:
+        try:
+            # insert in database
+            insert_query = """
+                INSERT INTO User 
+                (FirstName, LastName, Email, PhoneNumber, Password, RegistrationDate, AccountStatus, CityID, Role) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+            registration_time = datetime.now().replace(microsecond=0)
+
+            user_data = (
+                user.FirstName,
+                user.LastName,
+                user.Email,
+                user.PhoneNumber,
+                hashed_password,
+                registration_time,
+                'active',
+                city_id,
+                'normalUser'
+            )
+
+            await db.execute(insert_query, user_data)
+            await db.commit()
 
-        # if city not found return error
-        if not city_record:
+        except MySQLError as err:
+            await db.rollback()
+            import traceback
+            traceback.print_exc()
+            print(f"Database error during signup: {err}")
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"City '{user.City}' not found. Please use a valid city name."
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="An error occurred while creating the user."
             )
-        city_id = city_record['CityID']
-
-        # hash password
-        hashed_password = get_password_hash(user.Password)
-
-        # insert in database
-        insert_query = """
-            INSERT INTO User 
-            (FirstName, LastName, Email, PhoneNumber, Password, RegistrationDate, AccountStatus, CityID, Role) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        registration_time = datetime.now().replace(microsecond=0)
-
-        user_data = (
-            user.FirstName,
-            user.LastName,
-            user.Email,
-            user.PhoneNumber,
-            hashed_password,
-            registration_time,
-            'active',
-            city_id,
-            'normalUser'
-        )
 
-        cursor.execute(insert_query, user_data)
-        db.commit()
+#(API 2) sign in with email or phone number
+@router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
+async def signup(user: UserCreate):
+    city_id = await _find_signup_city(user)
 
-    except mysql.connector.Error as err:
-        # db.rollback()
-        # print(f"Database error during signup: {err}")
-        db.rollback()
-        import traceback
-        traceback.print_exc()
-        print(f"Database error during signup: {err}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while creating the user."
-        )
-    finally:
-        cursor.close()
+    # hash password in the process pool, no DB connection is held meanwhile
+    hashed_password = await get_password_hash(user.Password)
+
+    await _insert_user(user, hashed_password, city_id)
 
     access_token = generate_access_token(data={"sub": user.Email})
     return {"access_token": access_token, "token_type": "bearer"}
 
 #(API dependent to API1) send OTP
 @router.post("/otp/send")
-def send_otp(otp_request: OTPRequest, db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    query = "SELECT UserID FROM User WHERE Email = %s OR PhoneNumber = %s"
-    cursor.execute(query, (otp_request.phone_or_email, otp_request.phone_or_email))
-    if not cursor.fetchone():
-        cursor.close()
+async def send_otp(otp_request: OTPRequest, db: AsyncDB = Depends(get_async_db)):
+    query = "SELECT UserID FROM User WHERE Email = %s OR PhoneNumber = %s LIMIT 1"
+    if not await db.fetch_one(query, (otp_request.phone_or_email, otp_request.phone_or_email)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    cursor.close()
     otp = ''.join(random.choices(string.digits, k=6))
-    redis_client.set(f"OTP:{otp_request.phone_or_email}", otp, ex=300)
+    await async_redis_client.set(f"OTP:{otp_request.phone_or_email}", otp, ex=300)
     print(f"--- MOCK OTP for {otp_request.phone_or_email}: {otp} ---")
     return {"message": "OTP sent successfully."}
 
 #(API 1) login with email or phone number
 @router.post("/otp/login", response_model=Token)
-def otp_login(otp_request: OTPLoginRequest, db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+async def otp_login(otp_request: OTPLoginRequest, db: AsyncDB = Depends(get_async_db)):
     cache_key = f"login:{otp_request.phone_or_email}"
-    if cashed_result := redis_client.get(cache_key):
+    if cashed_result := await async_redis_client.get(cache_key):
         return json.loads(cashed_result)
-    cursor = db.cursor(dictionary=True)
-    query = "SELECT UserID, Email FROM User WHERE Email = %s OR PhoneNumber = %s"
-    cursor.execute(query, (otp_request.phone_or_email, otp_request.phone_or_email))
-    user = cursor.fetchone()
-    cursor.close()
+    query = "SELECT UserID, Email FROM User WHERE Email = %s OR PhoneNumber = %s LIMIT 1"
+    user = await db.fetch_one(query, (otp_request.phone_or_email, otp_request.phone_or_email))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    stored_otp = redis_client.get(f"OTP:{otp_request.phone_or_email}")
+    stored_otp = await async_redis_client.get(f"OTP:{otp_request.phone_or_email}")
     if not stored_otp or stored_otp != otp_request.otp:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired OTP")
 
     access_token = generate_access_token(data={"sub": user["Email"]})
-    redis_client.delete(f"OTP:{otp_request.phone_or_email}")
+    await async_redis_client.delete(f"OTP:{otp_request.phone_or_email}")
     return {"access_token": access_token, "token_type": "bearer"}
 
+async def _find_login_user(phone_or_email: str):
+    async with async_db_session() as db:
+        try:
+            query = "SELECT UserID, Email, Password FROM User WHERE Email = %s OR PhoneNumber = %s LIMIT 1"
+            return await db.fetch_one(query, (phone_or_email, phone_or_email))
+        except MySQLError as e:
+            print(f"DB error in login_with_password: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch user.")
+
 @router.post("/loginWithPassword", response_model=Token)
-def login_with_password(user: LoginWithPassword ,db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    try:
-        query = "SELECT UserID, Email, Password FROM User WHERE Email = %s OR PhoneNumber = %s"
-        cursor.execute(query, (user.phone_or_Email, user.phone_or_Email))
-        logged_in_user = cursor.fetchone()
-        if not logged_in_user:
-            cursor.close()
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-        hashed_password = logged_in_user["Password"]
-        if not verify_password(user.password, hashed_password):
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Email or Phone number or Password")
-        access_token = generate_access_token(data={"sub": logged_in_user["Email"]})
-        return {"access_token": access_token, "token_type": "bearer"}
-
-    except mysql.connector.Error as e:
-        print(f"DB error in get_all_reports: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch reports.")
-    finally:
-        cursor.close()
\ No newline at end of file
+async def login_with_password(user: LoginWithPassword):
+    # the connection is back in the pool before bcrypt starts
+    logged_in_user = await _find_login_user(user.phone_or_Email)
+    if not logged_in_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    hashed_password = logged_in_user["Password"]
+    if not await verify_password(user.password, hashed_password):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Email or Phone number or Password")
+    access_token = generate_access_token(data={"sub": logged_in_user["Email"]})
+    return {"access_token": access_token, "token_type": "bearer"}
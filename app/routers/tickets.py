@@ -1,32 +1,75 @@
-from elasticsearch import Elasticsearch
-from fastapi import APIRouter, Depends, HTTPException, status
-import mysql.connector
-from typing import List
+import redis
+from elasticsearch import AsyncElasticsearch, ConnectionError as ESConnectionError
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
+from typing import List, Literal, Optional, Union
 import json
-from datetime import datetime, timedelta
+from datetime import date as Date, datetime, timedelta
 from app.elastic_utils import sync_ticket_in_es
+from app.search_cache import (get_cached_search, store_search, get_cached_fare_calendar, store_fare_calendar,
+                              bump_route_version, bump_report_cache_versions)
+from app import inventory, reference_data, rollups, route_graph, search_connections, search_facets
+from app.metrics import record_cache
 
 
-from app.database import get_db_connection, redis_client, get_es_client
+from app.async_db import AsyncDB, MySQLError, get_async_db
+from app.database import async_redis_client, get_async_es_client
 from app.dependencies import get_current_user
 from app.schemas import (CitySchema, TicketSearchResponse, TicketDetailsResponse, ReservationCreate, PaymentRequest,
-                         ReportCreate, ReservationResponse, AdvancedTicketSearchResponse)
+                         ReportCreate, ReservationResponse, AdvancedTicketSearchResponse, TicketBatchRequest,
+                         FacetedTicketSearchResponse, FacetedAdvancedTicketSearchResponse, FareCalendarDay,
+                         ConnectionItinerary)
 
 router = APIRouter(prefix="/tickets", tags=["Tickets & Reservations"])
 
-#(API 4) Get list of all cities
+#(API 4) Get list of all cities, served from the preloaded reference data with ETag/304 support
 @router.get("/cities", response_model=List[CitySchema])
-def get_cities(db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT CityID, CityName FROM City")
-    cities = cursor.fetchall()
-    cursor.close()
-    return cities
+async def get_cities(request: Request):
+    snapshot = await reference_data.snapshot()
+    headers = {"ETag": snapshot.cities_etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == snapshot.cities_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.cities_json, media_type="application/json", headers=headers)
+
+# run a ticket query on the shared async client and convert date format to API response model;
+# with facet filters the hits are narrowed by post_filter, with include_facets the facets come back too
+async def _search_ticket_index(es: AsyncElasticsearch, query: dict, date: str, filters: dict = None,
+                               include_facets: bool = False):
+    clauses = search_facets.filter_clauses(filters or {}, date)
+    body = {"query": query, "size": 100}
+    if clauses:
+        body["post_filter"] = search_facets.post_filter(clauses)
+    if include_facets:
+        body["aggs"] = search_facets.facet_aggregations(clauses, date)
+    response = await es.search(index="tickets", **body)
+    tickets = [hit['_source'] for hit in response['hits']['hits']]
+    for ticket in tickets:
+        ticket['DepartureDateTime'] = ticket['DepartureDateTime'].replace('T', ' ')
+        ticket['ArrivalDateTime'] = ticket['ArrivalDateTime'].replace('T', ' ')
+    if not include_facets:
+        return tickets, None
+    return tickets, {"Total": response['hits']['total']['value'],
+                     "Facets": search_facets.parse_facets(response['aggregations'])}
+
+# cached search shared by both endpoints; the cache key covers the filters and include_facets
+async def _cached_search(es: AsyncElasticsearch, query: dict, origin: str, destination: str, date: str,
+                         vehicle_type: str, filters: dict, include_facets: bool, ticket_model, faceted_model):
+    variant = search_facets.cache_variant(filters, include_facets)
+    payload, version = await get_cached_search(origin, destination, date, vehicle_type, variant)
+    if payload is not None:
+        return Response(content=payload, media_type="application/json")
+    hits, facets = await _search_ticket_index(es, query, date, filters, include_facets)
+    tickets = [ticket_model(**t) for t in hits]
+    result = faceted_model(Tickets=tickets, **facets) if include_facets else tickets
+    payload = await store_search(origin, destination, date, vehicle_type, version, result, variant)
+    return Response(content=payload, media_type="application/json")
 
 # (API 5) Search for available tickets - UPDATED FOR ELASTICSEARCH
-@router.get("/search", response_model=List[TicketSearchResponse])
-def search_tickets(origin_name: str, destination_name: str, date: str,
-                   es: Elasticsearch = Depends(get_es_client)):
+@router.get("/search", response_model=Union[List[TicketSearchResponse], FacetedTicketSearchResponse])
+async def search_tickets(origin_name: str, destination_name: str, date: str,
+                         vehicle_types: Optional[List[str]] = Query(None, description="facet filter, repeat for several"),
+                         include_facets: bool = Query(False, description="return {Total, Tickets, Facets} instead of a list"),
+                         filters: dict = Depends(search_facets.search_filters),
+                         es: AsyncElasticsearch = Depends(get_async_es_client)):
     query = {
         "bool": {
             "must": [
@@ -45,27 +88,29 @@ def search_tickets(origin_name: str, destination_name: str, date: str,
             ]
         }
     }
+    if vehicle_types:
+        filters["vehicle_types"] = sorted({vehicle_type.lower() for vehicle_type in vehicle_types})
     try:
-        response = es.search(index="tickets", query=query, size=100)
-        tickets = [hit['_source'] for hit in response['hits']['hits']]
-        # convert date format to API response model
-        for ticket in tickets:
-            ticket['DepartureDateTime'] = ticket['DepartureDateTime'].replace('T', ' ')
-            ticket['ArrivalDateTime'] = ticket['ArrivalDateTime'].replace('T', ' ')
-        return tickets
+        return await _cached_search(es, query, origin_name, destination_name, date, "all", filters, include_facets,
+                                    TicketSearchResponse, FacetedTicketSearchResponse)
+    except ESConnectionError:
+        # answered with 503 by the handler in main.py
+        raise
     except Exception as e:
         print(f"Elasticsearch search error: {e}")
         raise HTTPException(status_code=500, detail="Error searching for tickets.")
 
 
 # Advanced search for available tickets - UPDATED FOR ELASTICSEARCH
-@router.get("/search/advanced", response_model=List[AdvancedTicketSearchResponse])
-def search_tickets_advanced(
+@router.get("/search/advanced", response_model=Union[List[AdvancedTicketSearchResponse], FacetedAdvancedTicketSearchResponse])
+async def search_tickets_advanced(
         origin_city: str,
         destination_city: str,
         date: str,
         vehicle_type: str,
-        es: Elasticsearch = Depends(get_es_client)
+        include_facets: bool = Query(False, description="return {Total, Tickets, Facets} instead of a list"),
+        filters: dict = Depends(search_facets.search_filters),
+        es: AsyncElasticsearch = Depends(get_async_es_client)
 ):
     valid_vehicles = ['airplane', 'bus', 'train']
     if vehicle_type.lower() not in valid_vehicles:
@@ -90,184 +135,354 @@ def search_tickets_advanced(
         }
     }
     try:
-        response = es.search(index="tickets", query=query, size=100)
-        tickets = [hit['_source'] for hit in response['hits']['hits']]
-        for ticket in tickets:
-            ticket['DepartureDateTime'] = ticket['DepartureDateTime'].replace('T', ' ')
-            ticket['ArrivalDateTime'] = ticket['ArrivalDateTime'].replace('T', ' ')
-        return tickets
+        return await _cached_search(es, query, origin_city, destination_city, date, vehicle_type.lower(), filters,
+                                    include_facets, AdvancedTicketSearchResponse, FacetedAdvancedTicketSearchResponse)
+    except ESConnectionError:
+        # answered with 503 by the handler in main.py
+        raise
     except Exception as e:
         print(f"Elasticsearch advanced search error: {e}")
         raise HTTPException(status_code=500, detail="Error searching for tickets.")
 
+# Connection search: 1- and 2-stop itineraries from the route graph, legs fetched with two msearch
+# requests (see app/search_connections.py). Results are not cached, they depend on many routes.
+@router.get("/search/connections", response_model=List[ConnectionItinerary])
+async def search_connections_endpoint(
+        origin_name: str,
+        destination_name: str,
+        date: Date,
+        max_stops: int = Query(2, ge=1, le=2),
+        min_layover_minutes: int = Query(60, ge=0, le=24 * 60),
+        max_duration_hours: int = Query(36, ge=1, le=96),
+        sort_by: Literal["price", "arrival"] = "price",
+        limit: int = Query(20, ge=1, le=100),
+        es: AsyncElasticsearch = Depends(get_async_es_client)
+):
+    if origin_name == destination_name:
+        raise HTTPException(status_code=400, detail="Origin and destination are the same.")
+    try:
+        graph = await route_graph.get()
+        return await search_connections.search(es, graph, origin_name, destination_name, str(date), max_stops,
+                                               timedelta(minutes=min_layover_minutes),
+                                               timedelta(hours=max_duration_hours), sort_by, limit)
+    except ESConnectionError:
+        # answered with 503 by the handler in main.py
+        raise
+    except Exception as e:
+        print(f"Elasticsearch connection search error: {e}")
+        raise HTTPException(status_code=500, detail="Error searching for connections.")
+
+FARE_CALENDAR_MAX_DAYS = 62
+
+# Fare calendar: cheapest available fare and seats per departure day, for users who would
+# otherwise call /search once per day. One size-0 search with a daily date_histogram.
+@router.get("/fare-calendar", response_model=List[FareCalendarDay])
+async def fare_calendar(origin_name: str, destination_name: str, date_from: Date, date_to: Date,
+                        vehicle_type: Optional[str] = None,
+                        es: AsyncElasticsearch = Depends(get_async_es_client)):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from.")
+    if (date_to - date_from).days >= FARE_CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The date window is limited to {FARE_CALENDAR_MAX_DAYS} days.")
+    if vehicle_type is not None and vehicle_type.lower() not in ['airplane', 'bus', 'train']:
+        raise HTTPException(status_code=400, detail="Invalid vehicle_type.")
+    vehicle_key = vehicle_type.lower() if vehicle_type else "all"
+
+    payload, version = await get_cached_fare_calendar(origin_name, destination_name, str(date_from), str(date_to),
+                                                      vehicle_key)
+    if payload is not None:
+        return Response(content=payload, media_type="application/json")
+
+    must = [
+        {"term": {"Origin": origin_name}},
+        {"term": {"Destination": destination_name}},
+        {"range": {"DepartureDateTime": {"gte": f"{date_from}T00:00:00", "lte": f"{date_to}T23:59:59"}}}
+    ]
+    if vehicle_type:
+        must.append({"term": {"VehicleType": vehicle_key}})
+    aggs = {
+        "days": {
+            "date_histogram": {
+                "field": "DepartureDateTime", "calendar_interval": "day", "format": "yyyy-MM-dd",
+                # days without tickets are returned too, so the calendar has no gaps
+                "min_doc_count": 0, "extended_bounds": {"min": str(date_from), "max": str(date_to)}
+            },
+            "aggs": {
+                "min_price": {"min": {"field": "Price"}},
+                "seats": {"sum": {"field": "RemainingCapacity"}}
+            }
+        }
+    }
+    try:
+        response = await es.search(index="tickets", size=0, aggs=aggs,
+                                   query={"bool": {"must": must, "filter": [{"range": {"RemainingCapacity": {"gt": 0}}}]}})
+    except ESConnectionError:
+        # answered with 503 by the handler in main.py
+        raise
+    except Exception as e:
+        print(f"Elasticsearch fare calendar error: {e}")
+        raise HTTPException(status_code=500, detail="Error building the fare calendar.")
+
+    days = [FareCalendarDay(Date=bucket["key_as_string"], MinPrice=bucket["min_price"]["value"],
+                            Seats=int(bucket["seats"]["value"] or 0), Tickets=bucket["doc_count"])
+            for bucket in response["aggregations"]["days"]["buckets"]]
+    payload = await store_fare_calendar(origin_name, destination_name, str(date_from), str(date_to), vehicle_key,
+                                        version, days)
+    return Response(content=payload, media_type="application/json")
+
+# ticket plus all three vehicle subtypes in one round trip; subtype columns are prefixed to avoid name clashes
+TICKET_DETAIL_QUERY = """
+    SELECT
+        t.TicketID,
+        c1.CityName AS Origin,
+        c2.CityName AS Destination,
+        t.DepartureDate,
+        t.DepartureTime,
+        t.ArrivalDate,
+        t.ArrivalTime,
+        t.Price,
+        t.RemainingCapacity,
+        tc.CompanyName,
+        at.TicketID AS at_TicketID, at.CompanyName AS at_CompanyName, at.FlightClass AS at_FlightClass,
+        at.NumberOfStops AS at_NumberOfStops, at.FlightNumber AS at_FlightNumber,
+        at.OriginAirPort AS at_OriginAirPort, at.DestinationAirPort AS at_DestinationAirPort, at.Features AS at_Features,
+        bt.TicketID AS bt_TicketID, bt.CompanyName AS bt_CompanyName, bt.BusType AS bt_BusType,
+        bt.ChairInRow AS bt_ChairInRow, bt.Feature AS bt_Feature,
+        tt.TicketID AS tt_TicketID, tt.NumberOfStars AS tt_NumberOfStars, tt.Feature AS tt_Feature,
+        tt.ClosedCompartment AS tt_ClosedCompartment
+    FROM Ticket t
+    JOIN City c1 ON t.Origin = c1.CityID
+    JOIN City c2 ON t.Destination = c2.CityID
+    JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
+    LEFT JOIN AirplaneTicket at ON t.TicketID = at.TicketID
+    LEFT JOIN BusTicket bt ON t.TicketID = bt.TicketID
+    LEFT JOIN TrainTicket tt ON t.TicketID = tt.TicketID
+"""
+# (Type, column prefix, columns of the subtype table) in the order they used to be checked
+VEHICLE_FEATURE_COLUMNS = [
+    ("Airplane", "at_", ["CompanyName", "FlightClass", "NumberOfStops", "FlightNumber",
+                         "OriginAirPort", "DestinationAirPort", "Features"]),
+    ("Bus", "bt_", ["CompanyName", "BusType", "ChairInRow", "Feature"]),
+    ("Train", "tt_", ["NumberOfStars", "Feature", "ClosedCompartment"]),
+]
+TICKET_DETAIL_CACHE_TTL = 600
+MAX_BATCH_SIZE = 200
+
+def _ticket_detail_from_row(row: dict) -> dict:
+    ticket = {key: row[key] for key in ("TicketID", "Origin", "Destination", "Price", "RemainingCapacity", "CompanyName")}
+    # convert date and time to string to prevent from ValidationError
+    for key in ("DepartureDate", "DepartureTime", "ArrivalDate", "ArrivalTime"):
+        ticket[key] = str(row[key])
+
+    # check features
+    vehicle_features = {}
+    for vehicle_type, prefix, columns in VEHICLE_FEATURE_COLUMNS:
+        if row[prefix + "TicketID"] is not None:
+            vehicle_features["Type"] = vehicle_type
+            vehicle_features.update({column: row[prefix + column] for column in columns})
+            break
+    ticket["Features"] = vehicle_features
+    return ticket
+
 #(API 6) Get detailed information for a single ticket
 @router.get("/tickets/{ticket_id}", response_model=TicketDetailsResponse)
-def get_ticket_details(ticket_id: int,
-                       db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
+async def get_ticket_details(ticket_id: int, db: AsyncDB = Depends(get_async_db)):
     try:
-        #check redis first
+        #check redis first (skipped while Redis is down)
         cash_key = f"ticketDetail{ticket_id}"
-        if cash_data := redis_client.get(cash_key):
+        try:
+            cash_data = await async_redis_client.get(cash_key)
+        except redis.exceptions.RedisError as e:
+            print(f"WARNING: ticket detail cache lookup failed: {e}")
+            cash_data = None
+        record_cache("ticket_detail", cash_data is not None)
+        if cash_data:
             return json.loads(cash_data)
 
-        query = """
-                SELECT 
-                    t.TicketID,
-                    c1.CityName AS Origin,
-                    c2.CityName AS Destination,
-                    t.DepartureDate,
-                    t.DepartureTime,
-                    t.ArrivalDate,
-                    t.ArrivalTime,
-                    t.Price,
-                    t.RemainingCapacity,
-                    tc.CompanyName
-                FROM Ticket t
-                JOIN City c1 ON t.Origin = c1.CityID
-                JOIN City c2 ON t.Destination = c2.CityID
-                JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
-                WHERE t.TicketID = %s
-            """
-        cursor.execute(query, (ticket_id,))
-        ticket = cursor.fetchone()
-
-        if not ticket:
-            raise HTTPException(status_code=404, detail="Ticket not found")
-
-        # convert date and time to string to prevent from ValidationError
-        ticket["DepartureDate"] = str(ticket["DepartureDate"])
-        ticket["DepartureTime"] = str(ticket["DepartureTime"])
-        ticket["ArrivalDate"] = str(ticket["ArrivalDate"])
-        ticket["ArrivalTime"] = str(ticket["ArrivalTime"])
+        row = await db.fetch_one(TICKET_DETAIL_QUERY + " WHERE t.TicketID = %s", (ticket_id,))
 
-        # check features
-        vehicle_features = {}
+        if not row:
+            raise HTTPException(status_code=404, detail="Ticket not found")
 
-        cursor.execute("SELECT * FROM AirplaneTicket WHERE TicketID = %s", (ticket_id,))
-        result = cursor.fetchone()
-        if result:
-            vehicle_features["Type"] = "Airplane"
-            vehicle_features.update(result)
-        else:
-            cursor.execute("SELECT * FROM BusTicket WHERE TicketID = %s", (ticket_id,))
-            result = cursor.fetchone()
-            if result:
-                vehicle_features["Type"] = "Bus"
-                vehicle_features.update(result)
-            else:
-                cursor.execute("SELECT * FROM TrainTicket WHERE TicketID = %s", (ticket_id,))
-                result = cursor.fetchone()
-                if result:
-                    vehicle_features["Type"] = "Train"
-                    vehicle_features.update(result)
-
-        # delete duplicate features from Ticket
-        vehicle_features.pop("TicketID", None)
-        ticket["Features"] = vehicle_features
+        ticket = _ticket_detail_from_row(row)
         #add to redis
-        redis_client.set(cash_key, json.dumps(ticket), ex=600)
+        try:
+            await async_redis_client.set(cash_key, json.dumps(ticket), ex=TICKET_DETAIL_CACHE_TTL)
+        except redis.exceptions.RedisError as e:
+            print(f"WARNING: ticket detail cache store failed: {e}")
         return ticket
-    except mysql.connector.Error as e:
-        db.rollback()
+    except MySQLError as e:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Database transaction failed: {e}")
-    finally:
-        cursor.close()
 
+# Details of many tickets at once (e.g. every result of a search): cache hits come from one MGET,
+# misses from one IN query, and the misses are written back with one pipeline
+@router.post("/batch", response_model=List[TicketDetailsResponse])
+async def get_ticket_details_batch(batch: TicketBatchRequest, db: AsyncDB = Depends(get_async_db)):
+    ticket_ids = list(dict.fromkeys(batch.TicketIDs))
+    if len(ticket_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {MAX_BATCH_SIZE} tickets per request.")
+    if not ticket_ids:
+        return []
+
+    try:
+        cached = await async_redis_client.mget([f"ticketDetail{ticket_id}" for ticket_id in ticket_ids])
+    except redis.exceptions.RedisError as e:
+        print(f"WARNING: ticket detail cache lookup failed: {e}")
+        cached = [None] * len(ticket_ids)
+    details = {ticket_id: json.loads(data) for ticket_id, data in zip(ticket_ids, cached) if data}
+    missing = [ticket_id for ticket_id in ticket_ids if ticket_id not in details]
+    record_cache("ticket_detail", True, len(details))
+    record_cache("ticket_detail", False, len(missing))
+
+    if missing:
+        try:
+            placeholders = ', '.join(['%s'] * len(missing))
+            rows = await db.fetch_all(TICKET_DETAIL_QUERY + f" WHERE t.TicketID IN ({placeholders})", missing)
+        except MySQLError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Database transaction failed: {e}")
+
+        pipe = async_redis_client.pipeline(transaction=False)
+        for row in rows:
+            ticket = _ticket_detail_from_row(row)
+            details[ticket["TicketID"]] = ticket
+            pipe.set(f"ticketDetail{ticket['TicketID']}", json.dumps(ticket), ex=TICKET_DETAIL_CACHE_TTL)
+        try:
+            await pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"WARNING: ticket detail cache store failed: {e}")
+
+    # requested order, unknown tickets are left out
+    return [details[ticket_id] for ticket_id in ticket_ids if ticket_id in details]
+
+
+# search cache is keyed by city names, Ticket rows only hold the IDs
+async def _route_city_names(origin_id: int, destination_id: int):
+    snapshot = await reference_data.snapshot()
+    return snapshot.city_names.get(origin_id), snapshot.city_names.get(destination_id)
+
+# default mode: buyers of the same ticket queue on the row lock
+async def _take_seat_with_row_lock(db: AsyncDB, ticket_id: int):
+    # qury been edited for ElasticSearch Synchronization
+    ticket = await db.fetch_one(
+        "SELECT Origin, Destination, DepartureDate, RemainingCapacity FROM Ticket WHERE TicketID = %s AND RemainingCapacity > 0 FOR UPDATE",
+        (ticket_id,))
+
+    if not ticket:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket is not available or sold out")
+
+    #add for elasticSearch synchronization
+    new_capacity = ticket['RemainingCapacity'] - 1
+
+    await db.execute("UPDATE Ticket SET RemainingCapacity = %s WHERE TicketID = %s",
+                     (new_capacity, ticket_id,))
+    return ticket, new_capacity
+
+# INVENTORY_MODE=redis: the seat is taken atomically in Redis, MySQL only applies a conditional decrement
+async def _take_seat_with_redis_inventory(db: AsyncDB, ticket_id: int):
+    new_capacity = await inventory.take_seat(db, ticket_id)
+    if new_capacity is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket is not available or sold out")
+
+    try:
+        result = await db.execute("UPDATE Ticket SET RemainingCapacity = RemainingCapacity - 1 WHERE TicketID = %s AND RemainingCapacity > 0",
+                                  (ticket_id,))
+        ticket = None
+        if result.rowcount:
+            ticket = await db.fetch_one("SELECT Origin, Destination, DepartureDate FROM Ticket WHERE TicketID = %s", (ticket_id,))
+    except BaseException:
+        # lock wait timeout, lost connection, cancelled request: the seat taken in Redis goes back
+        await inventory.release_seats(ticket_id)
+        raise
+    if ticket is None:
+        # Redis had a seat that MySQL does not have, trust MySQL
+        await db.rollback()
+        await inventory.reset_counter(db, ticket_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket is not available or sold out")
+    return ticket, new_capacity
 
 #(API 7) Reserve a ticket for the current user.
 @router.post("/reserve", response_model=ReservationResponse)
-def reserve_ticket(reservation: ReservationCreate, current_user: dict = Depends(get_current_user),
-                   db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
+async def reserve_ticket(reservation: ReservationCreate, current_user: dict = Depends(get_current_user),
+                         db: AsyncDB = Depends(get_async_db)):
+    seat_taken_in_redis = False
     try:
         # FIX: Removed db.start_transaction(). The transaction starts implicitly.
-        # qury been edited for ElasticSearch Synchronization
-        cursor.execute(
-            "SELECT Origin, Destination, DepartureDate, RemainingCapacity FROM Ticket WHERE TicketID = %s AND RemainingCapacity > 0 FOR UPDATE",
-            (reservation.TicketID,))
-        ticket = cursor.fetchone()
-        #add for elasticSearch synchronization
-        new_capacity = ticket['RemainingCapacity'] - 1
-
-        if not ticket:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket is not available or sold out")
-
-        cursor.execute("UPDATE Ticket SET RemainingCapacity = %s WHERE TicketID = %s",
-                       (new_capacity,reservation.TicketID,))
-
+        if inventory.enabled():
+            ticket, new_capacity = await _take_seat_with_redis_inventory(db, reservation.TicketID)
+            seat_taken_in_redis = True
+        else:
+            ticket, new_capacity = await _take_seat_with_row_lock(db, reservation.TicketID)
 
         expiry_time = datetime.utcnow() + timedelta(minutes=10)
         insert_query = "INSERT INTO Reservation (UserID, TicketID, ReservationStatus, ReservationTime, ReservationExpiryTime) VALUES (%s, %s, %s, %s, %s)"
-        cursor.execute(insert_query, (
+        result = await db.execute(insert_query, (
         current_user['UserID'], reservation.TicketID, "Reserved", datetime.utcnow(), expiry_time))
-        reservation_id = cursor.lastrowid
-        db.commit()
+        reservation_id = result.lastrowid
+        await db.commit()
+        seat_taken_in_redis = False
 
-        # --- ELASTICSEARCH SYNC ---
-        sync_ticket_in_es(ticket_id=reservation.TicketID, doc_to_update={"RemainingCapacity": new_capacity})
+        # --- ELASTICSEARCH SYNC (queued, applied by the es_writer worker) ---
+        route = (*await _route_city_names(ticket['Origin'], ticket['Destination']), ticket['DepartureDate'])
+        await sync_ticket_in_es(ticket_id=reservation.TicketID, doc_to_update={"RemainingCapacity": new_capacity},
+                                route=route)
 
         # --- CACHE INVALIDATION (update redis cache)---
-        cache_key = f"searchTickets:{ticket['Origin']}:{ticket['Destination']}:{ticket['DepartureDate']}"
         cash_key2 = f"ticketDetail{reservation.TicketID}"
-        if cach_data := redis_client.get(cash_key2):
-            ticketDetail = json.loads(cach_data)
-            ticketDetail['RemainingCapacity'] -= 1
-            redis_client.delete(cash_key2)
-            redis_client.set(cash_key2, json.dumps(ticketDetail), ex=600)
-
-        if cashed_result := redis_client.get(cache_key):
-            redis_ticket_list = json.loads(cashed_result)
-            for t in redis_ticket_list:
-                if t['TicketID'] == reservation.TicketID:
-                    if t['RemainingCapacity'] > 0:
-                        t['RemainingCapacity'] -= 1
-                        redis_client.delete(cache_key)
-                        redis_client.set(cache_key, json.dumps(redis_ticket_list), ex=600)
-                        break
+        try:
+            if cach_data := await async_redis_client.get(cash_key2):
+                ticketDetail = json.loads(cach_data)
+                ticketDetail['RemainingCapacity'] = new_capacity
+                await async_redis_client.set(cash_key2, json.dumps(ticketDetail), ex=600)
+        except redis.exceptions.RedisError as e:
+            # the reservation is committed, a stale cache entry expires on its own
+            print(f"WARNING: ticket detail cache update failed for TicketID {reservation.TicketID}: {e}")
+
+        await bump_route_version(*route)
 
         #--------------------------
 
-        cursor.execute("SELECT * FROM Reservation WHERE ReservationID = %s", (reservation_id,))
-        new_reservation = cursor.fetchone()
-        return new_reservation
-    except mysql.connector.Error as e:
-        db.rollback()
+        return await db.fetch_one("SELECT * FROM Reservation WHERE ReservationID = %s", (reservation_id,))
+    except MySQLError as e:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Database transaction failed: {e}")
     finally:
-        cursor.close()
+        # the reservation was not committed, give the seat back
+        if seat_taken_in_redis:
+            await inventory.release_seats(reservation.TicketID)
 
 #(API 8) Pay for a reserved ticket
 @router.post("/pay")
-def pay_for_ticket(payment: PaymentRequest, current_user: dict = Depends(get_current_user), db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor()
+async def pay_for_ticket(payment: PaymentRequest, current_user: dict = Depends(get_current_user), db: AsyncDB = Depends(get_async_db)):
     try:
         # FIX: Removed db.start_transaction(). The transaction starts implicitly.
-        query = "SELECT ReservationID FROM Reservation WHERE ReservationID = %s AND UserID = %s AND ReservationStatus = 'Reserved' AND ReservationExpiryTime > NOW()"
-        cursor.execute(query, (payment.ReservationID, current_user['UserID']))
-        if not cursor.fetchone():
+        # expiry time is stored in UTC; the conditional update loses cleanly against the expiry sweeper
+        query = ("UPDATE Reservation SET ReservationStatus = 'Paid' WHERE ReservationID = %s AND UserID = %s "
+                 "AND ReservationStatus = 'Reserved' AND ReservationExpiryTime > UTC_TIMESTAMP()")
+        result = await db.execute(query, (payment.ReservationID, current_user['UserID']))
+        if result.rowcount == 0:
+            await db.rollback()
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reservation is invalid, expired, or does not exist")
 
-        cursor.execute("UPDATE Reservation SET ReservationStatus = 'Paid' WHERE ReservationID = %s", (payment.ReservationID,))
+        paid_at = datetime.utcnow()
         insert_payment = "INSERT INTO Payment (UserID, ReservationID, PaymentMethod, PaymentStatus, PaymentTime) VALUES (%s, %s, %s, %s, %s)"
-        cursor.execute(insert_payment, (current_user['UserID'], payment.ReservationID, payment.PaymentMethod, "Successful", datetime.utcnow()))
-        db.commit()
+        await db.execute(insert_payment, (current_user['UserID'], payment.ReservationID, payment.PaymentMethod, "Successful", paid_at))
+        await rollups.record_sale(db, payment.ReservationID, paid_at)
+        await db.commit()
+        await bump_report_cache_versions("payments")
         return {"message": "Payment successful. Ticket confirmed."}
-    except mysql.connector.Error as e:
-        db.rollback()
+    except MySQLError as e:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error during payment: {e}")
-    finally:
-        cursor.close()
 
 #(API 9) Check the cancellation penalty for a ticket
 @router.get("/{ticket_id}/cancellation-penalty")
-def check_cancellation_penalty(ticket_id: int, db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT Price, DepartureDate FROM Ticket WHERE TicketID = %s", (ticket_id,))
-    ticket = cursor.fetchone()
-    cursor.close()
+async def check_cancellation_penalty(ticket_id: int, db: AsyncDB = Depends(get_async_db)):
+    ticket = await db.fetch_one("SELECT Price, DepartureDate FROM Ticket WHERE TicketID = %s", (ticket_id,))
     if not ticket: raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found")
     
     departure_datetime = datetime.combine(ticket['DepartureDate'], datetime.min.time())
@@ -293,63 +508,75 @@ def check_cancellation_penalty(ticket_id: int, db: mysql.connector.connection.My
 
 #(API 12) Cancel a confirmed reservation and get a refund
 @router.post("/reservations/{reservation_id}/cancel")
-def cancel_ticket(reservation_id: int, current_user: dict = Depends(get_current_user),
-                  db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+async def cancel_ticket(reservation_id: int, current_user: dict = Depends(get_current_user),
+                        db: AsyncDB = Depends(get_async_db)):
 
-    cursor = db.cursor(dictionary=True)
     try:
         query = """
-            SELECT t.`TicketID`, t.`Origin`, t.`Destination`, t.`DepartureDate`, t.`Price`, t.`RemainingCapacity`
+            SELECT t.`TicketID`, c1.`CityName` AS Origin, c2.`CityName` AS Destination,
+                   t.`DepartureDate`, t.`Price`, t.`RemainingCapacity`
             FROM `Reservation` r JOIN `Ticket` t ON r.TicketID = t.TicketID
+            JOIN `City` c1 ON t.Origin = c1.CityID
+            JOIN `City` c2 ON t.Destination = c2.CityID
             WHERE r.`ReservationID` = %s AND r.`UserID` = %s AND r.`ReservationStatus` = %s
         """
-        cursor.execute(query, (reservation_id, current_user['UserID'], 'Paid'))
-
-        reservation_info = cursor.fetchone()
-        cursor.fetchall()
-
-        #add for elasticSearch synchronization
-        new_capacity = reservation_info['RemainingCapacity'] + 1
+        reservation_info = await db.fetch_one(query, (reservation_id, current_user['UserID'], 'Paid'))
 
         if not reservation_info:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Confirmed reservation not found")
 
-        cursor.execute("UPDATE Reservation SET ReservationStatus = 'Cancelled' WHERE ReservationID = %s",
-                       (reservation_id,))
-        cursor.execute("UPDATE Ticket SET RemainingCapacity = %s WHERE TicketID = %s",
-                       (new_capacity,reservation_info['TicketID'],))
-        db.commit()
-
-        # --- ELASTICSEARCH SYNC ---
-        sync_ticket_in_es(ticket_id=reservation_info['TicketID'], doc_to_update={"RemainingCapacity": new_capacity})
+        # conditional like the seat update: of two concurrent cancels only one changes the row and gives the seat back
+        result = await db.execute("UPDATE Reservation SET ReservationStatus = 'Cancelled' "
+                                  "WHERE ReservationID = %s AND ReservationStatus = 'Paid'", (reservation_id,))
+        if result.rowcount == 0:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Confirmed reservation not found")
+        # the rollup increments are not idempotent, count the cancellation only once this request cancelled the row
+        await rollups.record_cancellation(db, reservation_id)
+        await db.execute("UPDATE Ticket SET RemainingCapacity = RemainingCapacity + 1 WHERE TicketID = %s",
+                         (reservation_info['TicketID'],))
+        #add for elasticSearch synchronization (the row is locked by the update, so this is our own value)
+        row = await db.fetch_one("SELECT RemainingCapacity FROM Ticket WHERE TicketID = %s", (reservation_info['TicketID'],))
+        new_capacity = row['RemainingCapacity']
+        await db.commit()
+
+        if inventory.enabled():
+            await inventory.release_seats(reservation_info['TicketID'])
+
+        # --- ELASTICSEARCH SYNC (queued, applied by the es_writer worker) ---
+        route = (reservation_info['Origin'], reservation_info['Destination'], reservation_info['DepartureDate'])
+        await sync_ticket_in_es(ticket_id=reservation_info['TicketID'], doc_to_update={"RemainingCapacity": new_capacity},
+                                route=route)
 
         # --- CACHE INVALIDATION ---
-        cache_key = f"search:{reservation_info['Origin']}:{reservation_info['Destination']}:{reservation_info['DepartureDate']}"
-        redis_client.delete(cache_key)
+        await bump_route_version(*route)
+        try:
+            await async_redis_client.delete(f"ticketDetail{reservation_info['TicketID']}")
+        except redis.exceptions.RedisError as e:
+            print(f"WARNING: ticket detail cache delete failed for TicketID {reservation_info['TicketID']}: {e}")
+        await bump_report_cache_versions("cancelledTickets")
         # --------------------------
 
         # Use the dedicated function to ensure consistent logic
-        penalty_info = check_cancellation_penalty(reservation_info['TicketID'], db=db)
+        penalty_info = await check_cancellation_penalty(reservation_info['TicketID'], db=db)
 
         return {"message": "Ticket cancelled successfully", "refund_amount": penalty_info['refund_amount']}
-    except mysql.connector.Error as e:
-        db.rollback()
+    except MySQLError as e:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Database error during cancellation: {e}")
-    finally:
-        cursor.close()
 
 #(API 13) Report an issue with a ticket
 @router.post("/report")
-def report_issue(report: ReportCreate, current_user: dict = Depends(get_current_user), db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
-    cursor = db.cursor()
-    cursor.execute("SELECT ReportSubjectID FROM Reportsubject WHERE SubjectName = %s", (report.ReportSubject,))
-    r_subject = cursor.fetchone()
-    t = r_subject[0]
-    cursor.fetchall()
+async def report_issue(report: ReportCreate, current_user: dict = Depends(get_current_user), db: AsyncDB = Depends(get_async_db)):
+    report_subject_id = await reference_data.report_subject_id(report.ReportSubject)
+    if report_subject_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Report subject '{report.ReportSubject}' not found.")
     query = "INSERT INTO Reports (ReportingUserID, ReservationID, ReportSubject, HandledBy, ReportText, ReportStatus) VALUES (%s, %s, %s, %s, %s, %s)"
-    data = (current_user['UserID'], report.ReservationID, r_subject[0], None,report.ReportText, "Pending")
-    cursor.execute(query, data)
-    db.commit()
-    cursor.close()
+    data = (current_user['UserID'], report.ReservationID, report_subject_id, None,report.ReportText, "Pending")
+    await db.execute(query, data)
+    await rollups.record_report(db, current_user['UserID'], report_subject_id)
+    await db.commit()
+    # cached pages of /admin/reports do not have this report yet
+    await bump_report_cache_versions("reports")
     return {"message": "Your report has been submitted."}
\ No newline at end of file
@@ -1,24 +1,24 @@
-import json
-
+import redis
 from fastapi import APIRouter, Depends, HTTPException, status
-import mysql.connector
 from typing import List
 
-from app.database import get_db_connection, redis_client
+from app.async_db import AsyncDB, MySQLError, get_async_db
+from app.principal_cache import invalidate_principal
+from app import reference_data
 from app.dependencies import get_current_user
 from app.schemas import UserProfileUpdate, UserResponse, ReservationResponse, UserBookingDetailsResponse
 
 router = APIRouter(prefix="/users", tags=["User Profile"])
 
-#Should be cashed with redis(expire time = jwt expire time)
+#served from the principal cache (expire time = jwt expire time)
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: dict = Depends(get_current_user)):
+async def read_users_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
 #(API 3) Update profile of the current logged-in user
 @router.put("/me")
-def update_user_profile(profile: UserProfileUpdate, current_user: dict = Depends(get_current_user),
-                        db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+async def update_user_profile(profile: UserProfileUpdate, current_user: dict = Depends(get_current_user),
+                              db: AsyncDB = Depends(get_async_db)):
 
     update_data = profile.dict(exclude_unset=True)
     if not update_data:
@@ -27,20 +27,15 @@ def update_user_profile(profile: UserProfileUpdate, current_user: dict = Depends
     set_clauses = []
     values = []
 
-    cursor = db.cursor(dictionary=True)
-
     try:
 
         if "City" in update_data:
             city_name = update_data.pop("City")
-            cursor.execute("SELECT CityID FROM City WHERE CityName = %s", (city_name,))
-            city_record = cursor.fetchone()
-            cursor.fetchall()
-            if not city_record:
+            city_id = await reference_data.city_id(city_name)
+            if city_id is None:
                 raise HTTPException(status_code=400, detail=f"City '{city_name}' not found.")
             set_clauses.append("CityID = %s")
-            values.append(city_record['CityID'])
-            update_data['CityID'] = city_record['CityID']  # for cash in Redis
+            values.append(city_id)
 
         for key, value in update_data.items():
             set_clauses.append(f"{key} = %s")
@@ -52,39 +47,24 @@ def update_user_profile(profile: UserProfileUpdate, current_user: dict = Depends
         values.append(current_user['UserID'])
 
         query = f"UPDATE `User` SET {', '.join(set_clauses)} WHERE UserID = %s"
-        cursor.execute(query, tuple(values))
-        db.commit()
-
-        # create new profile for redis
-        updated_profile = {
-            "UserID": current_user["UserID"],
-            **update_data  # all updated fields
-        }
-
-        # keep old values for un updated fields
-        cursor.execute("SELECT FirstName, LastName, Email, PhoneNumber, Role, CityID FROM `User` WHERE UserID = %s", (current_user['UserID'],))
-        full_user = cursor.fetchone()
-        for field in ["FirstName", "LastName", "Email", "PhoneNumber", "Role", "CityID"]:
-            updated_profile.setdefault(field, full_user.get(field))
+        await db.execute(query, tuple(values))
+        await db.commit()
 
-        redis_key = f"user_profile:{current_user['UserID']}"
-        redis_client.set(redis_key, json.dumps(updated_profile), ex=3600)
-        print(f"SUCCESS: User profile for UserID {current_user['UserID']} cached in Redis.")
+        # cached principal of this token subject is stale now
+        await invalidate_principal(current_user["Email"], update_data.get("Email"))
 
-    except mysql.connector.Error as err:
-        db.rollback()
+    except MySQLError as err:
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {err}")
-    except Exception as e:
-        print(f"WARNING: Redis caching failed for UserID {current_user['UserID']}. Error: {e}")
-    finally:
-        cursor.close()
+    except redis.exceptions.RedisError as e:
+        print(f"WARNING: principal cache invalidation failed for UserID {current_user['UserID']}. Error: {e}")
 
     return {"message": "Profile updated successfully."}
 
 #(API 11) Get list of bookings for the current user
 @router.get("/me/bookings", response_model=List[UserBookingDetailsResponse])
-def get_user_bookings(current_user: dict = Depends(get_current_user),
-                      db: mysql.connector.connection.MySQLConnection = Depends(get_db_connection)):
+async def get_user_bookings(current_user: dict = Depends(get_current_user),
+                            db: AsyncDB = Depends(get_async_db)):
 
     query = """
         SELECT
@@ -105,10 +85,7 @@ def get_user_bookings(current_user: dict = Depends(get_current_user),
         WHERE r.UserID = %s
         ORDER BY r.ReservationTime DESC
     """
-    cursor = db.cursor(dictionary=True)
-    cursor.execute(query, (current_user['UserID'],))
-    results = cursor.fetchall()
-    cursor.close()
+    results = await db.fetch_all(query, (current_user['UserID'],))
     bookings = []
     for row in results:
         booking_data = {
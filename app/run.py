@@ -1,4 +1,5 @@
 import uvicorn
 
+# development server with auto reload; production: python -m app.serve
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
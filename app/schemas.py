@@ -71,6 +71,58 @@ class AdvancedTicketSearchResponse(BaseModel):
     CompanyName: str
     VehicleType: str
 
+#Search facets (include_facets=true)
+class FacetBucket(BaseModel):
+    Value: str
+    Count: int
+
+class PriceRangeBucket(BaseModel):
+    From: Optional[float] = None
+    To: Optional[float] = None
+    Count: int
+
+class PriceFacet(BaseModel):
+    Min: Optional[float] = None
+    Max: Optional[float] = None
+    Ranges: List[PriceRangeBucket]
+
+class DepartureHourBucket(BaseModel):
+    Hour: int
+    Count: int
+
+class SearchFacets(BaseModel):
+    Price: PriceFacet
+    Companies: List[FacetBucket]
+    VehicleTypes: List[FacetBucket]
+    DepartureHours: List[DepartureHourBucket]
+
+class FacetedTicketSearchResponse(BaseModel):
+    Total: int
+    Tickets: List[TicketSearchResponse]
+    Facets: SearchFacets
+
+class FacetedAdvancedTicketSearchResponse(BaseModel):
+    Total: int
+    Tickets: List[AdvancedTicketSearchResponse]
+    Facets: SearchFacets
+
+#Fare calendar: cheapest available fare per day of a date window
+class FareCalendarDay(BaseModel):
+    Date: str
+    MinPrice: Optional[float] = None
+    Seats: int
+    Tickets: int
+
+#Connection search: itineraries with one or two stops
+class ConnectionItinerary(BaseModel):
+    Stops: int
+    Via: List[str]
+    TotalPrice: float
+    DepartureDateTime: str
+    ArrivalDateTime: str
+    DurationMinutes: int
+    Legs: List[AdvancedTicketSearchResponse]
+
 class TicketDetailsResponse(BaseModel):
     TicketID: int
     Origin: str
@@ -84,6 +136,9 @@ class TicketDetailsResponse(BaseModel):
     CompanyName: str
     Features: Optional[Dict] = None
 
+class TicketBatchRequest(BaseModel):
+    TicketIDs: List[int]
+
 #Reservation, Payment, Report
 class ReservationCreate(BaseModel):
     TicketID: int
@@ -108,6 +163,10 @@ class ReportCreate(BaseModel):
 class AdminReservationUpdate(BaseModel):
     NewStatus: str
 
+class AdminUserUpdate(BaseModel):
+    Role: Optional[str] = None
+    AccountStatus: Optional[str] = None
+
 class TicketInfoForBooking(BaseModel):
     Origin: str
     Destination: str
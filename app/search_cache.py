@@ -0,0 +1,160 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+from app import route_graph
+from app.database import redis_client, async_redis_client
+from app.metrics import record_cache
+
+# Search results are cached per origin, destination, date, vehicle type and facet variant.
+# Every route/date has a version counter and each cached entry records the version it was
+# built for, so a reservation or cancellation invalidates all cached variants with one INCR.
+SEARCH_CACHE_TTL = 600
+VERSION_KEY_TTL = 86400
+
+# per-process counters, exposed on /admin/cache/search-stats
+stats = {"hits": 0, "misses": 0}
+
+
+async def _lookup(version_key: str, entry_key: str):
+    """(version, payload): both keys are read in one pipelined round trip, an entry of an older version is a miss."""
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.get(version_key)
+    pipe.get(entry_key)
+    version, entry = await pipe.execute()
+    version = version or "0"
+    if entry is not None:
+        # entries are stored as "<version>\n<payload>"
+        entry_version, _, payload = entry.partition("\n")
+        if entry_version == version:
+            return version, payload
+    return version, None
+
+
+def _entry(version, payload: str) -> str:
+    return f"{version}\n{payload}"
+
+
+def route_version_key(origin: str, destination: str, date: str) -> str:
+    return f"searchVersion:{origin}:{destination}:{date}"
+
+
+def _cache_key(origin: str, destination: str, date: str, vehicle_type: str, variant: str = "") -> str:
+    # variant: filters and include_facets of the request (search_facets.cache_variant), "" for a plain search
+    return f"searchTickets:{origin}:{destination}:{date}:{vehicle_type}{variant}"
+
+
+async def get_cached_search(origin: str, destination: str, date: str, vehicle_type: str = "all", variant: str = ""):
+    """Return (payload, version); payload is the pre-serialized JSON or None on a miss."""
+    try:
+        version, payload = await _lookup(route_version_key(origin, destination, date),
+                                         _cache_key(origin, destination, date, vehicle_type, variant))
+    except Exception as e:
+        print(f"WARNING: search cache lookup failed: {e}")
+        stats["misses"] += 1
+        record_cache("search", False)
+        return None, None
+    stats["hits" if payload is not None else "misses"] += 1
+    record_cache("search", payload is not None)
+    return payload, version
+
+
+async def store_search(origin: str, destination: str, date: str, vehicle_type: str, version, result,
+                       variant: str = "") -> str:
+    """Serialize a validated result (ticket list or faceted response) and cache it under the version read before the search."""
+    payload = json.dumps(jsonable_encoder(result))
+    if version is not None:
+        key = _cache_key(origin, destination, date, vehicle_type, variant)
+        try:
+            await async_redis_client.set(key, _entry(version, payload), ex=SEARCH_CACHE_TTL)
+        except Exception as e:
+            print(f"WARNING: search cache store failed: {e}")
+    return payload
+
+
+# The fare calendar (/tickets/fare-calendar) spans many dates, so it is versioned per route:
+# every bump of a route/date also bumps the route's calendar version.
+FARE_CALENDAR_CACHE_TTL = 600
+
+
+def fare_calendar_version_key(origin: str, destination: str) -> str:
+    return f"fareCalendarVersion:{origin}:{destination}"
+
+
+def _fare_calendar_key(origin: str, destination: str, date_from: str, date_to: str, vehicle_type: str) -> str:
+    return f"fareCalendar:{origin}:{destination}:{date_from}:{date_to}:{vehicle_type}"
+
+
+async def get_cached_fare_calendar(origin: str, destination: str, date_from: str, date_to: str, vehicle_type: str):
+    """Return (payload, version) like get_cached_search."""
+    try:
+        version, payload = await _lookup(fare_calendar_version_key(origin, destination),
+                                         _fare_calendar_key(origin, destination, date_from, date_to, vehicle_type))
+    except Exception as e:
+        print(f"WARNING: fare calendar cache lookup failed: {e}")
+        record_cache("fare_calendar", False)
+        return None, None
+    record_cache("fare_calendar", payload is not None)
+    return payload, version
+
+
+async def store_fare_calendar(origin: str, destination: str, date_from: str, date_to: str, vehicle_type: str,
+                              version, result) -> str:
+    payload = json.dumps(jsonable_encoder(result))
+    if version is not None:
+        key = _fare_calendar_key(origin, destination, date_from, date_to, vehicle_type)
+        try:
+            await async_redis_client.set(key, _entry(version, payload), ex=FARE_CALENDAR_CACHE_TTL)
+        except Exception as e:
+            print(f"WARNING: fare calendar cache store failed: {e}")
+    return payload
+
+
+def _queue_version_bumps(pipe, origin: str, destination: str, date) -> None:
+    for key in (route_version_key(origin, destination, str(date)), fare_calendar_version_key(origin, destination)):
+        pipe.incr(key)
+        pipe.expire(key, VERSION_KEY_TTL)
+    # the pair may have sold out or got seats back, the connection search's route graph re-reads it
+    route_graph.queue_route_change(pipe, origin, destination)
+
+
+async def bump_route_version(origin: str, destination: str, date) -> None:
+    """Invalidate every cached search for this route and departure date, and the route's fare calendars."""
+    key = route_version_key(origin, destination, str(date))
+    pipe = async_redis_client.pipeline(transaction=False)
+    _queue_version_bumps(pipe, origin, destination, date)
+    try:
+        await pipe.execute()
+    except Exception as e:
+        # called after the commit; cached searches expire after SEARCH_CACHE_TTL anyway
+        print(f"WARNING: search cache invalidation failed for {key}: {e}")
+
+
+def bump_route_versions(routes) -> None:
+    """bump_route_version for many (origin, destination, date) routes in one round trip (sync, for the workers)."""
+    pipe = redis_client.pipeline(transaction=False)
+    for origin, destination, date in routes:
+        _queue_version_bumps(pipe, origin, destination, date)
+    pipe.execute()
+
+
+# The admin report pages (/admin/reports, /admin/cancellReports, /admin/paymentReports) use the
+# same scheme with one counter per report instead of one per route.
+def report_cache_version_key(name: str) -> str:
+    return f"adminCacheVersion:{name}"
+
+
+async def bump_report_cache_versions(*names: str) -> None:
+    """Drop every cached page of these admin reports (all cursors and filters)."""
+    pipe = async_redis_client.pipeline(transaction=False)
+    for name in names:
+        pipe.incr(report_cache_version_key(name))
+    try:
+        await pipe.execute()
+    except Exception as e:
+        print(f"WARNING: report cache invalidation failed for {names}: {e}")
+
+
+def get_stats() -> dict:
+    total = stats["hits"] + stats["misses"]
+    return {**stats, "hit_ratio": round(stats["hits"] / total, 4) if total else 0.0}
@@ -0,0 +1,172 @@
+"""
+Connection search: one- and two-stop itineraries for routes without a (suitable) direct ticket.
+
+1. The candidate paths come from the route graph (app/route_graph.py), with no Elasticsearch
+   request: origin -> hub -> destination and origin -> hub1 -> hub2 -> destination. Each path's
+   lower-bound price is the sum of its edges' lowest prices, and only the MAX_PATHS cheapest
+   paths are kept.
+2. The legs of those paths are fetched with two batched msearch requests. The first fetches the
+   first legs (origin -> hub on the requested date). The second fetches every later leg, inside a
+   departure window bounded by the earliest arrival at its hub plus the layovers and by the
+   maximum total duration. Each leg query returns only its best LEG_CANDIDATES tickets for the
+   requested ranking.
+3. The legs are joined in memory: each leg departs at least min_layover after the previous one
+   arrives, and the whole trip takes at most max_duration.
+"""
+import bisect
+import os
+from datetime import datetime, timedelta
+
+MAX_PATHS = int(os.getenv("CONNECTION_MAX_PATHS", 30))
+LEG_CANDIDATES = int(os.getenv("CONNECTION_LEG_CANDIDATES", 20))
+SORT_FIELDS = {"price": "Price", "arrival": "ArrivalDateTime"}
+
+
+def candidate_paths(graph, origin: str, destination: str, max_stops: int) -> list:
+    """Paths (tuples of cities) from origin to destination with 1..max_stops stops, cheapest lower bound first."""
+    paths = []
+    for hub, first_price in graph.outgoing.get(origin, {}).items():
+        if hub == destination:
+            continue
+        last_price = graph.incoming.get(destination, {}).get(hub)
+        if last_price is not None:
+            paths.append((first_price + last_price, (origin, hub, destination)))
+        if max_stops < 2:
+            continue
+        for second_hub, middle_price in graph.outgoing.get(hub, {}).items():
+            if second_hub in (origin, destination):
+                continue
+            last_price = graph.incoming.get(destination, {}).get(second_hub)
+            if last_price is not None:
+                paths.append((first_price + middle_price + last_price, (origin, hub, second_hub, destination)))
+    paths.sort(key=lambda item: (item[0], len(item[1])))
+    return [path for _, path in paths[:MAX_PATHS]]
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="seconds")
+
+
+def _leg_search(origin: str, destination: str, departs_from: datetime, departs_to: datetime,
+                arrives_by: datetime, sort_by: str) -> dict:
+    return {
+        "query": {"bool": {"filter": [
+            {"term": {"Origin": origin}},
+            {"term": {"Destination": destination}},
+            {"range": {"RemainingCapacity": {"gt": 0}}},
+            {"range": {"DepartureDateTime": {"gte": _iso(departs_from), "lte": _iso(departs_to)}}},
+            {"range": {"ArrivalDateTime": {"lte": _iso(arrives_by)}}}
+        ]}},
+        "sort": [{SORT_FIELDS[sort_by]: "asc"}],
+        "size": LEG_CANDIDATES
+    }
+
+
+async def _msearch(es, searches: dict) -> dict:
+    """{(origin, destination): search body} -> {(origin, destination): legs sorted by departure}, one request."""
+    if not searches:
+        return {}
+    lines = []
+    for body in searches.values():
+        lines.extend([{"index": "tickets"}, body])
+    response = await es.msearch(searches=lines)
+    legs = {}
+    for edge, result in zip(searches, response["responses"]):
+        if "error" in result:
+            raise RuntimeError(f"leg search {edge} failed: {result['error']}")
+        tickets = [hit["_source"] for hit in result["hits"]["hits"]]
+        for ticket in tickets:
+            ticket["_departure"] = datetime.fromisoformat(ticket["DepartureDateTime"])
+            ticket["_arrival"] = datetime.fromisoformat(ticket["ArrivalDateTime"])
+        legs[edge] = sorted(tickets, key=lambda ticket: ticket["_departure"])
+    return legs
+
+
+async def fetch_legs(es, paths: list, date: str, min_layover: timedelta, max_duration: timedelta,
+                     sort_by: str) -> dict:
+    """Candidate tickets of every edge of the paths, in two msearch round trips."""
+    day_start = datetime.fromisoformat(f"{date}T00:00:00")
+    day_end = datetime.fromisoformat(f"{date}T23:59:59")
+    first_legs = await _msearch(es, {
+        path[:2]: _leg_search(path[0], path[1], day_start, day_end, day_end + max_duration, sort_by)
+        for path in paths
+    })
+    earliest_arrival = {edge[1]: min(leg["_arrival"] for leg in legs) for edge, legs in first_legs.items() if legs}
+    if not earliest_arrival:
+        return first_legs
+    # no itinerary can end later than the last first leg departure plus max_duration
+    latest_end = max(leg["_departure"] for legs in first_legs.values() for leg in legs) + max_duration
+
+    # earliest departure of every later leg over all paths that use it
+    departs_from = {}
+    for path in paths:
+        if path[1] not in earliest_arrival:
+            continue
+        ready = earliest_arrival[path[1]] + min_layover
+        for edge in zip(path[1:], path[2:]):
+            departs_from[edge] = min(departs_from.get(edge, ready), ready)
+            # the next leg cannot leave before this one, plus a layover
+            ready += min_layover
+    later_legs = await _msearch(es, {
+        edge: _leg_search(edge[0], edge[1], start, latest_end, latest_end, sort_by)
+        for edge, start in departs_from.items()
+    })
+    return {**first_legs, **later_legs}
+
+
+def join_legs(path: tuple, legs: dict, min_layover: timedelta, max_duration: timedelta) -> list:
+    """Every feasible chain of tickets along one path."""
+    edges = list(zip(path, path[1:]))
+    if any(not legs.get(edge) for edge in edges):
+        return []
+    departures = {edge: [leg["_departure"] for leg in legs[edge]] for edge in edges}
+    chains = []
+
+    def extend(chain, position):
+        if position == len(edges):
+            chains.append(list(chain))
+            return
+        edge = edges[position]
+        deadline = chain[0]["_departure"] + max_duration
+        # legs are sorted by departure: skip the ones that leave before the layover is over
+        start = bisect.bisect_left(departures[edge], chain[-1]["_arrival"] + min_layover)
+        for leg in legs[edge][start:]:
+            if leg["_departure"] > deadline:
+                break
+            if leg["_arrival"] <= deadline:
+                chain.append(leg)
+                extend(chain, position + 1)
+                chain.pop()
+
+    for first in legs[edges[0]]:
+        extend([first], 1)
+    return chains
+
+
+def itinerary(chain: list) -> dict:
+    departure, arrival = chain[0]["_departure"], chain[-1]["_arrival"]
+    return {
+        "Stops": len(chain) - 1,
+        "Via": [leg["Destination"] for leg in chain[:-1]],
+        "TotalPrice": sum(leg["Price"] for leg in chain),
+        "DepartureDateTime": _iso(departure).replace("T", " "),
+        "ArrivalDateTime": _iso(arrival).replace("T", " "),
+        "DurationMinutes": int((arrival - departure).total_seconds() // 60),
+        "Legs": [{**{key: value for key, value in leg.items() if not key.startswith("_")},
+                  "DepartureDateTime": leg["DepartureDateTime"].replace("T", " "),
+                  "ArrivalDateTime": leg["ArrivalDateTime"].replace("T", " ")} for leg in chain]
+    }
+
+
+async def search(es, graph, origin: str, destination: str, date: str, max_stops: int, min_layover: timedelta,
+                 max_duration: timedelta, sort_by: str, limit: int) -> list:
+    paths = candidate_paths(graph, origin, destination, max_stops)
+    if not paths:
+        return []
+    legs = await fetch_legs(es, paths, date, min_layover, max_duration, sort_by)
+    chains = [chain for path in paths for chain in join_legs(path, legs, min_layover, max_duration)]
+    if sort_by == "price":
+        chains.sort(key=lambda chain: (sum(leg["Price"] for leg in chain), chain[-1]["_arrival"]))
+    else:
+        chains.sort(key=lambda chain: (chain[-1]["_arrival"], sum(leg["Price"] for leg in chain)))
+    return [itinerary(chain) for chain in chains[:limit]]
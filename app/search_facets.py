@@ -0,0 +1,113 @@
+"""
+Facets of the ticket searches (include_facets=true) and the filters that go with them.
+
+Everything comes from the one Elasticsearch request of the search. The route and date are
+the query; the facet filters (price, companies, vehicle types, departure hours) only narrow
+the returned hits through post_filter. Every facet is counted with all facet filters except
+its own, so after picking one company the client still sees how many tickets the other
+companies have and can add or switch values without another unfiltered search.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException, Query, status
+
+# edges of the price range buckets; the first and the last bucket are open-ended
+PRICE_RANGE_EDGES = [int(edge) for edge in os.getenv("SEARCH_PRICE_RANGES", "500000,1000000,2000000,4000000").split(",")]
+MAX_COMPANY_FACETS = 50
+
+
+def search_filters(
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        companies: Optional[List[str]] = Query(None, description="CompanyName, repeat the parameter for several"),
+        departure_hour_from: Optional[int] = Query(None, ge=0, le=23),
+        departure_hour_to: Optional[int] = Query(None, ge=0, le=23)
+) -> dict:
+    """Dependency: the facet filters of a search, only the ones that were given."""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_price is greater than max_price.")
+    if departure_hour_from is not None and departure_hour_to is not None and departure_hour_from > departure_hour_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="departure_hour_from is later than departure_hour_to.")
+    filters = {"min_price": min_price, "max_price": max_price, "companies": sorted(set(companies or [])),
+               "departure_hour_from": departure_hour_from, "departure_hour_to": departure_hour_to}
+    return {name: value for name, value in filters.items() if value not in (None, [])}
+
+
+def filter_clauses(filters: dict, date: str) -> dict:
+    """Facet name -> ES filter clause for every facet that is filtered on."""
+    clauses = {}
+    if "min_price" in filters or "max_price" in filters:
+        bounds = {"gte": filters.get("min_price"), "lte": filters.get("max_price")}
+        clauses["price"] = {"range": {"Price": {op: value for op, value in bounds.items() if value is not None}}}
+    if filters.get("companies"):
+        clauses["companies"] = {"terms": {"CompanyName.keyword": filters["companies"]}}
+    if filters.get("vehicle_types"):
+        clauses["vehicle_types"] = {"terms": {"VehicleType": filters["vehicle_types"]}}
+    if "departure_hour_from" in filters or "departure_hour_to" in filters:
+        hour_from = filters.get("departure_hour_from", 0)
+        hour_to = filters.get("departure_hour_to", 23)
+        clauses["departure_hours"] = {"range": {"DepartureDateTime": {"gte": f"{date}T{hour_from:02d}:00:00",
+                                                                      "lte": f"{date}T{hour_to:02d}:59:59"}}}
+    return clauses
+
+
+def post_filter(clauses: dict):
+    return {"bool": {"filter": list(clauses.values())}} if clauses else None
+
+
+def facet_aggregations(clauses: dict, date: str) -> dict:
+    """One filter aggregation per facet, each filtered by the other facets' clauses."""
+    def others(name):
+        return {"bool": {"filter": [clause for facet, clause in clauses.items() if facet != name]}}
+
+    edges = [None] + PRICE_RANGE_EDGES + [None]
+    price_ranges = [{key: value for key, value in (("from", low), ("to", high)) if value is not None}
+                    for low, high in zip(edges, edges[1:])]
+    return {
+        "price": {"filter": others("price"), "aggs": {
+            "ranges": {"range": {"field": "Price", "ranges": price_ranges}},
+            "stats": {"stats": {"field": "Price"}}}},
+        "companies": {"filter": others("companies"), "aggs": {
+            "values": {"terms": {"field": "CompanyName.keyword", "size": MAX_COMPANY_FACETS}}}},
+        "vehicle_types": {"filter": others("vehicle_types"), "aggs": {
+            "values": {"terms": {"field": "VehicleType", "size": 10}}}},
+        # the search covers one day, so hourly buckets of the day are the departure hours; no "format":
+        # ES would parse extended_bounds with it, the hour is taken from the epoch key instead
+        "departure_hours": {"filter": others("departure_hours"), "aggs": {
+            "values": {"date_histogram": {"field": "DepartureDateTime", "fixed_interval": "1h", "min_doc_count": 0,
+                                          "extended_bounds": {"min": f"{date}T00:00:00",
+                                                              "max": f"{date}T23:00:00"}}}}},
+    }
+
+
+def parse_facets(aggregations: dict) -> dict:
+    """ES aggregations -> the SearchFacets schema."""
+    price = aggregations["price"]
+    return {
+        "Price": {
+            "Min": price["stats"]["min"],
+            "Max": price["stats"]["max"],
+            "Ranges": [{"From": bucket.get("from"), "To": bucket.get("to"), "Count": bucket["doc_count"]}
+                       for bucket in price["ranges"]["buckets"]],
+        },
+        "Companies": [{"Value": bucket["key"], "Count": bucket["doc_count"]}
+                      for bucket in aggregations["companies"]["values"]["buckets"]],
+        "VehicleTypes": [{"Value": bucket["key"], "Count": bucket["doc_count"]}
+                         for bucket in aggregations["vehicle_types"]["values"]["buckets"]],
+        "DepartureHours": [{"Hour": datetime.fromtimestamp(bucket["key"] / 1000, timezone.utc).hour,
+                            "Count": bucket["doc_count"]}
+                           for bucket in aggregations["departure_hours"]["values"]["buckets"]],
+    }
+
+
+def cache_variant(filters: dict, include_facets: bool) -> str:
+    """Part of the search cache key that tells filtered and faceted results apart ("" for a plain search)."""
+    if not filters and not include_facets:
+        return ""
+    signature = json.dumps({"filters": filters, "facets": include_facets}, sort_keys=True)
+    return ":" + hashlib.sha1(signature.encode()).hexdigest()[:16]
@@ -0,0 +1,167 @@
+"""
+Production entry point: N uvicorn worker processes behind one listening socket.
+
+    python -m app.serve                          one worker per CPU core on 0.0.0.0:8000
+    python -m app.serve --workers 8 --port 8080
+    python -m app.serve --print-config           show worker count and pool sizes, do not start
+
+Every worker is a separate process with its own event loop (uvloop and httptools when they
+are installed, they come with uvicorn[standard]) and its own MySQL pools, so bcrypt and JSON
+encoding use all cores instead of one.
+
+Pool sizes are derived from MySQL's max_connections (read from the server, or
+--db-max-connections): minus --db-reserved connections for the es_writer, the sweepers, the
+CLI tools and the admin, the rest is split evenly between the workers and, within a worker,
+between the async pool (most routes) and the sync pool (analytics, health checks, reference
+data). DB_POOL_MAX_SIZE / ASYNC_DB_POOL_MAX_SIZE set in the environment win over the computed
+values.
+
+Each worker restarts after --max-requests requests (plus up to --max-requests-jitter, so they
+do not all restart at once) to contain memory growth. Signals to the parent process:
+    kill -HUP <pid>    rolling restart, e.g. after a deploy: each new worker must be ready
+                       before the old one is stopped, old workers finish their requests
+    kill -TTIN <pid>   one worker more,  kill -TTOU <pid>  one worker less
+    kill -TERM <pid>   graceful shutdown, in-flight requests get --graceful-timeout seconds
+For development with auto reload use app/run.py.
+"""
+import argparse
+import importlib.util
+import os
+import shutil
+import tempfile
+
+import mysql.connector
+import uvicorn
+from dotenv import load_dotenv
+
+# MySQL's default max_connections, used when the server cannot be asked
+DEFAULT_MAX_CONNECTIONS = 151
+# share of a worker's connections for the sync pool
+SYNC_POOL_SHARE = 0.2
+
+
+def default_workers() -> int:
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.getenv("WEB_CONCURRENCY"))
+    try:
+        # the cores this process may run on (containers, taskset), not all cores of the host
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def read_max_connections() -> int:
+    """@@max_connections of the configured server; the connection is closed again before any worker forks."""
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=int(os.getenv('DB_PORT', 3306)),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            database=os.getenv('DB_NAME'),
+            connection_timeout=5
+        )
+    except mysql.connector.Error as err:
+        print(f"WARNING: Could not read max_connections from MySQL ({err}), assuming {DEFAULT_MAX_CONNECTIONS}")
+        return DEFAULT_MAX_CONNECTIONS
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT @@max_connections")
+        return int(cursor.fetchone()[0])
+    finally:
+        connection.close()
+
+
+def pool_sizes(max_connections: int, reserved: int, workers: int) -> dict:
+    """Per-worker pool sizes that keep workers * (sync + async) within max_connections - reserved."""
+    per_worker = (max_connections - reserved) // workers
+    if per_worker < 4:
+        raise SystemExit(f"max_connections={max_connections} leaves {per_worker} connections per worker for "
+                         f"{workers} workers; use fewer workers or raise max_connections")
+    sync_size = max(2, int(per_worker * SYNC_POOL_SHARE))
+    return {"DB_POOL_MAX_SIZE": sync_size, "ASYNC_DB_POOL_MAX_SIZE": per_worker - sync_size}
+
+
+def configure_environment(args) -> dict:
+    """Set the per-worker settings as environment variables, the workers read them when they import the app."""
+    max_connections = args.db_max_connections or read_max_connections()
+    settings = pool_sizes(max_connections, args.db_reserved, args.workers)
+    for name, value in settings.items():
+        if os.getenv(name):
+            settings[name] = int(os.getenv(name))
+        os.environ[name] = str(settings[name])
+    for name, max_name in (("DB_POOL_MIN_SIZE", "DB_POOL_MAX_SIZE"), ("ASYNC_DB_POOL_MIN_SIZE", "ASYNC_DB_POOL_MAX_SIZE")):
+        settings[name] = min(int(os.getenv(name, 2)), settings[max_name])
+        os.environ[name] = str(settings[name])
+    total = args.workers * (settings["DB_POOL_MAX_SIZE"] + settings["ASYNC_DB_POOL_MAX_SIZE"])
+    if total > max_connections - args.db_reserved:
+        print(f"WARNING: {args.workers} workers may open {total} MySQL connections, "
+              f"max_connections={max_connections} minus {args.db_reserved} reserved leaves {max_connections - args.db_reserved}")
+
+    # every worker has its own bcrypt process pool, keep the total at about half the cores
+    settings["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS",
+                                                      max(1, (os.cpu_count() or 2) // 2 // args.workers)))
+    os.environ["PASSWORD_HASH_WORKERS"] = str(settings["PASSWORD_HASH_WORKERS"])
+    return settings
+
+
+def prepare_metrics_dir(args):
+    """/metrics has to add up the workers (see app/metrics.py); the directory must start empty."""
+    if args.workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        metrics_dir = os.path.join(tempfile.gettempdir(), f"ticketing-metrics-{args.port}")
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=default_workers(), help="default: WEB_CONCURRENCY or the core count")
+    parser.add_argument("--db-max-connections", type=int, default=int(os.getenv("DB_MAX_CONNECTIONS", 0)),
+                        help="MySQL max_connections (default: asked from the server)")
+    parser.add_argument("--db-reserved", type=int, default=int(os.getenv("DB_RESERVED_CONNECTIONS", 20)),
+                        help="connections kept free for the es_writer, sweepers, CLI tools and admins")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", 10000)),
+                        help="restart a worker after this many requests, 0 = never")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", 1000)))
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="seconds a stopping worker may spend finishing its requests")
+    parser.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout in seconds")
+    parser.add_argument("--no-access-log", action="store_true")
+    parser.add_argument("--print-config", action="store_true")
+    args = parser.parse_args()
+
+    settings = configure_environment(args)
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    print(f"Starting {args.workers} workers on {args.host}:{args.port} ({loop}, {http}), per worker: "
+          + ", ".join(f"{name}={value}" for name, value in settings.items()))
+    if args.print_config:
+        return
+    prepare_metrics_dir(args)
+    if args.workers == 1 and args.max_requests:
+        # a single worker runs without the supervisor that would start its replacement
+        print("WARNING: --max-requests is ignored with one worker")
+        args.max_requests = 0
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter if args.max_requests else 0,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        timeout_keep_alive=args.keep_alive,
+        access_log=not args.no_access_log
+    )
+
+
+if __name__ == "__main__":
+    main()
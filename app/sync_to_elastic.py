@@ -1,12 +1,28 @@
 import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import mysql.connector
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk
+from app import route_graph
 
 #Index name in ElasticSearch
 INDEX_NAME = "tickets"
 
+# row in EsSyncState that holds the high-water mark of TicketChangeLog (see migrations/001_ticket_changelog.sql)
+SYNC_NAME = "tickets"
+# max number of TicketIDs per "WHERE TicketID IN (...)" query
+ID_BATCH_SIZE = 1000
+
+# defaults of the bulk pipeline, all of them can be changed from the command line
+CHUNK_SIZE = 1000
+THREAD_COUNT = 4
+WORKER_COUNT = 1
+# print a progress line every N chunks
+PROGRESS_EVERY = 50
+
 # Define schema index for Tickets
 INDEX_MAPPING = {
     "mappings": {
@@ -36,46 +52,131 @@ def create_mysql_connection():
     print("Connecting to MySQL database ...")
     return mysql.connector.connect(
         host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', 3306)),
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD'),
         database=os.getenv('DB_NAME')
     )
 
-def fetch_tickets_from_mysql(db_conn):
-    print("Reading information from MySQL...")
-    cursor = db_conn.cursor(dictionary=True)
-    query = """
-        SELECT
-            t.TicketID,
-            c1.CityName AS Origin,
-            c2.CityName AS Destination,
-            CONCAT(t.DepartureDate, 'T', t.DepartureTime) as DepartureDateTime,
-            CONCAT(t.ArrivalDate, 'T', t.ArrivalTime) as ArrivalDateTime,
-            t.Price,
-            t.RemainingCapacity,
-            tc.CompanyName,
-            CASE
-                WHEN at.TicketID IS NOT NULL THEN 'airplane'
-                WHEN bt.TicketID IS NOT NULL THEN 'bus'
-                WHEN tt.TicketID IS NOT NULL THEN 'train'
-                ELSE 'unknown'
-            END AS VehicleType,
-            at.FlightClass, at.NumberOfStops, at.FlightNumber,
-            bt.BusType,
-            tt.NumberOfStars, tt.ClosedCompartment
-        FROM Ticket t
-        JOIN City c1 ON t.Origin = c1.CityID
-        JOIN City c2 ON t.Destination = c2.CityID
-        JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
-        LEFT JOIN AirplaneTicket at ON t.TicketID = at.TicketID
-        LEFT JOIN BusTicket bt ON t.TicketID = bt.TicketID
-        LEFT JOIN TrainTicket tt ON t.TicketID = tt.TicketID
+TICKET_QUERY = """
+    SELECT
+        t.TicketID,
+        c1.CityName AS Origin,
+        c2.CityName AS Destination,
+        CONCAT(t.DepartureDate, 'T', t.DepartureTime) as DepartureDateTime,
+        CONCAT(t.ArrivalDate, 'T', t.ArrivalTime) as ArrivalDateTime,
+        t.Price,
+        t.RemainingCapacity,
+        tc.CompanyName,
+        CASE
+            WHEN at.TicketID IS NOT NULL THEN 'airplane'
+            WHEN bt.TicketID IS NOT NULL THEN 'bus'
+            WHEN tt.TicketID IS NOT NULL THEN 'train'
+            ELSE 'unknown'
+        END AS VehicleType,
+        at.FlightClass, at.NumberOfStops, at.FlightNumber,
+        bt.BusType,
+        tt.NumberOfStars, tt.ClosedCompartment
+    FROM Ticket t
+    JOIN City c1 ON t.Origin = c1.CityID
+    JOIN City c2 ON t.Destination = c2.CityID
+    JOIN TransportCompany tc ON t.TransportCompanyID = tc.TransportCompanyID
+    LEFT JOIN AirplaneTicket at ON t.TicketID = at.TicketID
+    LEFT JOIN BusTicket bt ON t.TicketID = bt.TicketID
+    LEFT JOIN TrainTicket tt ON t.TicketID = tt.TicketID
+"""
+
+def stream_tickets_from_mysql(db_conn, chunk_size=CHUNK_SIZE, where="", params=()):
+    """Yield ticket rows from an unbuffered cursor, never holding more than one chunk in memory."""
+    cursor = db_conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(TICKET_QUERY + where, params)
+        while rows := cursor.fetchmany(chunk_size):
+            yield from rows
+    finally:
+        cursor.close()
+
+def stream_tickets_by_ids(db_conn, ticket_ids, chunk_size=CHUNK_SIZE):
+    ticket_ids = list(ticket_ids)
+    for i in range(0, len(ticket_ids), ID_BATCH_SIZE):
+        batch = ticket_ids[i:i + ID_BATCH_SIZE]
+        placeholders = ', '.join(['%s'] * len(batch))
+        yield from stream_tickets_from_mysql(db_conn, chunk_size, f" WHERE t.TicketID IN ({placeholders})", batch)
+
+def partition_id_ranges(db_conn, parts):
+    """Split [MIN(TicketID), MAX(TicketID)] into `parts` contiguous ranges."""
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT MIN(TicketID), MAX(TicketID) FROM Ticket")
+    low, high = cursor.fetchone()
+    cursor.close()
+    if low is None:
+        return []
+    step = (high - low) // parts + 1
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+# --- Watermark handling for incremental sync ---
+def read_watermark(db_conn):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT LastChangeID FROM EsSyncState WHERE SyncName = %s", (SYNC_NAME,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+def read_settled_change_id(db_conn):
+    """Highest ChangeID below which no open transaction can still commit a change log row.
+
+    The triggers stamp ChangedAt when the statement runs, not when its transaction commits, so a
+    transaction that stays open (lock waits, a sweeper batch, a slow admin edit) commits its
+    ChangeIDs after larger ones of other transactions. All its rows are stamped at or after its
+    trx_started, so the watermark stops before the first row, committed or not, written since the
+    oldest transaction that is still open started. Reading information_schema.innodb_trx needs the
+    PROCESS privilege.
     """
-    cursor.execute(query)
-    tickets = cursor.fetchall()
+    # end our own snapshot, the next transaction reads uncommitted rows: they are what we must stay below
+    db_conn.commit()
+    cursor = db_conn.cursor()
+    try:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED")
+        cursor.execute("SELECT COALESCE(MIN(trx_started), NOW(3)) FROM information_schema.innodb_trx "
+                       "WHERE trx_mysql_thread_id <> CONNECTION_ID()")
+        oldest_open = cursor.fetchone()[0]
+        # one statement, so a row added while we read is seen by both parts or by neither
+        cursor.execute("SELECT COALESCE(MIN(CASE WHEN ChangedAt >= %s THEN ChangeID END) - 1, MAX(ChangeID), 0) "
+                       "FROM TicketChangeLog", (oldest_open,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        db_conn.commit()
+
+def save_watermark(db_conn, change_id):
+    cursor = db_conn.cursor()
+    cursor.execute("""
+        INSERT INTO EsSyncState (SyncName, LastChangeID, LastSyncTime) VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE LastChangeID = VALUES(LastChangeID), LastSyncTime = VALUES(LastSyncTime)
+    """, (SYNC_NAME, change_id))
+    # processed entries are not needed anymore, keep the log small
+    cursor.execute("DELETE FROM TicketChangeLog WHERE ChangeID <= %s", (change_id,))
+    db_conn.commit()
     cursor.close()
-    print(f"{len(tickets)} tickets reads from MySQL")
-    return tickets
+
+def clear_watermark(db_conn):
+    """Forget the watermark, so the next run is a full sync again. TicketChangeLog is kept."""
+    cursor = db_conn.cursor()
+    cursor.execute("DELETE FROM EsSyncState WHERE SyncName = %s", (SYNC_NAME,))
+    db_conn.commit()
+    cursor.close()
+
+def fetch_changed_ticket_ids(db_conn, after_change_id, up_to_change_id):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT DISTINCT TicketID FROM TicketChangeLog WHERE ChangeID > %s AND ChangeID <= %s",
+                   (after_change_id, up_to_change_id))
+    ticket_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ticket_ids
+
+def generate_delete_actions(ticket_ids):
+    for ticket_id in ticket_ids:
+        yield {"_op_type": "delete", "_index": INDEX_NAME, "_id": ticket_id}
 
 def generate_actions(tickets):
     for ticket in tickets:
@@ -95,23 +196,141 @@ def generate_actions(tickets):
         }
         yield {"_index": INDEX_NAME, "_id": ticket["TicketID"], "_source": doc}
 
-def main():
+def index_tickets(es_client, actions, chunk_size=CHUNK_SIZE, thread_count=THREAD_COUNT, label="sync"):
+    """Index lazily generated actions with parallel_bulk, reporting docs/sec and errors per chunk."""
+    stats = {"indexed": 0, "errors": 0, "chunks": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    chunk_docs = chunk_errors = 0
+
+    def finish_chunk():
+        nonlocal chunk_docs, chunk_errors
+        stats["chunks"] += 1
+        if chunk_errors:
+            print(f"[{label}] chunk {stats['chunks']}: {chunk_errors}/{chunk_docs} documents failed")
+        elif stats["chunks"] % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - started
+            print(f"[{label}] {stats['indexed']} docs indexed, {stats['indexed'] / elapsed:.0f} docs/sec")
+        chunk_docs = chunk_errors = 0
+
+    for ok, info in parallel_bulk(es_client, actions, thread_count=thread_count, chunk_size=chunk_size,
+                                  raise_on_error=False, raise_on_exception=False):
+        chunk_docs += 1
+        # deleting a ticket that is not in the index (anymore) is not a failure
+        if ok or info.get("delete", {}).get("status") == 404:
+            stats["indexed"] += 1
+        else:
+            stats["errors"] += 1
+            chunk_errors += 1
+        if chunk_docs == chunk_size:
+            finish_chunk()
+    if chunk_docs:
+        finish_chunk()
+
+    stats["seconds"] = time.perf_counter() - started
+    print_stats(label, stats)
+    return stats
+
+def print_stats(label, stats):
+    rate = stats["indexed"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"[{label}] {stats['indexed']} docs in {stats['seconds']:.1f}s ({rate:.0f} docs/sec), "
+          f"{stats['errors']} errors in {stats['chunks']} chunks")
+
+def _index_id_range(id_range, chunk_size, thread_count):
+    """Worker process: index one TicketID range with its own MySQL and ES connections."""
+    es_client = create_es_client()
+    db_conn = create_mysql_connection()
+    try:
+        rows = stream_tickets_from_mysql(db_conn, chunk_size, " WHERE t.TicketID BETWEEN %s AND %s", id_range)
+        return index_tickets(es_client, generate_actions(rows), chunk_size, thread_count,
+                             label=f"ids {id_range[0]}-{id_range[1]}")
+    finally:
+        db_conn.close()
+        es_client.close()
+
+def full_sync(es_client, db_conn, chunk_size=CHUNK_SIZE, thread_count=THREAD_COUNT, workers=WORKER_COUNT):
+    # take the watermark first, changes made while we read are picked up by the next incremental run
+    change_id = read_settled_change_id(db_conn)
+    print("Indexing data in ElasticSearch...")
+    if workers > 1:
+        id_ranges = partition_id_ranges(db_conn, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_index_id_range, id_ranges,
+                                    [chunk_size] * len(id_ranges), [thread_count] * len(id_ranges)))
+        stats = {key: sum(r[key] for r in results) for key in ("indexed", "errors", "chunks")}
+        # workers run side by side, the slowest one decides the wall time
+        stats["seconds"] = max((r["seconds"] for r in results), default=0.0)
+        print_stats("full sync", stats)
+    else:
+        rows = stream_tickets_from_mysql(db_conn, chunk_size)
+        stats = index_tickets(es_client, generate_actions(rows), chunk_size, thread_count, label="full sync")
+    if not stats["indexed"] and not stats["errors"]:
+        print("No ticket found for indexing!")
+    if stats["errors"]:
+        # documents that failed are not in the change log, only another full sync brings them in
+        print(f"WARNING: {stats['errors']} documents failed, the next run does a full sync again")
+        clear_watermark(db_conn)
+    else:
+        save_watermark(db_conn, change_id)
+    return stats["indexed"]
+
+def incremental_sync(es_client, db_conn, chunk_size=CHUNK_SIZE, thread_count=THREAD_COUNT, workers=WORKER_COUNT):
+    last_change_id = read_watermark(db_conn)
+    if last_change_id is None:
+        print("No watermark found, running a full sync first")
+        return full_sync(es_client, db_conn, chunk_size, thread_count, workers)
+
+    change_id = read_settled_change_id(db_conn)
+    if change_id <= last_change_id:
+        print("Index is up to date")
+        return 0
+    changed_ids = fetch_changed_ticket_ids(db_conn, last_change_id, change_id)
+    print(f"{len(changed_ids)} tickets changed since ChangeID {last_change_id}")
+
+    # tickets that are in the log but not in MySQL anymore were deleted
+    found_ids = set()
+    def remember(rows):
+        for row in rows:
+            found_ids.add(row["TicketID"])
+            yield row
+
+    rows = stream_tickets_by_ids(db_conn, changed_ids, chunk_size)
+    stats = index_tickets(es_client, generate_actions(remember(rows)), chunk_size, thread_count, label="incremental")
+    errors = stats["errors"]
+    deleted_ids = set(changed_ids) - found_ids
+    if deleted_ids:
+        print(f"Removing {len(deleted_ids)} deleted tickets from ElasticSearch...")
+        errors += index_tickets(es_client, generate_delete_actions(deleted_ids), chunk_size, thread_count,
+                                label="delete")["errors"]
+    if errors:
+        # keep the watermark and the log entries: the next run indexes the same tickets again
+        print(f"WARNING: {errors} documents failed, watermark stays at ChangeID {last_change_id}")
+        return len(changed_ids)
+    save_watermark(db_conn, change_id)
+    return len(changed_ids)
+
+def request_route_graph_rebuild():
+    """New or deleted tickets can add or remove city pairs of the connection search's route graph."""
+    try:
+        route_graph.request_rebuild()
+    except Exception as e:
+        print(f"WARNING: Could not ask the API processes to rebuild the route graph: {e}")
+
+def main(full=False, chunk_size=CHUNK_SIZE, thread_count=THREAD_COUNT, workers=WORKER_COUNT):
     es_client = create_es_client()
     db_conn = create_mysql_connection()
     try:
         if not es_client.indices.exists(index=INDEX_NAME):
             print(f"Creating index {INDEX_NAME} ....")
             es_client.indices.create(index=INDEX_NAME, body=INDEX_MAPPING)
+            full = True
         else:
             print(f"Index {INDEX_NAME} already existed")
-        tickets_data = fetch_tickets_from_mysql(db_conn)
-        if tickets_data:
-            print("Indexing data in ElasticSearch...")
-            success, errors = bulk(es_client, generate_actions(tickets_data))
-            print(f"Operation done successfully: {success}")
-            if errors: print(f"Number of errors: {len(errors)}")
+        if full:
+            changed = full_sync(es_client, db_conn, chunk_size, thread_count, workers)
         else:
-            print("No ticket found for indexing!")
+            changed = incremental_sync(es_client, db_conn, chunk_size, thread_count, workers)
+        if changed:
+            request_route_graph_rebuild()
     except Exception as e:
         print(f"Unexpected error : {e}")
     finally:
@@ -121,4 +340,12 @@ def main():
         es_client.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sync tickets from MySQL to ElasticSearch")
+    parser.add_argument("--full", action="store_true",
+                        help="reindex every ticket instead of only the ones changed since the last run")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per fetch and documents per bulk request")
+    parser.add_argument("--threads", type=int, default=THREAD_COUNT, help="parallel bulk requests per process")
+    parser.add_argument("--workers", type=int, default=WORKER_COUNT,
+                        help="processes for a full sync, each indexing its own TicketID range")
+    args = parser.parse_args()
+    main(full=args.full, chunk_size=args.chunk_size, thread_count=args.threads, workers=args.workers)
@@ -0,0 +1,39 @@
+"""
+Starts the local stand-ins the API connects to during a benchmark run:
+fakeredis behind a real TCP socket (Lua scripts, streams and pub/sub included) and the
+Elasticsearch stub. The API needs no changes, point REDIS_HOST/REDIS_PORT and
+ELASTICSEARCH_HOST at them (both Elasticsearch clients in app/database.py read ELASTICSEARCH_HOST).
+
+    python -m benchmarks.backends --redis-port 6379 --es-port 9200
+
+MySQL comes from benchmarks/docker-compose.yml.
+"""
+import argparse
+import threading
+
+from fakeredis import TcpFakeServer
+
+from benchmarks import es_stub
+
+
+def start(host="127.0.0.1", redis_port=6379, es_port=9200):
+    redis_server = TcpFakeServer((host, redis_port), server_type="redis")
+    es_server = es_stub.serve(host, es_port)
+    for server in (redis_server, es_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return redis_server, es_server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--es-port", type=int, default=9200)
+    args = parser.parse_args()
+    redis_server, es_server = start(args.host, args.redis_port, args.es_port)
+    print(f"fakeredis on {args.host}:{args.redis_port}, Elasticsearch stub on http://{args.host}:{args.es_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        redis_server.shutdown()
+        es_server.shutdown()
@@ -0,0 +1,55 @@
+"""
+Compares two benchmark result files written by benchmarks.suite.
+
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json [--threshold 10]
+
+Prints the change of rps and p50/p95/p99 per endpoint and marks changes worse than
+--threshold percent. With --fail-on-regression the exit code is 1 when there is one.
+"""
+import argparse
+import json
+import sys
+
+# (metric, True when a higher value is better)
+METRICS = [("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False)]
+
+
+def change_percent(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """Print the table; returns the number of regressions."""
+    regressions = 0
+    print(f"{'endpoint':<24}" + "".join(f"{metric:>22}" for metric, _ in METRICS))
+    for name in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        if name not in old["endpoints"] or name not in new["endpoints"]:
+            print(f"{name:<24} only in {'new' if name in new['endpoints'] else 'old'} run")
+            continue
+        cells = []
+        for metric, higher_is_better in METRICS:
+            before, after = old["endpoints"][name][metric], new["endpoints"][name][metric]
+            change = change_percent(before, after)
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else "  "
+            regressions += worse > threshold
+            cells.append(f"{before:>8}->{after:<8}{change:>+5.0f}%{flag}")
+        print(f"{name:<24}" + "".join(f"{cell:>22}" for cell in cells))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    with open(args.old) as f_old, open(args.new) as f_new:
+        old, new = json.load(f_old), json.load(f_new)
+    print(f"{old['commit']} -> {new['commit']}")
+    regressions = compare(old, new, args.threshold)
+    print(f"{regressions} metrics regressed by more than {args.threshold:g}%")
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
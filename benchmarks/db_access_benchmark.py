@@ -0,0 +1,141 @@
+"""
+Sync (mysql.connector pool + thread pool) vs async (aiomysql) data access under the same load.
+
+Each simulated request runs the ticket detail query for a random TicketID, the way
+GET /tickets/tickets/{ticket_id} does on a cache miss. The sync variant runs it in a thread
+pool of --threads workers, like Starlette's default thread pool of 40 did for the old sync
+handlers; the async variant runs it on the event loop. Both use --pool-size connections.
+Each mode runs in a fresh process and reports req/s, CPU seconds per 1000 requests
+and peak RSS:
+    python -m benchmarks.db_access_benchmark --requests 20000 --concurrency 200
+Uses the database from .env (see benchmarks/docker-compose.yml).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import summarize, print_summary
+
+
+def _ticket_ids(count):
+    from app.database import db_pool
+    db = db_pool.get_connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute("SELECT TicketID FROM Ticket ORDER BY RAND() LIMIT %s", (count,))
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        db.close()
+
+
+async def _drive(name, run_one, ticket_ids, concurrency, total):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in counter:
+            started = time.perf_counter()
+            try:
+                await run_one(random.choice(ticket_ids))
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"{name}: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - started)
+
+
+async def run_sync(args, ticket_ids):
+    from app.database import db_pool
+    from app.routers.tickets import TICKET_DETAIL_QUERY
+
+    def query(ticket_id):
+        db = db_pool.get_connection(timeout=30)
+        try:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(TICKET_DETAIL_QUERY + " WHERE t.TicketID = %s", (ticket_id,))
+            cursor.fetchone()
+            cursor.close()
+        finally:
+            db.close()
+
+    executor = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+    try:
+        return await _drive("sync: mysql.connector + threads", lambda ticket_id: loop.run_in_executor(
+            executor, query, ticket_id), ticket_ids, args.concurrency, args.requests)
+    finally:
+        executor.shutdown()
+
+
+async def run_async(args, ticket_ids):
+    from app import async_db
+    from app.routers.tickets import TICKET_DETAIL_QUERY
+
+    await async_db.open_async_db_pool()
+
+    async def query(ticket_id):
+        async with async_db.async_db_session(timeout=30) as db:
+            await db.fetch_one(TICKET_DETAIL_QUERY + " WHERE t.TicketID = %s", (ticket_id,))
+
+    try:
+        return await _drive("async: aiomysql", query, ticket_ids, args.concurrency, args.requests)
+    finally:
+        await async_db.close_async_db_pool()
+
+
+def _measure(mode, args, ticket_ids, results):
+    # pool sizes come from the environment, set them before app.database is imported
+    import os
+    os.environ["DB_POOL_MIN_SIZE"] = os.environ["DB_POOL_MAX_SIZE"] = str(args.pool_size)
+    os.environ["DB_POOL_MAX_WAITING"] = str(args.concurrency)
+    os.environ["ASYNC_DB_POOL_MIN_SIZE"] = os.environ["ASYNC_DB_POOL_MAX_SIZE"] = str(args.pool_size)
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    result = asyncio.run((run_sync if mode == "sync" else run_async)(args, ticket_ids))
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_seconds = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+    result["cpu_ms_per_1000"] = round(cpu_seconds * 1000 / max(result["requests"], 1) * 1000, 1)
+    result["peak_rss_mb"] = round(cpu_after.ru_maxrss / 1024, 1)
+    results.put(result)
+
+
+def main(args):
+    ticket_ids = _ticket_ids(args.tickets)
+    if not ticket_ids:
+        raise SystemExit("The Ticket table is empty, load data first (python -m benchmarks.generate_dataset)")
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    summary = []
+    for mode in ("sync", "async"):
+        process = ctx.Process(target=_measure, args=(mode, args, ticket_ids, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print_summary(result)
+        print(f"{'':<40} cpu {result['cpu_ms_per_1000']} ms / 1000 requests, peak RSS {result['peak_rss_mb']} MB")
+        summary.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=20, help="MySQL connections in both variants")
+    parser.add_argument("--threads", type=int, default=40, help="thread pool of the sync variant")
+    parser.add_argument("--tickets", type=int, default=5000, help="distinct TicketIDs to query")
+    parser.add_argument("--output", help="write both results as JSON")
+    main(parser.parse_args())
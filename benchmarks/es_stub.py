@@ -0,0 +1,372 @@
+"""
+In-memory stand-in for the Elasticsearch HTTP API, good enough for the benchmarks.
+
+Implements what the API and sync_to_elastic send: ping/info, index create/exists/delete,
+_bulk, _update, _doc, _refresh, _count, _search and _msearch. Queries support bool
+(must/filter/should/must_not), term, terms, range, exists and match_all. Aggregations
+support filter, terms, range, stats, min, max, sum, composite (terms sources) and date_histogram
+(hourly or daily buckets, dates are the ISO strings of the documents). Every response
+carries X-Elastic-Product, which the official client checks.
+
+    python -m benchmarks.es_stub --port 9200
+"""
+import argparse
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+_indices = {}
+_lock = threading.Lock()
+
+
+def _value(doc, field):
+    # multi-fields (CompanyName.keyword) hold the same value as the field itself
+    field = field[:-len(".keyword")] if field.endswith(".keyword") else field
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _compare(left, right):
+    """Numbers compare as numbers, everything else (ISO dates included) as strings."""
+    if isinstance(left, (int, float)) and not isinstance(right, str):
+        return (left > right) - (left < right)
+    left, right = str(left), str(right)
+    return (left > right) - (left < right)
+
+
+def matches(doc, query) -> bool:
+    if not query or "match_all" in query:
+        return True
+    if "bool" in query:
+        clauses = query["bool"]
+        as_list = lambda key: clauses.get(key) if isinstance(clauses.get(key), list) else [clauses[key]] if key in clauses else []
+        if not all(matches(doc, q) for q in as_list("must") + as_list("filter")):
+            return False
+        if any(matches(doc, q) for q in as_list("must_not")):
+            return False
+        should = as_list("should")
+        minimum = clauses.get("minimum_should_match", 0 if as_list("must") + as_list("filter") else 1)
+        return not should or sum(matches(doc, q) for q in should) >= int(minimum)
+    if "term" in query:
+        field, expected = next(iter(query["term"].items()))
+        expected = expected["value"] if isinstance(expected, dict) else expected
+        return _value(doc, field) == expected
+    if "terms" in query:
+        field, expected = next(iter(query["terms"].items()))
+        return _value(doc, field) in expected
+    if "range" in query:
+        field, bounds = next(iter(query["range"].items()))
+        value = _value(doc, field)
+        if value is None:
+            return False
+        checks = {"gt": lambda c: c > 0, "gte": lambda c: c >= 0, "lt": lambda c: c < 0, "lte": lambda c: c <= 0}
+        return all(checks[op](_compare(value, bound)) for op, bound in bounds.items() if op in checks)
+    if "exists" in query:
+        return _value(doc, query["exists"]["field"]) is not None
+    if "ids" in query:
+        return doc.get("_id") in query["ids"]["values"]
+    raise ValueError(f"es_stub does not support query {list(query)}")
+
+
+# date_histogram interval -> (length of the ISO prefix that identifies a bucket, step)
+_DATE_INTERVALS = {"1h": (13, timedelta(hours=1)), "hour": (13, timedelta(hours=1)),
+                   "1d": (10, timedelta(days=1)), "day": (10, timedelta(days=1))}
+_DATE_FORMAT_TOKENS = (("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S"))
+
+
+def _bucket_start(value, length) -> datetime:
+    """Start of the hour (length 13) or day (length 10) of an ISO date string."""
+    prefix = str(value).replace("Z", "")[:length]
+    return datetime.fromisoformat(prefix + ":00:00" if length == 13 else prefix).replace(tzinfo=timezone.utc)
+
+
+def _bound_start(bound, pattern, length) -> datetime:
+    """extended_bounds value: epoch millis, or a string parsed with the aggregation's format like ES does."""
+    if isinstance(bound, (int, float)):
+        return _bucket_start(datetime.fromtimestamp(bound / 1000, timezone.utc).isoformat(), length)
+    if pattern:
+        try:
+            moment = datetime.strptime(bound, pattern)
+        except ValueError:
+            raise ValueError(f"failed to parse date field [{bound}] with format [{pattern}]")
+        return _bucket_start(moment.isoformat(), length)
+    return _bucket_start(bound, length)
+
+
+def _date_histogram(docs, spec, sub_aggs):
+    interval = spec.get("fixed_interval") or spec.get("calendar_interval")
+    if interval not in _DATE_INTERVALS:
+        raise ValueError(f"es_stub does not support date_histogram interval {interval}")
+    length, step = _DATE_INTERVALS[interval]
+    pattern = spec.get("format")
+    for token, directive in _DATE_FORMAT_TOKENS:
+        pattern = pattern.replace(token, directive) if pattern else pattern
+    groups = {}
+    for doc in docs:
+        value = _value(doc, spec["field"])
+        if value is not None:
+            groups.setdefault(_bucket_start(value, length), []).append(doc)
+    min_doc_count = spec.get("min_doc_count", 1)
+    if min_doc_count == 0:
+        # empty buckets between the first and the last key, widened to extended_bounds
+        bounds = spec.get("extended_bounds", {})
+        keys = list(groups) + [_bound_start(bounds[side], pattern, length) for side in ("min", "max") if side in bounds]
+        if keys:
+            current, last = min(keys), max(keys)
+            while current <= last:
+                groups.setdefault(current, [])
+                current += step
+    buckets = []
+    for start in sorted(groups):
+        if len(groups[start]) < min_doc_count:
+            continue
+        bucket = {"key": int(start.timestamp() * 1000),
+                  "key_as_string": start.strftime(pattern) if pattern else start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                  "doc_count": len(groups[start])}
+        if sub_aggs:
+            bucket.update(aggregate(groups[start], sub_aggs))
+        buckets.append(bucket)
+    return {"buckets": buckets}
+
+
+def _composite(docs, spec, sub_aggs):
+    """Composite aggregation over terms sources, paged with size and after like the real one."""
+    names = [next(iter(source)) for source in spec["sources"]]
+    fields = [source[name]["terms"]["field"] for source, name in zip(spec["sources"], names)]
+    groups = {}
+    for doc in docs:
+        key = tuple(_value(doc, field) for field in fields)
+        if None not in key:
+            groups.setdefault(key, []).append(doc)
+    keys = sorted(groups)
+    if spec.get("after"):
+        after = tuple(spec["after"][name] for name in names)
+        keys = [key for key in keys if key > after]
+    buckets = []
+    for key in keys[:spec.get("size", 10)]:
+        bucket = {"key": dict(zip(names, key)), "doc_count": len(groups[key])}
+        if sub_aggs:
+            bucket.update(aggregate(groups[key], sub_aggs))
+        buckets.append(bucket)
+    result = {"buckets": buckets}
+    if buckets:
+        result["after_key"] = buckets[-1]["key"]
+    return result
+
+
+def aggregate(docs, aggs) -> dict:
+    result = {}
+    for name, spec in aggs.items():
+        sub_aggs = spec.get("aggs") or spec.get("aggregations")
+        if "filter" in spec:
+            selected = [doc for doc in docs if matches(doc, spec["filter"])]
+            result[name] = {"doc_count": len(selected), **(aggregate(selected, sub_aggs) if sub_aggs else {})}
+        elif "terms" in spec:
+            field = spec["terms"]["field"]
+            counts = Counter(_value(doc, field) for doc in docs if _value(doc, field) is not None)
+            buckets = []
+            for key, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:spec["terms"].get("size", 10)]:
+                bucket = {"key": key, "doc_count": count}
+                if sub_aggs:
+                    bucket.update(aggregate([doc for doc in docs if _value(doc, field) == key], sub_aggs))
+                buckets.append(bucket)
+            result[name] = {"doc_count_error_upper_bound": 0, "sum_other_doc_count": 0, "buckets": buckets}
+        elif "range" in spec:
+            field = spec["range"]["field"]
+            buckets = []
+            for bounds in spec["range"]["ranges"]:
+                selected = [doc for doc in docs if _value(doc, field) is not None
+                            and ("from" not in bounds or _value(doc, field) >= bounds["from"])
+                            and ("to" not in bounds or _value(doc, field) < bounds["to"])]
+                bucket = {key: float(bounds[key]) for key in ("from", "to") if key in bounds}
+                bucket["doc_count"] = len(selected)
+                if sub_aggs:
+                    bucket.update(aggregate(selected, sub_aggs))
+                buckets.append(bucket)
+            result[name] = {"buckets": buckets}
+        elif "stats" in spec or "min" in spec or "max" in spec or "sum" in spec:
+            kind = next(key for key in ("stats", "min", "max", "sum") if key in spec)
+            values = [_value(doc, spec[kind]["field"]) for doc in docs]
+            values = [value for value in values if value is not None]
+            if kind == "stats":
+                result[name] = {"count": len(values), "min": min(values) if values else None,
+                                "max": max(values) if values else None, "sum": sum(values),
+                                "avg": sum(values) / len(values) if values else None}
+            elif kind == "sum":
+                result[name] = {"value": float(sum(values))}
+            else:
+                result[name] = {"value": (min if kind == "min" else max)(values) if values else None}
+        elif "date_histogram" in spec:
+            result[name] = _date_histogram(docs, spec["date_histogram"], sub_aggs)
+        elif "composite" in spec:
+            result[name] = _composite(docs, spec["composite"], sub_aggs)
+        else:
+            raise ValueError(f"es_stub does not support aggregation {list(spec)}")
+    return result
+
+
+def search(index, body):
+    body = body or {}
+    docs = list(_indices.get(index, {}).items())
+    hits = [(doc_id, source) for doc_id, source in docs if matches(source, body.get("query"))]
+    # aggregations see the query hits, post_filter only narrows the returned hits
+    matched = [source for _, source in hits]
+    if body.get("post_filter"):
+        hits = [(doc_id, source) for doc_id, source in hits if matches(source, body["post_filter"])]
+    for sort in reversed(body.get("sort", [])):
+        field, order = (sort, "asc") if isinstance(sort, str) else next(iter(sort.items()))
+        order = order.get("order", "asc") if isinstance(order, dict) else order
+        hits.sort(key=lambda hit: (_value(hit[1], field) is None, _value(hit[1], field) or 0), reverse=order == "desc")
+    start = body.get("from", 0)
+    page = hits[start:start + body.get("size", 10)]
+    response = {
+        "took": 0, "timed_out": False,
+        "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+        "hits": {"total": {"value": len(hits), "relation": "eq"}, "max_score": 1.0,
+                 "hits": [{"_index": index, "_id": doc_id, "_score": 1.0, "_source": source} for doc_id, source in page]},
+    }
+    if body.get("aggs") or body.get("aggregations"):
+        response["aggregations"] = aggregate(matched, body.get("aggs") or body.get("aggregations"))
+    return response
+
+
+def bulk(lines, default_index=None):
+    items, errors = [], False
+    i = 0
+    while i < len(lines):
+        action = json.loads(lines[i])
+        op, meta = next(iter(action.items()))
+        index = meta.get("_index", default_index)
+        doc_id = str(meta.get("_id"))
+        source = json.loads(lines[i + 1]) if op != "delete" else None
+        i += 1 if op == "delete" else 2
+        docs = _indices.setdefault(index, {})
+        status, result = 200, "updated"
+        if op in ("index", "create"):
+            status, result = (200, "updated") if doc_id in docs else (201, "created")
+            docs[doc_id] = source
+        elif op == "update":
+            if doc_id in docs:
+                docs[doc_id].update(source.get("doc", {}))
+            elif source.get("doc_as_upsert") or "upsert" in source:
+                docs[doc_id] = source.get("upsert", source.get("doc", {}))
+                status, result = 201, "created"
+            else:
+                status, result = 404, None
+        elif op == "delete":
+            status, result = (200, "deleted") if docs.pop(doc_id, None) is not None else (404, "not_found")
+        item = {"_index": index, "_id": doc_id, "status": status}
+        if result:
+            item["result"] = result
+        if status == 404 and op == "update":
+            errors = True
+            item["error"] = {"type": "document_missing_exception", "reason": f"[{doc_id}]: document missing"}
+        items.append({op: item})
+    return {"took": 0, "errors": errors, "items": items}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode() if length else ""
+
+    def _handle(self):
+        parts = [part for part in urlsplit(self.path).path.split("/") if part]
+        raw = self._body()
+        with _lock:
+            if not parts:
+                return self._send(200, {"name": "es-stub", "cluster_name": "benchmark",
+                                        "version": {"number": "8.15.0"}, "tagline": "You Know, for Search"})
+            if parts[-1] == "_bulk":
+                return self._send(200, bulk(raw.splitlines(), parts[0] if len(parts) > 1 else None))
+            if parts[-1] == "_msearch":
+                lines = raw.splitlines()
+                default_index = parts[0] if len(parts) > 1 else None
+                responses = []
+                for header, body in zip(lines[0::2], lines[1::2]):
+                    index = json.loads(header).get("index", default_index)
+                    responses.append({**search(index, json.loads(body)), "status": 200})
+                return self._send(200, {"took": 0, "responses": responses})
+            index = parts[0]
+            if len(parts) == 1:
+                if self.command == "HEAD":
+                    return self._send(200 if index in _indices else 404)
+                if self.command == "PUT":
+                    _indices.setdefault(index, {})
+                    return self._send(200, {"acknowledged": True, "shards_acknowledged": True, "index": index})
+                if self.command == "DELETE":
+                    _indices.pop(index, None)
+                    return self._send(200, {"acknowledged": True})
+            action = parts[1]
+            if action == "_search":
+                return self._send(200, search(index, json.loads(raw) if raw else {}))
+            if action == "_count":
+                body = json.loads(raw) if raw else {}
+                count = sum(matches(doc, body.get("query")) for doc in _indices.get(index, {}).values())
+                return self._send(200, {"count": count})
+            if action in ("_refresh", "_settings", "_mapping"):
+                _indices.setdefault(index, {})
+                return self._send(200, {"acknowledged": True, "_shards": {"total": 1, "successful": 1, "failed": 0}})
+            if action in ("_update", "_doc", "_create") and len(parts) == 3:
+                docs = _indices.setdefault(index, {})
+                doc_id = parts[2]
+                if self.command == "GET":
+                    if doc_id not in docs:
+                        return self._send(404, {"_index": index, "_id": doc_id, "found": False})
+                    return self._send(200, {"_index": index, "_id": doc_id, "found": True, "_source": docs[doc_id]})
+                if self.command == "DELETE":
+                    found = docs.pop(doc_id, None) is not None
+                    return self._send(200 if found else 404, {"_index": index, "_id": doc_id,
+                                                              "result": "deleted" if found else "not_found"})
+                op = "update" if action == "_update" else "index"
+                result = bulk([json.dumps({op: {"_index": index, "_id": doc_id}}), raw])["items"][0][op]
+                if result["status"] == 404:
+                    return self._send(404, {"error": result["error"], "status": 404})
+                return self._send(result["status"], {**result, "_version": 1})
+        self._send(400, {"error": {"type": "illegal_argument_exception",
+                                   "reason": f"es_stub does not support {self.command} {self.path}"}, "status": 400})
+
+    def _safe_handle(self):
+        try:
+            self._handle()
+        except Exception as e:
+            self._send(400, {"error": {"type": "parsing_exception", "reason": str(e)}, "status": 400})
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _safe_handle
+
+
+def serve(host="127.0.0.1", port=9200):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200)
+    args = parser.parse_args()
+    print(f"Elasticsearch stub listening on http://{args.host}:{args.port}")
+    serve(args.host, args.port).serve_forever()
@@ -0,0 +1,342 @@
+"""
+Generates a consistent synthetic dataset for InitialTables.sql plus the migrations and
+bulk-loads it into an empty database.
+
+Cities are picked with a Zipf distribution, so a few routes (Tehran -> Mashhad, ...) carry
+most tickets. Departure dates favour the next few weeks and Thursdays/Fridays. Each
+reservation is Paid, Cancelled, Expired or still Reserved; paid and cancelled ones get a
+successful Payment. RemainingCapacity is reduced by the seats held, and a small share of
+reservations gets a Report.
+
+    python -m benchmarks.generate_dataset --tickets 1000000 --truncate
+    python -m benchmarks.generate_dataset --tickets 10000000 --method executemany
+
+Rows are written to tab-separated files of --chunk-size rows and loaded with
+LOAD DATA LOCAL INFILE (the server needs local_infile=ON, see docker-compose.yml).
+--method executemany sends batched multi-row INSERTs instead. The TicketChangeLog
+triggers add one row per ticket, so run python -m app.sync_to_elastic --full and
+python -m app.rollups --backfill after loading.
+
+Every user's password is "password123"; admin@example.com is an admin.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+import mysql.connector
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+CITY_NAMES = ["Tehran", "Mashhad", "Isfahan", "Shiraz", "Tabriz", "Karaj", "Qom", "Ahvaz", "Kermanshah", "Urmia",
+              "Rasht", "Zahedan", "Kerman", "Yazd", "Hamadan", "Arak", "Ardabil", "Bandar Abbas", "Sari", "Qazvin",
+              "Zanjan", "Khorramabad", "Gorgan", "Sanandaj", "Bushehr", "Birjand", "Semnan", "Yasuj", "Ilam", "Kish"]
+# vehicle type: (seats, price range, duration range in minutes)
+VEHICLES = {
+    "airplane": (180, (1_500_000, 6_000_000), (50, 150)),
+    "bus": (40, (300_000, 1_200_000), (240, 900)),
+    "train": (300, (400_000, 2_000_000), (300, 1000)),
+}
+VEHICLE_SHARE = {"airplane": 0.25, "bus": 0.5, "train": 0.25}
+REPORT_SUBJECTS = ["Flight Delay", "Cancellation", "Payment Problem", "Staff Behavior", "Cleanliness", "Other"]
+# share of reservations per final status
+RESERVATION_STATUS_WEIGHTS = {"Paid": 0.70, "Cancelled": 0.10, "Expired": 0.15, "Reserved": 0.05}
+REPORT_RATE = 0.02
+# hours of departure: peaks in the morning and the evening
+HOUR_WEIGHTS = [1, 1, 1, 1, 2, 4, 8, 10, 9, 7, 6, 6, 6, 6, 6, 7, 8, 9, 10, 8, 6, 4, 2, 1]
+
+TABLE_COLUMNS = {
+    "City": ["CityID", "CityName"],
+    "TransportCompany": ["TransportCompanyID", "CompanyName"],
+    "ReportSubject": ["ReportSubjectID", "SubjectName"],
+    "Ticket": ["TicketID", "Origin", "Destination", "DepartureDate", "DepartureTime", "ArrivalDate", "ArrivalTime",
+               "Price", "RemainingCapacity", "TransportCompanyID"],
+    "AirplaneTicket": ["TicketID", "CompanyName", "FlightClass", "NumberOfStops", "FlightNumber", "OriginAirPort",
+                       "DestinationAirPort", "Features"],
+    "BusTicket": ["TicketID", "CompanyName", "BusType", "ChairInRow", "Feature"],
+    "TrainTicket": ["TicketID", "NumberOfStars", "Feature", "ClosedCompartment"],
+    "User": ["UserID", "FirstName", "LastName", "Email", "PhoneNumber", "Password", "RegistrationDate",
+             "AccountStatus", "CityID", "Role"],
+    "Reservation": ["ReservationID", "UserID", "TicketID", "ReservationStatus", "ReservationTime",
+                    "ReservationExpiryTime"],
+    "Payment": ["PaymentID", "UserID", "ReservationID", "PaymentMethod", "PaymentStatus", "PaymentTime"],
+    "Reports": ["ReportID", "ReportingUserID", "TicketID", "ReservationID", "ReportSubject", "ReportText",
+                "ReportStatus", "HandledBy"],
+}
+# children first, so --truncate never trips a foreign key
+TRUNCATE_ORDER = ["Reports", "Payment", "Reservation", "AirplaneTicket", "BusTicket", "TrainTicket", "Ticket",
+                  "User", "TransportCompany", "City", "ReportSubject"]
+
+
+def zipf_weights(n, skew):
+    weights, total = [], 0.0
+    for rank in range(1, n + 1):
+        total += 1 / rank ** skew
+        weights.append(total)
+    return weights
+
+
+def city_names(count):
+    return [CITY_NAMES[i] if i < len(CITY_NAMES) else f"City {i + 1}" for i in range(count)]
+
+
+def companies_by_vehicle(per_vehicle):
+    """{vehicle: [(TransportCompanyID, name), ...]}, IDs start at 1."""
+    companies, next_id = {}, 1
+    for vehicle in VEHICLES:
+        companies[vehicle] = [(next_id + i, f"{vehicle.title()} Company {i + 1}") for i in range(per_vehicle)]
+        next_id += per_vehicle
+    return companies
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.city_count = args.cities
+        self.city_weights = zipf_weights(args.cities, args.skew)
+        self.user_weights = zipf_weights(min(args.users, 100_000), args.skew)
+        self.day_weights = []
+        total = 0.0
+        for offset in range(args.days):
+            day = args.start_date + timedelta(days=offset)
+            # near-term departures and Thursday/Friday departures are more popular
+            total += (1.5 if day.weekday() in (3, 4) else 1.0) / (1 + offset / 14)
+            self.day_weights.append(total)
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+        self.companies = companies_by_vehicle(args.companies_per_vehicle)
+        self.vehicles = list(VEHICLE_SHARE)
+        self.vehicle_weights = list(accumulate(VEHICLE_SHARE.values()))
+        self.status_names = list(RESERVATION_STATUS_WEIGHTS)
+        self.status_weights = list(accumulate(RESERVATION_STATUS_WEIGHTS.values()))
+        # departure day offset of every ticket, to place its reservations before it (2 bytes per ticket)
+        self.departure_day = array("H")
+
+    def reference_rows(self):
+        yield "City", [(i + 1, name) for i, name in enumerate(city_names(self.city_count))]
+        yield "TransportCompany", [row for rows in self.companies.values() for row in rows]
+        yield "ReportSubject", [(i + 1, name) for i, name in enumerate(REPORT_SUBJECTS)]
+
+    def tickets(self, first_id, count):
+        """Rows for Ticket and the three subtype tables, for TicketIDs first_id .. first_id+count-1."""
+        rng, n = self.rng, self.city_count
+        origins = rng.choices(range(1, n + 1), cum_weights=self.city_weights, k=count)
+        destinations = rng.choices(range(1, n + 1), cum_weights=self.city_weights, k=count)
+        days = rng.choices(range(self.args.days), cum_weights=self.day_weights, k=count)
+        hours = rng.choices(range(24), cum_weights=self.hour_weights, k=count)
+        vehicles = rng.choices(self.vehicles, cum_weights=self.vehicle_weights, k=count)
+        tickets, airplanes, buses, trains = [], [], [], []
+        for i in range(count):
+            ticket_id = first_id + i
+            origin, destination = origins[i], destinations[i]
+            if origin == destination:
+                destination = destination % n + 1
+            vehicle = vehicles[i]
+            seats, (min_price, max_price), (min_minutes, max_minutes) = VEHICLES[vehicle]
+            company_id, company_name = rng.choice(self.companies[vehicle])
+            departure = datetime.combine(self.args.start_date + timedelta(days=days[i]), datetime.min.time()) \
+                + timedelta(hours=hours[i], minutes=rng.randrange(0, 60, 5))
+            arrival = departure + timedelta(minutes=rng.randint(min_minutes, max_minutes))
+            price = rng.randrange(min_price, max_price, 10_000)
+            self.departure_day.append(days[i])
+            tickets.append((ticket_id, origin, destination, departure.date(), departure.time(), arrival.date(),
+                            arrival.time(), price, seats, company_id))
+            if vehicle == "airplane":
+                airplanes.append((ticket_id, company_name, rng.choice(["Economy", "Economy", "Business"]),
+                                  rng.choice([0, 0, 0, 1]), f"{company_name[:2].upper()}{ticket_id % 10000}",
+                                  f"Airport {origin}", f"Airport {destination}", "Meal"))
+            elif vehicle == "bus":
+                buses.append((ticket_id, company_name, rng.choice(["VIP", "VIP", "Normal"]), rng.choice([3, 4]),
+                              "Air conditioning"))
+            else:
+                trains.append((ticket_id, rng.randint(3, 5), "Restaurant car", rng.choice([0, 1])))
+        return {"Ticket": tickets, "AirplaneTicket": airplanes, "BusTicket": buses, "TrainTicket": trains}
+
+    def users(self, first_id, count, password_hash):
+        rng = self.rng
+        cities = rng.choices(range(1, self.city_count + 1), cum_weights=self.city_weights, k=count)
+        rows = []
+        for i in range(count):
+            user_id = first_id + i
+            is_admin = user_id == 1
+            rows.append((user_id, "Admin" if is_admin else f"User{user_id}", "Bench",
+                         "admin@example.com" if is_admin else f"user{user_id}@example.com",
+                         f"09{user_id:09d}", password_hash,
+                         datetime(2024, 1, 1) + timedelta(minutes=user_id % 500_000), "active", cities[i],
+                         "admin" if is_admin else "normalUser"))
+        return rows
+
+    def reservations(self, first_id, count, first_payment_id, first_report_id):
+        """Rows for Reservation, Payment and Reports."""
+        rng, args = self.rng, self.args
+        # 80% of purchases come from a Zipf-ranked set of heavy buyers, the rest from anyone
+        ranks = rng.choices(range(len(self.user_weights)), cum_weights=self.user_weights, k=count)
+        statuses = rng.choices(self.status_names, cum_weights=self.status_weights, k=count)
+        reservations, payments, reports = [], [], []
+        payment_id, report_id = first_payment_id, first_report_id
+        for i in range(count):
+            reservation_id = first_id + i
+            if rng.random() < 0.8:
+                user_id = ranks[i] * 7919 % args.users + 1
+            else:
+                user_id = rng.randint(1, args.users)
+            ticket_id = rng.randint(1, args.tickets)
+            departure = datetime.combine(args.start_date + timedelta(days=self.departure_day[ticket_id - 1]),
+                                         datetime.min.time())
+            reserved_at = departure - timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 1440))
+            status = statuses[i]
+            reservations.append((reservation_id, user_id, ticket_id, status, reserved_at,
+                                 reserved_at + timedelta(minutes=10)))
+            if status in ("Paid", "Cancelled"):
+                payments.append((payment_id, user_id, reservation_id, rng.choice(["Bank Card", "Wallet"]),
+                                 "Successful", reserved_at + timedelta(minutes=rng.randint(1, 9))))
+                payment_id += 1
+                if rng.random() < REPORT_RATE:
+                    reports.append((report_id, user_id, ticket_id, reservation_id,
+                                    rng.randint(1, len(REPORT_SUBJECTS)), "Generated report",
+                                    rng.choice(["Pending", "Checked"]), None))
+                    report_id += 1
+        return {"Reservation": reservations, "Payment": payments, "Reports": reports}
+
+
+def to_tsv(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return str(int(value))
+    return str(value)
+
+
+class Loader:
+    def __init__(self, db, method):
+        self.db = db
+        self.method = method
+        self.cursor = db.cursor()
+        self.loaded = {}
+        self.tmp_dir = tempfile.mkdtemp(prefix="dataset_")
+
+    def load(self, table, rows):
+        if not rows:
+            return
+        columns = TABLE_COLUMNS[table]
+        column_list = ", ".join(columns)
+        if self.method == "load-data":
+            path = os.path.join(self.tmp_dir, f"{table}.tsv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines("\t".join(map(to_tsv, row)) + "\n" for row in rows)
+            self.cursor.execute(f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+                                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({column_list})")
+            os.remove(path)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            for start in range(0, len(rows), 5000):
+                self.cursor.executemany(f"INSERT INTO `{table}` ({column_list}) VALUES ({placeholders})",
+                                        rows[start:start + 5000])
+        self.db.commit()
+        self.loaded[table] = self.loaded.get(table, 0) + len(rows)
+
+    def close(self):
+        self.cursor.close()
+        os.rmdir(self.tmp_dir)
+
+
+def connect():
+    load_dotenv()
+    return mysql.connector.connect(host=os.getenv("DB_HOST", "localhost"), port=int(os.getenv("DB_PORT", 3306)),
+                                   user=os.getenv("DB_USER"), password=os.getenv("DB_PASSWORD"),
+                                   database=os.getenv("DB_NAME"), allow_local_infile=True)
+
+
+def prepare(db, truncate):
+    cursor = db.cursor()
+    # bulk load session: constraints were valid when generated, skip re-checking them row by row
+    cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+    if truncate:
+        for table in TRUNCATE_ORDER:
+            cursor.execute(f"TRUNCATE TABLE `{table}`")
+    else:
+        cursor.execute("SELECT (SELECT COUNT(*) FROM Ticket) + (SELECT COUNT(*) FROM User)")
+        if cursor.fetchone()[0]:
+            raise SystemExit("Ticket/User are not empty, pass --truncate to replace their contents")
+    cursor.close()
+
+
+def release_held_seats(db):
+    """RemainingCapacity = seats minus reservations that hold a seat (Reserved or Paid)."""
+    cursor = db.cursor()
+    cursor.execute("""
+        UPDATE Ticket t
+        JOIN (SELECT TicketID, COUNT(*) AS Held FROM Reservation
+              WHERE ReservationStatus IN ('Reserved', 'Paid') GROUP BY TicketID) r ON r.TicketID = t.TicketID
+        SET t.RemainingCapacity = GREATEST(t.RemainingCapacity - r.Held, 0)
+    """)
+    db.commit()
+    cursor.close()
+
+
+def main(args):
+    started = time.perf_counter()
+    generator = Generator(args)
+    db = connect()
+    prepare(db, args.truncate)
+    loader = Loader(db, args.method)
+
+    def progress(label, done, total):
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {done:,}/{total:,} ({elapsed:.0f}s)")
+
+    for table, rows in generator.reference_rows():
+        loader.load(table, rows)
+    for first in range(1, args.tickets + 1, args.chunk_size):
+        count = min(args.chunk_size, args.tickets - first + 1)
+        for table, rows in generator.tickets(first, count).items():
+            loader.load(table, rows)
+        progress("tickets", first + count - 1, args.tickets)
+
+    password_hash = CryptContext(schemes=["bcrypt"]).hash("password123")
+    for first in range(1, args.users + 1, args.chunk_size):
+        count = min(args.chunk_size, args.users - first + 1)
+        loader.load("User", generator.users(first, count, password_hash))
+        progress("users", first + count - 1, args.users)
+
+    reservation_count = int(args.tickets * args.reservations_per_ticket)
+    payment_id = report_id = 1
+    for first in range(1, reservation_count + 1, args.chunk_size):
+        count = min(args.chunk_size, reservation_count - first + 1)
+        rows = generator.reservations(first, count, payment_id, report_id)
+        payment_id += len(rows["Payment"])
+        report_id += len(rows["Reports"])
+        for table, table_rows in rows.items():
+            loader.load(table, table_rows)
+        progress("reservations", first + count - 1, reservation_count)
+
+    release_held_seats(db)
+    loader.close()
+    db.close()
+    elapsed = time.perf_counter() - started
+    print(f"Loaded in {elapsed:.0f}s: " + ", ".join(f"{table} {count:,}" for table, count in loader.loaded.items()))
+    print("Next: python -m app.sync_to_elastic --full && python -m app.rollups --backfill "
+          "&& python -m app.inventory --reconcile (INVENTORY_MODE=redis only)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=10_000, help="10k for a laptop, up to 50M")
+    parser.add_argument("--users", type=int, help="default: tickets / 10")
+    parser.add_argument("--reservations-per-ticket", type=float, default=1.0)
+    parser.add_argument("--cities", type=int, default=len(CITY_NAMES))
+    parser.add_argument("--companies-per-vehicle", type=int, default=10)
+    parser.add_argument("--days", type=int, default=120, help="departure dates spread over this many days")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of city and buyer popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="rows generated and loaded per step")
+    parser.add_argument("--method", choices=["load-data", "executemany"], default="load-data")
+    parser.add_argument("--truncate", action="store_true", help="empty the tables before loading")
+    args = parser.parse_args()
+    args.users = args.users or max(args.tickets // 10, 100)
+    main(args)
@@ -0,0 +1,53 @@
+"""
+Search latency while a login burst is running.
+
+Measures /tickets/search alone, then again while --login-concurrency clients hammer
+/auth/loginWithPassword. With bcrypt in the process pool the search p99 should stay flat.
+    python -m benchmarks.login_search_mix --email sara.r@example.com --password strongPassword123 \
+        --origin Tehran --destination Mashhad --date 2025-06-01
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import run_load, print_summary
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.search_concurrency + args.login_concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        def search(c, i):
+            return c.get("/tickets/search", params={
+                "origin_name": args.origin, "destination_name": args.destination, "date": args.date})
+
+        def login(c, i):
+            return c.post("/auth/loginWithPassword",
+                          json={"phone_or_Email": args.email, "password": args.password})
+
+        await run_load(client, "warmup", search, 4, 100)
+        alone = await run_load(client, "search alone", search, args.search_concurrency, args.requests)
+        # the login burst runs for the whole second search measurement
+        mixed, logins = await asyncio.gather(
+            run_load(client, "search during login burst", search, args.search_concurrency, args.requests),
+            run_load(client, "login burst", login, args.login_concurrency, args.logins),
+        )
+        for result in (alone, mixed, logins):
+            print_summary(result)
+        print(f"search p99 change during the burst: {mixed['p99_ms'] - alone['p99_ms']:+.2f} ms "
+              f"(503 responses from a saturated hash pool count as login errors)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--origin", required=True)
+    parser.add_argument("--destination", required=True)
+    parser.add_argument("--date", required=True)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--search-concurrency", type=int, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,92 @@
+"""
+Hundreds of simultaneous reservations on one TicketID.
+
+Start the API (with INVENTORY_MODE=redis or without it, to compare the two modes) and run:
+    python -m benchmarks.reserve_concurrency --ticket-id 1 --requests 500 --concurrency 200
+Tokens are signed with SECRET_KEY from .env for the first --users active users.
+The run checks that the number of successful reservations matches the capacity that
+was taken in MySQL and never exceeds the starting capacity, then restores the ticket.
+"""
+import argparse
+import asyncio
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.Security import generate_access_token
+from app.sync_to_elastic import create_mysql_connection
+from benchmarks.common import run_load, print_summary
+
+
+def read_capacity(db_conn, ticket_id):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT RemainingCapacity FROM Ticket WHERE TicketID = %s", (ticket_id,))
+    capacity = cursor.fetchone()[0]
+    cursor.close()
+    db_conn.commit()
+    return capacity
+
+
+def user_tokens(db_conn, count):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT Email FROM User WHERE AccountStatus = 'active' LIMIT %s", (count,))
+    emails = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return [generate_access_token(data={"sub": email}) for email in emails]
+
+
+def restore(db_conn, ticket_id, capacity, reservation_ids):
+    cursor = db_conn.cursor()
+    if reservation_ids:
+        placeholders = ', '.join(['%s'] * len(reservation_ids))
+        cursor.execute(f"DELETE FROM Reservation WHERE ReservationID IN ({placeholders})", reservation_ids)
+    cursor.execute("UPDATE Ticket SET RemainingCapacity = %s WHERE TicketID = %s", (capacity, ticket_id))
+    db_conn.commit()
+    cursor.close()
+
+
+async def main(args):
+    db_conn = create_mysql_connection()
+    start_capacity = read_capacity(db_conn, args.ticket_id)
+    tokens = user_tokens(db_conn, args.users)
+    reservation_ids = []
+
+    async def reserve(client, i):
+        response = await client.post("/tickets/reserve", json={"TicketID": args.ticket_id},
+                                     headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+        if response.status_code == 200:
+            reservation_ids.append(response.json()["ReservationID"])
+        return response
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+            result = await run_load(client, f"reserve c={args.concurrency}", reserve, args.concurrency, args.requests)
+        print_summary(result)
+        end_capacity = read_capacity(db_conn, args.ticket_id)
+        sold = len(reservation_ids)
+        print(f"start capacity {start_capacity}, end capacity {end_capacity}, reservations {sold}, "
+              f"successful reservations/s {sold / result['seconds']:.1f}")
+        if sold > start_capacity or start_capacity - end_capacity != sold or end_capacity < 0:
+            print("FAILED: reservations and capacity disagree (overselling or lost update)")
+        else:
+            print("OK: no overselling")
+    finally:
+        if not args.keep:
+            restore(db_conn, args.ticket_id, start_capacity, reservation_ids)
+            print("Ticket capacity restored, test reservations removed "
+                  "(run python -m app.inventory --reconcile when using INVENTORY_MODE=redis)")
+        db_conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--ticket-id", type=int, required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the reservations instead of restoring the ticket")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+"""
+Concurrent-request throughput of /tickets/search and /tickets/search/advanced.
+
+Start the API (uvicorn app.main:app) on the commit you want to measure and run:
+    python -m benchmarks.search_load --base-url http://127.0.0.1:8000 --origin Tehran --destination Mashhad --date 2025-06-01
+Run it once on the old sync handlers and once on the async ones and compare the req/s columns.
+--connections adds /tickets/search/connections (1- and 2-stop itineraries); its p95 should stay
+under 100ms against a real Elasticsearch.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import run_load, print_summary
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        def search(c, i):
+            return c.get("/tickets/search", params={
+                "origin_name": args.origin, "destination_name": args.destination, "date": args.date})
+
+        def advanced(c, i):
+            return c.get("/tickets/search/advanced", params={
+                "origin_city": args.origin, "destination_city": args.destination,
+                "date": args.date, "vehicle_type": args.vehicle_type})
+
+        def connections(c, i):
+            return c.get("/tickets/search/connections", params={
+                "origin_name": args.origin, "destination_name": args.destination, "date": args.date, "max_stops": 2})
+
+        endpoints = [("search", search), ("search/advanced", advanced)]
+        if args.connections:
+            endpoints.append(("search/connections", connections))
+        # warm up keep-alive connections and ES caches
+        await run_load(client, "warmup", search, 8, 100)
+        for concurrency in args.concurrency:
+            for name, request in endpoints:
+                result = await run_load(client, f"{name} c={concurrency}", request, concurrency, args.requests)
+                print_summary(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--origin", required=True)
+    parser.add_argument("--destination", required=True)
+    parser.add_argument("--date", required=True)
+    parser.add_argument("--vehicle-type", default="bus")
+    parser.add_argument("--connections", action="store_true", help="also measure the connection search")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 100, 200])
+    asyncio.run(main(parser.parse_args()))
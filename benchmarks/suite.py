@@ -0,0 +1,132 @@
+"""
+Per-endpoint benchmark of the API: login, search, advanced search, ticket details, reserve,
+pay, cancel, bookings and the admin reports.
+
+Local setup (MySQL in Docker, fakeredis and the Elasticsearch stub in-process):
+    docker compose -f benchmarks/docker-compose.yml up -d
+    python -m benchmarks.backends &
+    DB_HOST=127.0.0.1 DB_PORT=3307 DB_USER=bench DB_PASSWORD=bench DB_NAME=ticketing_bench python -m app.migrate
+    ... load data (python -m benchmarks.generate_dataset), python -m app.sync_to_elastic --full
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.suite --origin Tehran --destination Mashhad --date 2025-06-01 \
+        --admin-email admin@example.com --admin-password secret
+
+Results are written to benchmarks/results/<commit>.json; compare two runs with
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import run_load, print_summary
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def login(client, email, password):
+    response = await client.post("/auth/loginWithPassword", json={"phone_or_Email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def create_user(client, city):
+    """Sign up a throwaway user so repeated runs do not share bookings."""
+    suffix = uuid.uuid4().hex[:10]
+    user = {"FirstName": "Bench", "LastName": suffix, "Email": f"bench.{suffix}@example.com",
+            "PhoneNumber": f"09{int(suffix, 16) % 10**9:09d}", "Password": "benchPassword123", "City": city}
+    response = await client.post("/auth/signup", json=user)
+    response.raise_for_status()
+    return user["Email"], user["Password"]
+
+
+async def main(args):
+    results = {}
+
+    def record(result):
+        print_summary(result)
+        results[result["name"]] = result
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        email, password = (args.email, args.password) if args.email else await create_user(client, args.origin)
+        headers = await login(client, email, password)
+        search_params = {"origin_name": args.origin, "destination_name": args.destination, "date": args.date}
+
+        found = await client.get("/tickets/search", params=search_params)
+        found.raise_for_status()
+        ticket_ids = [ticket["TicketID"] for ticket in found.json() if ticket["RemainingCapacity"] > 0]
+        if not ticket_ids:
+            raise SystemExit(f"No tickets with free seats for {args.origin} -> {args.destination} on {args.date}")
+
+        record(await run_load(client, "login", lambda c, i: c.post(
+            "/auth/loginWithPassword", json={"phone_or_Email": email, "password": password}),
+            min(args.concurrency, 16), args.logins))
+        record(await run_load(client, "search", lambda c, i: c.get("/tickets/search", params=search_params),
+                              args.concurrency, args.requests))
+        record(await run_load(client, "search/advanced", lambda c, i: c.get("/tickets/search/advanced", params={
+            "origin_city": args.origin, "destination_city": args.destination, "date": args.date,
+            "vehicle_type": args.vehicle_type}), args.concurrency, args.requests))
+        record(await run_load(client, "ticket details", lambda c, i: c.get(
+            f"/tickets/tickets/{ticket_ids[i % len(ticket_ids)]}"), args.concurrency, args.requests))
+
+        # reserve -> pay -> cancel run on the reservations created by the previous step
+        reservation_ids = []
+        record(await run_load(client, "reserve", lambda c, i: c.post(
+            "/tickets/reserve", json={"TicketID": ticket_ids[i % len(ticket_ids)]}, headers=headers),
+            args.concurrency, args.bookings, on_response=lambda i, r: reservation_ids.append(r.json()["ReservationID"])))
+        paid_ids = []
+        record(await run_load(client, "pay", lambda c, i: c.post(
+            "/tickets/pay", json={"ReservationID": reservation_ids[i], "PaymentMethod": "Bank Card"}, headers=headers),
+            args.concurrency, len(reservation_ids), on_response=lambda i, r: paid_ids.append(reservation_ids[i])))
+        record(await run_load(client, "cancel", lambda c, i: c.post(
+            f"/tickets/reservations/{paid_ids[i]}/cancel", headers=headers), args.concurrency, len(paid_ids)))
+        record(await run_load(client, "bookings", lambda c, i: c.get("/users/me/bookings", headers=headers),
+                              args.concurrency, args.requests))
+
+        if args.admin_email:
+            admin_headers = await login(client, args.admin_email, args.admin_password)
+            for name, path in (("admin reports", "/admin/reports"), ("admin payments", "/admin/paymentReports"),
+                               ("admin cancellations", "/admin/cancellReports")):
+                record(await run_load(client, name, lambda c, i, path=path: c.get(
+                    path, params={"limit": 50}, headers=admin_headers), args.concurrency, args.requests))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{git_commit()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": git_commit(), "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "config": {"base_url": args.base_url, "concurrency": args.concurrency, "requests": args.requests,
+                              "bookings": args.bookings, "logins": args.logins},
+                   "endpoints": results}, f, indent=2, sort_keys=True)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--origin", required=True)
+    parser.add_argument("--destination", required=True)
+    parser.add_argument("--date", required=True)
+    parser.add_argument("--vehicle-type", default="bus")
+    parser.add_argument("--email", help="existing user; a new one is signed up when omitted")
+    parser.add_argument("--password")
+    parser.add_argument("--admin-email", help="admin user for the report endpoints; skipped when omitted")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per read endpoint")
+    parser.add_argument("--bookings", type=int, default=300, help="reservations created (then paid and cancelled)")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--output", help="results file, default benchmarks/results/<commit>.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Full vs incremental runtime of app/sync_to_elastic on a synthetic dataset.
+
+Seeds --tickets synthetic rows into the Ticket table of the configured database (.env),
+runs a full sync, changes --changed of them and runs an incremental sync.
+The seeded rows are removed again at the end.
+    python -m benchmarks.sync_benchmark --tickets 200000 --changed 1000
+Requires the migrations to be applied (python -m app.migrate).
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.sync_to_elastic import (create_es_client, create_mysql_connection, full_sync, incremental_sync,
+                                 INDEX_NAME, INDEX_MAPPING)
+
+INSERT_BATCH = 5000
+
+
+def seed_tickets(db_conn, count):
+    cursor = db_conn.cursor()
+    cursor.execute("SELECT CityID FROM City")
+    cities = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT TransportCompanyID FROM TransportCompany")
+    companies = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT COALESCE(MAX(TicketID), 0) FROM Ticket")
+    first_id = cursor.fetchone()[0] + 1
+
+    query = ("INSERT INTO Ticket (TicketID, Origin, Destination, DepartureDate, DepartureTime, ArrivalDate, "
+             "ArrivalTime, Price, RemainingCapacity, TransportCompanyID) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    start_day = date.today()
+    rows = []
+    for ticket_id in range(first_id, first_id + count):
+        origin, destination = random.sample(cities, 2)
+        day = start_day + timedelta(days=random.randint(0, 90))
+        rows.append((ticket_id, origin, destination, day, "08:00:00", day, "12:00:00",
+                     random.randint(500000, 5000000), random.randint(1, 50), random.choice(companies)))
+        if len(rows) == INSERT_BATCH:
+            cursor.executemany(query, rows)
+            rows = []
+    if rows:
+        cursor.executemany(query, rows)
+    db_conn.commit()
+    cursor.close()
+    return first_id, first_id + count - 1
+
+
+def change_tickets(db_conn, first_id, last_id, count):
+    cursor = db_conn.cursor()
+    ids = random.sample(range(first_id, last_id + 1), count)
+    cursor.executemany("UPDATE Ticket SET RemainingCapacity = RemainingCapacity - 1 WHERE TicketID = %s",
+                       [(ticket_id,) for ticket_id in ids])
+    db_conn.commit()
+    cursor.close()
+
+
+def cleanup(db_conn, es_client, first_id, last_id):
+    cursor = db_conn.cursor()
+    cursor.execute("DELETE FROM Ticket WHERE TicketID BETWEEN %s AND %s", (first_id, last_id))
+    db_conn.commit()
+    cursor.close()
+    es_client.delete_by_query(index=INDEX_NAME, query={"range": {"TicketID": {"gte": first_id, "lte": last_id}}})
+
+
+def timed(label, func, *args):
+    started = time.perf_counter()
+    count = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {count:>10} tickets  {elapsed:8.2f} s")
+    return elapsed
+
+
+def main(args):
+    es_client = create_es_client()
+    db_conn = create_mysql_connection()
+    if not es_client.indices.exists(index=INDEX_NAME):
+        es_client.indices.create(index=INDEX_NAME, body=INDEX_MAPPING)
+    first_id, last_id = seed_tickets(db_conn, args.tickets)
+    try:
+        full = timed("full", full_sync, es_client, db_conn)
+        change_tickets(db_conn, first_id, last_id, args.changed)
+        incremental = timed("incremental", incremental_sync, es_client, db_conn)
+        print(f"incremental sync is {full / incremental:.1f}x faster")
+    finally:
+        cleanup(db_conn, es_client, first_id, last_id)
+        db_conn.close()
+        es_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=100000)
+    parser.add_argument("--changed", type=int, default=1000)
+    main(parser.parse_args())
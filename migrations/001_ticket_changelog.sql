@@ -0,0 +1,46 @@
+-- Change log used by sync_to_elastic for incremental (watermark based) indexing.
+-- Every insert/update/delete on Ticket or one of the vehicle subtype tables
+-- appends the TicketID here; the sync job reindexes (or deletes) those tickets
+-- and stores the highest ChangeID it processed in EsSyncState.
+
+CREATE TABLE TicketChangeLog (
+    ChangeID BIGINT PRIMARY KEY AUTO_INCREMENT,
+    TicketID INT NOT NULL,
+    ChangeType CHAR(1) NOT NULL,
+    ChangedAt DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    INDEX idx_ticketchangelog_changedat (ChangedAt)
+);
+
+CREATE TABLE EsSyncState (
+    SyncName VARCHAR(50) PRIMARY KEY,
+    LastChangeID BIGINT NOT NULL,
+    LastSyncTime DATETIME
+);
+
+CREATE TRIGGER trg_ticket_ai AFTER INSERT ON Ticket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'I');
+CREATE TRIGGER trg_ticket_au AFTER UPDATE ON Ticket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_ticket_ad AFTER DELETE ON Ticket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (OLD.TicketID, 'D');
+
+CREATE TRIGGER trg_airplaneticket_ai AFTER INSERT ON AirplaneTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_airplaneticket_au AFTER UPDATE ON AirplaneTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_airplaneticket_ad AFTER DELETE ON AirplaneTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (OLD.TicketID, 'U');
+
+CREATE TRIGGER trg_busticket_ai AFTER INSERT ON BusTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_busticket_au AFTER UPDATE ON BusTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_busticket_ad AFTER DELETE ON BusTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (OLD.TicketID, 'U');
+
+CREATE TRIGGER trg_trainticket_ai AFTER INSERT ON TrainTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_trainticket_au AFTER UPDATE ON TrainTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (NEW.TicketID, 'U');
+CREATE TRIGGER trg_trainticket_ad AFTER DELETE ON TrainTicket FOR EACH ROW
+    INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (OLD.TicketID, 'U');
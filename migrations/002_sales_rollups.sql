@@ -0,0 +1,40 @@
+-- Daily aggregates for the /admin/analytics endpoints, maintained by app/rollups.py.
+-- Sales are counted on the day of the successful payment; when a paid reservation is
+-- cancelled later, the cancellation is added to the row of that same payment day, so
+-- net = Sold - Cancelled for any day range.
+-- Build or rebuild from the base tables with:  python -m app.rollups --backfill
+
+CREATE TABLE SalesDailyRollup (
+    Day DATE NOT NULL,
+    Origin INT NOT NULL,
+    Destination INT NOT NULL,
+    TransportCompanyID INT NOT NULL,
+    VehicleType VARCHAR(10) NOT NULL,
+    SoldCount INT NOT NULL DEFAULT 0,
+    SoldAmount BIGINT NOT NULL DEFAULT 0,
+    CancelledCount INT NOT NULL DEFAULT 0,
+    CancelledAmount BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, Origin, Destination, TransportCompanyID, VehicleType),
+    INDEX idx_salesdailyrollup_origin_day (Origin, Day),
+    INDEX idx_salesdailyrollup_vehicle_day (VehicleType, Day)
+);
+
+CREATE TABLE UserDailyRollup (
+    Day DATE NOT NULL,
+    UserID INT NOT NULL,
+    PurchaseCount INT NOT NULL DEFAULT 0,
+    PurchaseAmount BIGINT NOT NULL DEFAULT 0,
+    CancelledCount INT NOT NULL DEFAULT 0,
+    CancelledAmount BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, UserID),
+    INDEX idx_userdailyrollup_user (UserID)
+);
+
+-- Reports have no timestamp, so they are counted per user and subject only
+CREATE TABLE ReportSubjectRollup (
+    ReportSubject INT NOT NULL,
+    ReportingUserID INT NOT NULL,
+    ReportCount INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ReportSubject, ReportingUserID),
+    INDEX idx_reportsubjectrollup_count (ReportSubject, ReportCount)
+);
@@ -0,0 +1,19 @@
+-- Composite indexes for the queries the API runs on every request.
+
+-- get_user_bookings: WHERE UserID = ? ORDER BY ReservationTime DESC
+CREATE INDEX idx_reservation_user_time ON Reservation (UserID, ReservationTime);
+
+-- pay_for_ticket and the expiry sweeper: ReservationStatus = 'Reserved' AND ReservationExpiryTime < ?
+CREATE INDEX idx_reservation_status_expiry ON Reservation (ReservationStatus, ReservationExpiryTime);
+
+-- /admin/cancellReports: ReservationStatus = 'Cancelled' AND ReservationID < ? ORDER BY ReservationID DESC
+CREATE INDEX idx_reservation_status_id ON Reservation (ReservationStatus, ReservationID);
+
+-- get_unchecked_reports and /admin/reports: ReportStatus = 'Pending' ORDER BY ReportID DESC
+CREATE INDEX idx_reports_status_id ON Reports (ReportStatus, ReportID);
+
+-- /admin/paymentReports: PaymentStatus = ? ORDER BY PaymentID DESC (InnoDB appends the primary key)
+CREATE INDEX idx_payment_status ON Payment (PaymentStatus);
+
+-- get_current_user on a principal cache miss: Email = ? AND AccountStatus = 'active'
+CREATE INDEX idx_user_email_status ON User (Email, AccountStatus);
@@ -0,0 +1,12 @@
+-- Tables and columns the API uses that InitialTables.sql does not create.
+-- The table is named ReportSubject everywhere (reference_data, the admin report pages,
+-- GetTopUsersByReportSubject); MySQL table names are case sensitive on Linux.
+-- Reports.ReportSubject holds a ReportSubjectID (see report_issue).
+
+CREATE TABLE ReportSubject (
+    ReportSubjectID INT PRIMARY KEY AUTO_INCREMENT,
+    SubjectName VARCHAR(100) NOT NULL UNIQUE
+);
+
+-- admin who checked the report (get_unchecked_reports)
+ALTER TABLE Reports ADD COLUMN HandledBy INT NULL;
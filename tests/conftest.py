@@ -0,0 +1,29 @@
+"""
+Shared fixtures. The tests need no MySQL, Redis or Elasticsearch: Redis is fakeredis and the
+code under test is called directly.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import fakeredis
+
+from app.database import redis_client, async_redis_client
+
+
+@pytest.fixture
+def fake_redis():
+    """Point the sync and async Redis clients of this process at one empty fakeredis server."""
+    server = fakeredis.FakeServer()
+    clients = {redis_client: fakeredis.FakeRedis(server=server, decode_responses=True),
+               async_redis_client: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)}
+    for proxy, client in clients.items():
+        proxy._reset()
+        proxy._client, proxy._pid = client, os.getpid()
+    yield clients[redis_client]
+    for proxy in clients:
+        proxy._reset()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app import inventory
+
+
+class FakeDB:
+    """Stands in for AsyncDB: every ticket has the given capacity in MySQL."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    async def fetch_one(self, query, params):
+        return None if self.capacity is None else {"RemainingCapacity": self.capacity}
+
+
+def test_take_seat_loads_the_counter_then_decrements(fake_redis):
+    assert asyncio.run(inventory.take_seat(FakeDB(2), 1)) == 1
+    assert asyncio.run(inventory.take_seat(FakeDB(2), 1)) == 0
+    assert fake_redis.get(inventory.inventory_key(1)) == "0"
+
+
+def test_take_seat_returns_none_when_sold_out(fake_redis):
+    fake_redis.set(inventory.inventory_key(1), 0)
+    assert asyncio.run(inventory.take_seat(FakeDB(5), 1)) is None
+    # a sold out counter is not reloaded from MySQL or pushed below zero
+    assert fake_redis.get(inventory.inventory_key(1)) == "0"
+
+
+def test_take_seat_of_unknown_ticket(fake_redis):
+    assert asyncio.run(inventory.take_seat(FakeDB(None), 1)) is None
+    assert not fake_redis.exists(inventory.inventory_key(1))
+
+
+def test_take_and_release_refresh_the_ttl(fake_redis):
+    key = inventory.inventory_key(1)
+    fake_redis.set(key, 3, ex=10)
+    asyncio.run(inventory.take_seat(FakeDB(3), 1))
+    assert fake_redis.ttl(key) > 10
+    fake_redis.expire(key, 10)
+    asyncio.run(inventory.release_seats(1))
+    assert fake_redis.ttl(key) > 10
+
+
+def test_release_seats(fake_redis):
+    fake_redis.set(inventory.inventory_key(1), 1)
+    assert asyncio.run(inventory.release_seats(1, 2)) == 3
+    # a counter that is not loaded stays unloaded, the next take reads MySQL
+    assert asyncio.run(inventory.release_seats(2)) is None
+    assert not fake_redis.exists(inventory.inventory_key(2))
+
+
+def test_release_seats_bulk(fake_redis):
+    fake_redis.set(inventory.inventory_key(1), 0)
+    fake_redis.set(inventory.inventory_key(2), 4)
+    inventory.release_seats_bulk({1: 2, 2: 1, 3: 5})
+    assert fake_redis.mget([inventory.inventory_key(i) for i in (1, 2, 3)]) == ["2", "5", None]
+
+
+def test_seat_goes_back_when_the_mysql_update_fails(fake_redis):
+    from app.routers import tickets
+
+    class FailingDB(FakeDB):
+        async def execute(self, query, params):
+            raise RuntimeError("Lock wait timeout exceeded")
+
+    fake_redis.set(inventory.inventory_key(1), 3)
+    with pytest.raises(RuntimeError):
+        asyncio.run(tickets._take_seat_with_redis_inventory(FailingDB(3), 1))
+    assert fake_redis.get(inventory.inventory_key(1)) == "3"
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from app import principal_cache
+
+USER = {"UserID": 7, "Email": "user@example.com", "AccountStatus": "ACTIVE", "Role": "USER"}
+
+
+@pytest.fixture(autouse=True)
+def empty_local_cache():
+    principal_cache._local.clear()
+    yield
+    principal_cache._local.clear()
+
+
+def token_expiry():
+    return time.time() + 600
+
+
+def test_miss_store_then_hit(fake_redis):
+    user, generation = asyncio.run(principal_cache.get_principal("7"))
+    assert user is None and generation == "0"
+    asyncio.run(principal_cache.store_principal("7", USER, token_expiry(), generation))
+    assert asyncio.run(principal_cache.get_principal("7")) == (USER, None)
+    # a fresh process only has the Redis copy
+    principal_cache._local.clear()
+    assert asyncio.run(principal_cache.get_principal("7")) == (USER, None)
+
+
+def test_invalidate_drops_both_tiers(fake_redis):
+    _, generation = asyncio.run(principal_cache.get_principal("7"))
+    asyncio.run(principal_cache.store_principal("7", USER, token_expiry(), generation))
+    asyncio.run(principal_cache.invalidate_principal("7"))
+    user, generation = asyncio.run(principal_cache.get_principal("7"))
+    assert user is None and generation == "1"
+    assert fake_redis.ttl(principal_cache.generation_key("7")) > 0
+
+
+def test_store_after_invalidation_is_refused(fake_redis):
+    # a request misses and loads the user from MySQL ...
+    _, generation = asyncio.run(principal_cache.get_principal("7"))
+    # ... an admin deactivates the account before the request stores the row it read
+    asyncio.run(principal_cache.invalidate_principal("7"))
+    asyncio.run(principal_cache.store_principal("7", USER, token_expiry(), generation))
+    assert not fake_redis.exists(principal_cache.principal_key("7"))
+    assert principal_cache._local.get("7") is None
+
+
+def test_nothing_is_stored_without_a_generation(fake_redis):
+    asyncio.run(principal_cache.store_principal("7", USER, token_expiry(), None))
+    assert not fake_redis.exists(principal_cache.principal_key("7"))
+    assert principal_cache._local.get("7") is None
+
+
+def test_entry_does_not_outlive_the_token(fake_redis):
+    _, generation = asyncio.run(principal_cache.get_principal("7"))
+    asyncio.run(principal_cache.store_principal("7", USER, time.time() + 30, generation))
+    assert fake_redis.ttl(principal_cache.principal_key("7")) <= 30
+    asyncio.run(principal_cache.store_principal("8", USER, time.time() - 1, generation))
+    assert not fake_redis.exists(principal_cache.principal_key("8"))
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app import rollups
+
+
+class FakeDB:
+    """Answers the successful payment lookup and records the rollup statements."""
+
+    def __init__(self, paid):
+        self.paid = paid
+        self.executed = []
+
+    async def fetch_one(self, query, params):
+        return {"Paid": 1} if self.paid else None
+
+    async def execute(self, query, params):
+        self.executed.append(params)
+
+
+def change(paid, old_status, new_status):
+    db = FakeDB(paid)
+    asyncio.run(rollups.record_status_change(db, 1, old_status, new_status))
+    # record_cancellation passes (sign, sign, reservation_id) to both rollup tables
+    return [params[0] for params in db.executed]
+
+
+def test_cancelling_and_restoring_a_sale():
+    assert change(True, "Paid", "Cancelled") == [1, 1]
+    assert change(True, "Cancelled", "Paid") == [-1, -1]
+    assert change(True, "Paid", "Paid") == []
+
+
+def test_unpaid_reservations():
+    assert change(False, "Reserved", "Expired") == []
+    # record_cancellation ignores unpaid reservations on its own
+    assert change(False, "Reserved", "Cancelled") == [1, 1]
+
+
+@pytest.mark.parametrize("paid, old_status, new_status", [
+    (False, "Reserved", "Paid"),
+    (True, "Paid", "Reserved"),
+    (True, "Paid", "Expired"),
+    (True, "Cancelled", "Reserved"),
+])
+def test_edits_the_rollups_cannot_count(paid, old_status, new_status):
+    with pytest.raises(ValueError):
+        change(paid, old_status, new_status)
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app import search_connections
+from app.route_graph import RouteGraph
+from app.search_connections import candidate_paths, join_legs
+
+HOUR = timedelta(hours=1)
+
+
+def graph(edges):
+    return RouteGraph(edges, version="1", last_change_id="0-0")
+
+
+def leg(origin, destination, departure, arrival, price=100):
+    return {"Origin": origin, "Destination": destination, "Price": price,
+            "DepartureDateTime": departure, "ArrivalDateTime": arrival,
+            "_departure": datetime.fromisoformat(departure), "_arrival": datetime.fromisoformat(arrival)}
+
+
+def test_candidate_paths_cheapest_first():
+    routes = graph({("A", "B"): 10, ("B", "D"): 10, ("A", "C"): 5, ("C", "D"): 30,
+                    ("B", "C"): 1, ("C", "B"): 5, ("A", "D"): 1})
+    assert candidate_paths(routes, "A", "D", 1) == [("A", "B", "D"), ("A", "C", "D")]
+    # A-B-D and A-C-B-D both cost 20: fewer stops first
+    assert candidate_paths(routes, "A", "D", 2) == [("A", "B", "D"), ("A", "C", "B", "D"),
+                                                    ("A", "C", "D"), ("A", "B", "C", "D")]
+
+
+def test_candidate_paths_skip_direct_and_loops():
+    routes = graph({("A", "D"): 1, ("A", "B"): 1, ("B", "A"): 1, ("B", "D"): 1, ("D", "B"): 1})
+    assert candidate_paths(routes, "A", "D", 2) == [("A", "B", "D")]
+    assert candidate_paths(routes, "X", "D", 2) == []
+
+
+def test_candidate_paths_keep_max_paths(monkeypatch):
+    monkeypatch.setattr(search_connections, "MAX_PATHS", 2)
+    routes = graph({**{("A", hub): price for hub, price in (("B", 3), ("C", 1), ("E", 2))},
+                    **{(hub, "D"): 0 for hub in "BCE"}})
+    assert candidate_paths(routes, "A", "D", 1) == [("A", "C", "D"), ("A", "E", "D")]
+
+
+def test_join_legs_layover_and_duration():
+    first = [leg("A", "B", "2026-11-01T08:00:00", "2026-11-01T09:00:00"),
+             leg("A", "B", "2026-11-01T20:00:00", "2026-11-01T21:00:00")]
+    second = [leg("B", "D", "2026-11-01T09:30:00", "2026-11-01T10:30:00"),  # layover too short
+              leg("B", "D", "2026-11-01T10:00:00", "2026-11-01T11:00:00"),
+              leg("B", "D", "2026-11-01T12:00:00", "2026-11-01T23:30:00")]  # trip too long
+    chains = join_legs(("A", "B", "D"), {("A", "B"): first, ("B", "D"): second},
+                       min_layover=HOUR, max_duration=12 * HOUR)
+    assert [[c["DepartureDateTime"] for c in chain] for chain in chains] == [
+        ["2026-11-01T08:00:00", "2026-11-01T10:00:00"]]
+
+
+def test_join_legs_two_stops():
+    legs = {("A", "B"): [leg("A", "B", "2026-11-01T08:00:00", "2026-11-01T09:00:00")],
+            ("B", "C"): [leg("B", "C", "2026-11-01T10:00:00", "2026-11-01T11:00:00"),
+                         leg("B", "C", "2026-11-01T11:00:00", "2026-11-01T12:00:00")],
+            ("C", "D"): [leg("C", "D", "2026-11-01T12:30:00", "2026-11-01T13:00:00")]}
+    chains = join_legs(("A", "B", "C", "D"), legs, min_layover=HOUR, max_duration=24 * HOUR)
+    assert len(chains) == 1 and [c["Destination"] for c in chains[0]] == ["B", "C", "D"]
+    itinerary = search_connections.itinerary(chains[0])
+    assert itinerary["Stops"] == 2 and itinerary["Via"] == ["B", "C"] and itinerary["TotalPrice"] == 300
+    assert itinerary["DurationMinutes"] == 300 and "_departure" not in itinerary["Legs"][0]
+
+
+def test_join_legs_missing_edge():
+    legs = {("A", "B"): [leg("A", "B", "2026-11-01T08:00:00", "2026-11-01T09:00:00")], ("B", "D"): []}
+    assert join_legs(("A", "B", "D"), legs, HOUR, 24 * HOUR) == []
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+from app import search_facets
+
+
+def epoch_millis(moment: str) -> int:
+    return int(datetime.fromisoformat(moment).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+AGGREGATIONS = {
+    "price": {
+        "doc_count": 5,
+        "stats": {"count": 5, "min": 400000.0, "max": 2500000.0},
+        "ranges": {"buckets": [
+            {"key": "*-500000.0", "to": 500000.0, "doc_count": 2},
+            {"key": "500000.0-1000000.0", "from": 500000.0, "to": 1000000.0, "doc_count": 0},
+            {"key": "2000000.0-*", "from": 2000000.0, "doc_count": 3},
+        ]},
+    },
+    "companies": {"doc_count": 5, "values": {"buckets": [{"key": "Iran Air", "doc_count": 3},
+                                                          {"key": "Mahan", "doc_count": 2}]}},
+    "vehicle_types": {"doc_count": 5, "values": {"buckets": [{"key": "airplane", "doc_count": 5}]}},
+    "departure_hours": {"doc_count": 5, "values": {"buckets": [
+        {"key_as_string": "2026-11-01T00:00:00.000Z", "key": epoch_millis("2026-11-01T00:00:00"), "doc_count": 0},
+        {"key_as_string": "2026-11-01T08:00:00.000Z", "key": epoch_millis("2026-11-01T08:00:00"), "doc_count": 4},
+        {"key_as_string": "2026-11-01T23:00:00.000Z", "key": epoch_millis("2026-11-01T23:00:00"), "doc_count": 1},
+    ]}},
+}
+
+
+def test_parse_facets():
+    facets = search_facets.parse_facets(AGGREGATIONS)
+    assert facets["Price"] == {"Min": 400000.0, "Max": 2500000.0, "Ranges": [
+        {"From": None, "To": 500000.0, "Count": 2},
+        {"From": 500000.0, "To": 1000000.0, "Count": 0},
+        {"From": 2000000.0, "To": None, "Count": 3},
+    ]}
+    assert facets["Companies"] == [{"Value": "Iran Air", "Count": 3}, {"Value": "Mahan", "Count": 2}]
+    assert facets["VehicleTypes"] == [{"Value": "airplane", "Count": 5}]
+    assert facets["DepartureHours"] == [{"Hour": 0, "Count": 0}, {"Hour": 8, "Count": 4}, {"Hour": 23, "Count": 1}]
+
+
+def test_parse_facets_without_hits():
+    aggregations = {
+        "price": {"doc_count": 0, "stats": {"count": 0, "min": None, "max": None},
+                  "ranges": {"buckets": [{"key": "*-500000.0", "to": 500000.0, "doc_count": 0}]}},
+        "companies": {"doc_count": 0, "values": {"buckets": []}},
+        "vehicle_types": {"doc_count": 0, "values": {"buckets": []}},
+        "departure_hours": {"doc_count": 0, "values": {"buckets": []}},
+    }
+    facets = search_facets.parse_facets(aggregations)
+    assert facets["Price"]["Min"] is None and facets["Price"]["Ranges"][0]["Count"] == 0
+    assert facets["Companies"] == [] and facets["DepartureHours"] == []
+
+
+def test_cache_variant():
+    assert search_facets.cache_variant({}, False) == ""
+    filtered = search_facets.cache_variant({"companies": ["Mahan"]}, False)
+    assert filtered and filtered != search_facets.cache_variant({"companies": ["Mahan"]}, True)
+    assert filtered == search_facets.cache_variant({"companies": ["Mahan"]}, False)
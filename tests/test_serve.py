@@ -0,0 +1,21 @@
+import pytest
+
+from app.serve import pool_sizes
+
+
+@pytest.mark.parametrize("max_connections, reserved, workers", [(151, 20, 4), (151, 20, 1), (1000, 50, 16), (60, 20, 10)])
+def test_workers_stay_within_max_connections(max_connections, reserved, workers):
+    sizes = pool_sizes(max_connections, reserved, workers)
+    assert workers * (sizes["DB_POOL_MAX_SIZE"] + sizes["ASYNC_DB_POOL_MAX_SIZE"]) <= max_connections - reserved
+    assert sizes["DB_POOL_MAX_SIZE"] >= 2
+    assert sizes["ASYNC_DB_POOL_MAX_SIZE"] >= sizes["DB_POOL_MAX_SIZE"]
+
+
+def test_default_split():
+    # (151 - 20) // 4 = 32 per worker, 20% of them for the sync pool
+    assert pool_sizes(151, 20, 4) == {"DB_POOL_MAX_SIZE": 6, "ASYNC_DB_POOL_MAX_SIZE": 26}
+
+
+def test_too_many_workers():
+    with pytest.raises(SystemExit):
+        pool_sizes(151, 20, 40)
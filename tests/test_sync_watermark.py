@@ -0,0 +1,62 @@
+"""
+Needs a MySQL database with the migrations applied (the DB_* settings of .env, e.g. the benchmark
+database); skipped otherwise. Writes TicketChangeLog rows for TicketIDs no ticket has and removes
+them again.
+"""
+import mysql.connector
+import pytest
+
+from app.sync_to_elastic import create_mysql_connection, read_settled_change_id, fetch_changed_ticket_ids
+
+SLOW_TICKET = -1001
+FAST_TICKET = -1002
+
+
+@pytest.fixture
+def connections():
+    try:
+        opened = [create_mysql_connection() for _ in range(3)]
+    except mysql.connector.Error as e:
+        pytest.skip(f"no MySQL test database: {e}")
+    yield opened
+    for connection in opened:
+        connection.rollback()
+    cursor = opened[0].cursor()
+    cursor.execute("DELETE FROM TicketChangeLog WHERE TicketID IN (%s, %s)", (SLOW_TICKET, FAST_TICKET))
+    opened[0].commit()
+    cursor.close()
+    for connection in opened:
+        connection.close()
+
+
+def log_change(connection, ticket_id):
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO TicketChangeLog (TicketID, ChangeType) VALUES (%s, 'U')", (ticket_id,))
+    change_id = cursor.lastrowid
+    cursor.close()
+    return change_id
+
+
+def test_watermark_stays_below_an_open_transaction(connections):
+    slow, fast, sync = connections
+    # the slow transaction logs its change first and stays open ...
+    slow_id = log_change(slow, SLOW_TICKET)
+    # ... while a later change with a higher ChangeID commits
+    fast_id = log_change(fast, FAST_TICKET)
+    fast.commit()
+    assert fast_id > slow_id
+
+    watermark = read_settled_change_id(sync)
+    assert watermark < slow_id
+
+    slow.commit()
+    settled = read_settled_change_id(sync)
+    assert settled >= fast_id
+    assert {SLOW_TICKET, FAST_TICKET} <= set(fetch_changed_ticket_ids(sync, watermark, settled))
+
+
+def test_watermark_without_open_transactions(connections):
+    writer, _, sync = connections
+    change_id = log_change(writer, SLOW_TICKET)
+    writer.commit()
+    assert read_settled_change_id(sync) >= change_id